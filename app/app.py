@@ -1,5 +1,4 @@
 # %%
-import base64
 import io
 from typing import Any, Dict, List, Optional, Tuple, Union
 
@@ -13,13 +12,18 @@ from flask import Flask
 
 import pandas as pd
 
-from src.plotting import make_map, empty_fig
+from src.plotting import make_map, empty_fig, figure_layout_signature
 from src.data_manager import DataPreprocessor, DataPlotter, SessionManager
 from src.data_model import ROLE_REGISTRY, ColumnRole, ColumnMapping
-from src.data_mapping import ValidationIssue
+from src.data_mapping import (
+    ValidationIssue,
+    infer_dtype_hints,
+    role_column_options,
+    sniff_csv,
+    suggest_role_mapping,
+)
 
 from src.data_process import (
-    json_to_pandas,
     merge_color_overrides,
     build_color_mapping_export_df,
     build_custom_group_export_df,
@@ -27,13 +31,41 @@ from src.data_process import (
 )
 
 # from src.compositional_data_functions import clr_transform_scale
-from src.dimension_reduction_functions import process_dimension_reduction
+from src.job_runner import (
+    JOB_CANCELLED,
+    JOB_DONE,
+    JOB_FINISHED,
+    build_pca_working_data,
+    build_working_data,
+    cancel_job,
+    get_job,
+    jobs_available,
+    merge_pmap_job_session,
+    submit_pmap_job,
+)
 from src.clustering_functions import process_clustering
 from src.callbacks import callback_prevent_initial_output
 from src.logging_config import configure_logging, get_logger
-from src.error_handling import log_and_prevent_update, log_and_surface_error
-from src.store_utils import load_store, dump_store
+from src.error_handling import log_and_prevent_update, log_and_surface_error, on_callback_error
+from src.figure_cache import figure_cache_key, get_figure, put_figure
+from src.store_utils import (
+    load_store,
+    dump_store,
+    load_session,
+    dump_session,
+    is_session_handle,
+    new_workspace_id,
+)
+from src.session_codec import (
+    decode_frame,
+    load_frame,
+    load_date_index,
+    load_log_composition,
+    load_selection_index,
+    migrate_session,
+)
 
+from src.upload_spool import discard_upload, register_upload_routes, spool_path
 from src.session_manager import (
     save_to_redis,
     load_from_redis,
@@ -53,10 +85,20 @@ logger = get_logger(__name__)
 
 # define the Flask server
 server = Flask(__name__)
-app = dash.Dash(__name__, server=server, external_stylesheets=[dbc.themes.BOOTSTRAP])
+register_upload_routes(server)
+app = dash.Dash(
+    __name__,
+    server=server,
+    external_stylesheets=[dbc.themes.BOOTSTRAP],
+    on_error=on_callback_error,
+)
 
 app.layout = create_page_map()
 
+# dimred-job-status visibility (progress bar + Cancel for a background Apply).
+DIMRED_JOB_VISIBLE = {"display": "flex"}
+DIMRED_JOB_HIDDEN = {"display": "none"}
+
 
 @app.callback(
     [
@@ -104,21 +146,23 @@ _MAPPED_ROLE_SPECS = [spec for spec in ROLE_REGISTRY if spec.role != ColumnRole.
     Output({"type": "role-mapping", "role": ALL}, "value"),
     Output("mapping-issues-container", "children", allow_duplicate=True),
     Output("mapping-issues-container", "is_open", allow_duplicate=True),
-    Input("upload-data", "contents"),
+    Input("upload-file-id", "data"),
     prevent_initial_call=True,
 )
 def stage_raw_upload(
-    contents: Optional[str],
+    upload_file: Optional[dict],
 ) -> Tuple[Optional[str], bool, List[list], List[Any], list, bool]:
-    """Decode an uploaded CSV's header row and open the column-mapping modal
-    with one dropdown per mapped role, populated with the file's columns."""
-    if contents is None:
+    """Sniff a spooled upload's header and first rows (see src/upload_spool.py,
+    data_mapping.sniff_csv) and open the column-mapping modal with one
+    dropdown per mapped role. Options are labelled with their sniffed dtype,
+    compatible columns first, and likely roles are pre-selected. Only the
+    upload ID is staged - the full file is parsed by confirm_mapping."""
+    if not upload_file:
         raise PreventUpdate
     n_roles = len(_MAPPED_ROLE_SPECS)
+    upload_id = upload_file["upload_id"]
     try:
-        content_type, content_string = contents.split(",")
-        decoded = base64.b64decode(content_string)
-        columns = pd.read_csv(io.BytesIO(decoded), nrows=0).columns.to_list()
+        df_sample = sniff_csv(spool_path(upload_id))
     except Exception as e:
         logger.warning("Could not parse uploaded file: %s", e)
         return (
@@ -129,13 +173,18 @@ def stage_raw_upload(
             [html.Li(f"❌ Could not parse uploaded file: {e}")],
             True,
         )
-    options = [{"label": col, "value": col} for col in columns]
-    reset_values = [[] if spec.multi else None for spec in _MAPPED_ROLE_SPECS]
+    columns = df_sample.columns.to_list()
+    hints = infer_dtype_hints(df_sample)
+    suggestions = suggest_role_mapping(df_sample, hints)
+    values = [
+        suggestions.get(spec.role.value, [] if spec.multi else None)
+        for spec in _MAPPED_ROLE_SPECS
+    ]
     return (
-        dump_store({"content_string": content_string, "columns": columns}),
+        dump_store({"upload_id": upload_id, "columns": columns}),
         True,  # open the mapping modal
-        [options] * n_roles,
-        reset_values,
+        [role_column_options(spec, hints) for spec in _MAPPED_ROLE_SPECS],
+        values,
         [],
         False,
     )
@@ -235,7 +284,7 @@ def confirm_mapping(
         group_colors=group_colors,
     )
 
-    data_preprocessor = DataPreprocessor(raw["content_string"], mapping)
+    data_preprocessor = DataPreprocessor(None, mapping, csv_path=spool_path(raw["upload_id"]))
     issue_items = _validation_issues_to_list_items(data_preprocessor.validation.issues)
 
     if data_preprocessor.validation.has_errors:
@@ -250,6 +299,9 @@ def confirm_mapping(
         )
 
     session_dict = data_preprocessor.get_session_dict()
+    workspace_id = session_dict["workspace_id"] = new_workspace_id()
+    # df_master now lives in the session; the spooled CSV is no longer needed.
+    discard_upload(raw["upload_id"])
 
     if data_preprocessor.validation.warnings:
         alert = dbc.Alert(
@@ -273,8 +325,8 @@ def confirm_mapping(
         keep_modal_open = False
 
     return (
-        dump_store(session_dict["meta_data"]),
-        dump_store(session_dict),
+        dump_session(session_dict["meta_data"], workspace_id),
+        dump_session(session_dict, workspace_id),
         None,  # clear working data on new upload
         alert,
         keep_modal_open,
@@ -341,19 +393,20 @@ def load_session_data(
             dash.no_update,
         )
     logger.info("Session loaded successfully: %s", key)
+    # Sessions saved by an older app version carry JSON-encoded frames.
+    session = migrate_session(session)
+    # Each load starts a fresh server-side workspace, so two tabs loading the
+    # same saved session never share snapshot handles.
+    workspace_id = session["workspace_id"] = new_workspace_id()
     meta_data = session.get("meta_data", {})
-    working_data = session.get("working_data", {})
-    if not working_data:
-        working_data = None
-    else:
-        working_data = dump_store(working_data)
+    working_data = session.get("working_data") or None
 
     return (
         f"Session '{key}' loaded successfully for user '{session_id}'.",
         False,
-        dump_store(session),
-        dump_store(meta_data),
-        working_data,
+        dump_session(session, workspace_id),
+        dump_session(meta_data, workspace_id),
+        dump_session(working_data, workspace_id),
     )
 
 
@@ -378,7 +431,7 @@ def save_session_data_to_redis(
     if session is None or session_id is None or key is None or len(key) == 0:
         return "No session data to save or missing session ID/key.", False
     logger.info("Saving session - User: %s, Session: %s", session_id, key)
-    save_to_redis(session_id, key, session)
+    save_to_redis(session_id, key, dump_store(load_session(session)))
     logger.info("Session saved successfully: %s", key)
     return (
         f"Session '{key}' saved successfully for user '{session_id}'.\nExpires in 1 week.",
@@ -399,6 +452,7 @@ def download_session_as_json(n_clicks: Optional[int], session: Optional[str]) ->
     if session is None:
         return dash.no_update
     logger.info("Downloading session as JSON...")
+    session = dump_store(load_session(session))
     return dcc.send_string(session, filename="session_data.json", mime_type="application/json")
 
 
@@ -431,12 +485,12 @@ def update_date_range_slider(
     """Rebuild the date-range slider's bounds/marks from the mapped date column."""
     if session is None:
         return 0, 0, {}, [0, 0]
-    session = load_store(session)
+    session = load_session(session)
     col_date = session["meta_data"]["cols_key_meta"]["date"]
     if not col_date:
         # No date column mapped - date-range filtering is disabled.
         return 0, 0, {}, [0, 0]
-    df_master = json_to_pandas(session, "df_master", col_date)
+    df_master = load_frame(session, "df_master", col_date)
     date_min = int(df_master[col_date].dt.year.min())
     date_max = int(df_master[col_date].dt.year.max())
     marks = {i: str(i) for i in range(date_min, date_max + 1, 5)}
@@ -446,7 +500,7 @@ def update_date_range_slider(
 
 def _get_date_filter_bounds(session: Dict[str, Any]) -> Optional[List[str]]:
     """Derive the mapped date column's actual [min, max] (as ISO date
-    strings) from an already-`load_store`'d session dict, or None if no date
+    strings) from an already-`load_session`'d session dict, or None if no date
     column is mapped. Shared by update_date_filter_picker and
     update_date_filter_indicator so both always agree on the true bounds -
     neither depends on date-filter-bounds-store having already been written
@@ -455,7 +509,7 @@ def _get_date_filter_bounds(session: Dict[str, Any]) -> Optional[List[str]]:
     col_date = session["meta_data"]["cols_key_meta"]["date"]
     if not col_date:
         return None
-    df_master = json_to_pandas(session, "df_master", col_date)
+    df_master = load_frame(session, "df_master", col_date)
     date_min = str(df_master[col_date].min().date())
     date_max = str(df_master[col_date].max().date())
     return [date_min, date_max]
@@ -487,7 +541,7 @@ def update_date_filter_picker(session: Optional[str]) -> tuple:
     date outside it is accepted rather than silently reverted."""
     if session is None:
         return None, None, None, True, True, ""
-    session = load_store(session)
+    session = load_session(session)
     bounds = _get_date_filter_bounds(session)
     if bounds is None:
         # No date column mapped - date filtering is disabled.
@@ -545,7 +599,7 @@ def update_date_filter_indicator(
     the two callbacks that both fire off Input("session", "data")."""
     if not start_date or not end_date or session is None:
         return ""
-    session = load_store(session)
+    session = load_session(session)
     bounds = _get_date_filter_bounds(session)
     if bounds is None:
         return ""
@@ -582,17 +636,18 @@ def update_date_filter_indicator(
         Output("loc-id-dropdown", "options"),
         Output("loc-id-dropdown", "value"),
         Output("pmap-neighbors", "value"),
+        Output("pmap-warm-start", "value"),
     ],
     Input("session", "data"),
     prevent_initial_call=True,
 )
-@log_and_prevent_update("app.callbacks.session", fallback=([],) * 11)
+@log_and_prevent_update("app.callbacks.session", fallback=([],) * 12)
 def update_dropdowns(session: Optional[str]) -> tuple:
     """Populate every plotting/feature/location dropdown from the session's
     remembered plotting_data defaults."""
     if session is None:
-        return [], [], [], [], [], [], [], [], [], [], []
-    session = load_store(session)
+        return [], [], [], [], [], [], [], [], [], [], [], []
+    session = load_session(session)
     plotting_data = session["plotting_data"]
     return (
         plotting_data["map_group_dropdown_options"],
@@ -606,6 +661,7 @@ def update_dropdowns(session: Optional[str]) -> tuple:
         plotting_data["loc_id_dropdown_options"],
         plotting_data["loc_id_dropdown_value"],
         plotting_data["pmap_neighbors"],  # Default value for neighbors
+        ["warm"] if plotting_data.get("pmap_warm_start") else [],
     )
 
 
@@ -626,7 +682,7 @@ def populate_color_picker_group_dropdown(
     group (including user-created custom groups) and open the modal."""
     if meta_data is None:
         raise PreventUpdate
-    meta_data = load_store(meta_data)
+    meta_data = load_session(meta_data)
     plotting_groups = meta_data["cols_key_meta"]["plotting_groups"]
     return plotting_groups, None, True
 
@@ -665,7 +721,7 @@ def populate_color_picker_value_list(
     pre-filled with its effective (override-merged) color."""
     if not group_col or meta_data is None:
         return []
-    meta_data = load_store(meta_data)
+    meta_data = load_session(meta_data)
     overrides = load_store(custom_color_overrides) or {}
     default_colors = meta_data["dict_generic_colors"].get(group_col, {})
     effective_colors = merge_color_overrides({group_col: default_colors}, overrides)[group_col]
@@ -701,7 +757,7 @@ def apply_color_overrides(
     session["custom_color_overrides"][group_col] and close the modal."""
     if not group_col or session is None:
         raise PreventUpdate
-    session = load_store(session)
+    session = load_session(session)
     overrides = load_store(custom_color_overrides) or {}
     group_overrides = dict(overrides.get(group_col, {}))
     for id_, hex_color in zip(swatch_ids, swatch_values):
@@ -709,7 +765,7 @@ def apply_color_overrides(
     overrides[group_col] = group_overrides
     session["custom_color_overrides"] = overrides
     logger.info("Applied %d color override(s) for group '%s'", len(group_overrides), group_col)
-    return dump_store(session), dump_store(overrides), False
+    return dump_session(session, session.get("workspace_id")), dump_store(overrides), False
 
 
 # COLOR PICKER: reset a group's colors back to the auto-generated/predefined defaults
@@ -736,8 +792,8 @@ def reset_color_overrides(
     the default palette, and re-render the now-unoverridden swatch rows."""
     if not group_col or session is None or meta_data is None:
         raise PreventUpdate
-    session = load_store(session)
-    meta_data = load_store(meta_data)
+    session = load_session(session)
+    meta_data = load_session(meta_data)
     overrides = load_store(custom_color_overrides) or {}
     overrides.pop(group_col, None)
     session["custom_color_overrides"] = overrides
@@ -747,7 +803,7 @@ def reset_color_overrides(
         for value, hex_color in sorted(default_colors.items(), key=lambda kv: str(kv[0]))
     ]
     logger.info("Reset color overrides for group '%s'", group_col)
-    return dump_store(session), dump_store(overrides), rows
+    return dump_session(session, session.get("workspace_id")), dump_store(overrides), rows
 
 
 # GENERATE THE MAP
@@ -792,7 +848,7 @@ def update_map(
     # find what is triggering the callback
     ctx_call = ctx.triggered_id
 
-    meta_data = load_store(meta_data)
+    meta_data = load_session(meta_data)
 
     df_coords = pd.read_json(io.StringIO(meta_data["df_coordinate"]))
 
@@ -854,7 +910,7 @@ def patch_map_colors(
     """
     if not map_group or meta_data is None or not current_fig:
         raise PreventUpdate
-    meta_data = load_store(meta_data)
+    meta_data = load_session(meta_data)
     overrides = load_store(custom_color_overrides) or {}
     default_colors = meta_data["dict_generic_colors"].get(map_group, {})
     effective_colors = merge_color_overrides({map_group: default_colors}, overrides).get(
@@ -892,6 +948,9 @@ def store_map_relayout_data(relayoutData: Optional[dict]) -> Any:
 @app.callback(
     Output("working-data", "data"),
     Output("session", "data", allow_duplicate=True),
+    Output("dimred-job", "data"),
+    Output("dimred-job-poll", "disabled"),
+    Output("dimred-job-status", "style"),
     [
         Input(component_id="apply-button", component_property="n_clicks"),
     ],
@@ -900,6 +959,7 @@ def store_map_relayout_data(relayoutData: Optional[dict]) -> Any:
         State(component_id="feature-selection-dropdown", component_property="value"),
         State(component_id="loc-id-dropdown", component_property="value"),
         State(component_id="pmap-neighbors", component_property="value"),
+        State("pmap-warm-start", "value"),
         State("map-group-dropdown", "value"),
         State("plot-group-dropdown-1", "value"),
         State("plot-group-dropdown-2", "value"),
@@ -915,21 +975,29 @@ def process_working_data(
     feature_selection: Optional[List[str]],
     loc_id_selection: Optional[List[str]],
     n_neighbors: Optional[int],
+    pmap_warm_start: Optional[List[str]],
     map_group: Optional[str],
     plot_group_1: Optional[str],
     plot_group_2: Optional[str],
     date_filter_start: Optional[str],
     date_filter_end: Optional[str],
-) -> Tuple[Optional[str], Any]:
-    """Run PCA/PaCMAP on the selected analytes/locations and store the results."""
+) -> tuple:
+    """Run PCA/PaCMAP on the selected analytes/locations and store the results.
+
+    With Redis available, PCA runs inline and is returned straight away (the
+    PaCMAP panel shows a placeholder), while PaCMAP is queued as a background
+    job (see src/job_runner.py) whose results `poll_dimred_job` delivers;
+    otherwise both run inline as before."""
+    no_job = (None, True, DIMRED_JOB_HIDDEN)
     if session is None:
-        return None, dash.no_update
+        return (None, dash.no_update, *no_job)
     if not feature_selection or not loc_id_selection:
-        return None, dash.no_update
+        return (None, dash.no_update, *no_job)
 
-    session = load_store(session)
+    session_raw = session
+    session = load_session(session)
     meta_data = session["meta_data"]
-    df_master = json_to_pandas(session, "df_master", meta_data["cols_key_meta"]["date"])
+    df_master = load_frame(session, "df_master", meta_data["cols_key_meta"]["date"])
 
     if not isinstance(n_neighbors, int) or not (1 <= n_neighbors < len(df_master)):
         logger.warning(
@@ -937,44 +1005,135 @@ def process_working_data(
             n_neighbors,
             len(df_master),
         )
-        return None, dash.no_update
-
-    cols_meta = meta_data["cols_key_plot"]["meta"]
-    cols_numeric_simple = meta_data["cols_key_plot"]["numeric_simple"]
-    cols_numeric_clr = meta_data["cols_key_plot"]["numeric_clr"]
-    col_loc_id = meta_data["cols_key_meta"]["loc_id"]
-    col_date = meta_data["cols_key_meta"]["date"]
-    date_filter_range = (
-        [date_filter_start, date_filter_end] if date_filter_start and date_filter_end else None
-    )
-    plot_components_pca, plot_components_pmap = process_dimension_reduction(
-        df_master,
-        col_loc_id,
-        cols_meta,
-        cols_numeric_simple,
-        cols_numeric_clr,
-        feature_selection,
-        loc_id_selection,
-        n_neighbors,
-        col_date=col_date,
-        date_range=date_filter_range,
+        return (None, dash.no_update, *no_job)
+
+    request = {
+        "feature_selection": feature_selection,
+        "loc_id_selection": loc_id_selection,
+        "n_neighbors": n_neighbors,
+        "pmap_warm_start": bool(pmap_warm_start),
+        "date_filter_range": (
+            [date_filter_start, date_filter_end] if date_filter_start and date_filter_end else None
+        ),
+        "map_group": map_group,
+        "plot_group_1": plot_group_1,
+        "plot_group_2": plot_group_2,
+    }
+    workspace_id = session.get("workspace_id")
+    if workspace_id and is_session_handle(load_store(session_raw)) and jobs_available():
+        dict_working_data, session = build_pca_working_data(session, request)
+        session_raw = dump_session(session, workspace_id)
+        job_id = submit_pmap_job(session_raw, workspace_id, request)
+        logger.info("Queued PaCMAP job %s", job_id)
+        return (
+            dump_session(dict_working_data, workspace_id),
+            session_raw,
+            job_id,
+            False,
+            DIMRED_JOB_VISIBLE,
+        )
+
+    dict_working_data, session = build_working_data(session, request)
+    return (
+        dump_session(dict_working_data, workspace_id),
+        dump_session(session, workspace_id),
+        *no_job,
     )
 
-    dict_working_data = SessionManager.package_plotting_data(
-        plot_components_pca, plot_components_pmap, meta_data
+
+def _with_pmap_status(working_data: Optional[str], message: str) -> Any:
+    """`working-data` re-published with `pmap_status` set, so the PaCMAP panel
+    shows `message` in place of the "computing" placeholder (see
+    DataPlotter.plot_pmap). no_update if there is no working data."""
+    if working_data is None:
+        return dash.no_update
+    handle = load_store(working_data)
+    dict_working_data = load_session(working_data)
+    dict_working_data["pmap_status"] = message
+    workspace_id = handle["workspace"] if is_session_handle(handle) else None
+    return dump_session(dict_working_data, workspace_id)
+
+
+# POLL A BACKGROUND APPLY JOB
+@app.callback(
+    Output("working-data", "data", allow_duplicate=True),
+    Output("session", "data", allow_duplicate=True),
+    Output("dimred-job", "data", allow_duplicate=True),
+    Output("dimred-job-poll", "disabled", allow_duplicate=True),
+    Output("dimred-job-status", "style", allow_duplicate=True),
+    Output("dimred-job-progress", "value"),
+    Output("dimred-job-progress", "label"),
+    Output("global-alert-container", "children", allow_duplicate=True),
+    Input("dimred-job-poll", "n_intervals"),
+    State("dimred-job", "data"),
+    State("working-data", "data"),
+    State("session", "data"),
+    prevent_initial_call=True,
+)
+@log_and_prevent_update("app.callbacks.jobs", fallback=(dash.no_update,) * 8)
+def poll_dimred_job(
+    n_intervals: Optional[int],
+    job_id: Optional[str],
+    working_data: Optional[str],
+    session: Optional[str],
+) -> tuple:
+    """Report a background Apply job's progress, and once it finishes hand its
+    working-data handle to the Store, merge its results into the current
+    session (see merge_pmap_job_session) and stop polling. A cancelled
+    or failed job leaves the PCA results in place and marks the PaCMAP panel
+    with why its embedding isn't coming."""
+    if not job_id:
+        raise PreventUpdate
+    job = get_job(job_id)
+    status = job["status"]
+    label = f"{job.get('message', '')} ({job['progress']}%)"
+    if status not in JOB_FINISHED:
+        return (
+            dash.no_update,
+            dash.no_update,
+            dash.no_update,
+            False,
+            DIMRED_JOB_VISIBLE,
+            job["progress"],
+            label,
+            dash.no_update,
+        )
+
+    finished = (None, True, DIMRED_JOB_HIDDEN, 0, "")
+    if status == JOB_DONE:
+        if session is None:
+            return (job["working_data"], job["session"], *finished, dash.no_update)
+        session = merge_pmap_job_session(load_session(session), load_session(job["session"]))
+        session_raw = dump_session(session, session.get("workspace_id"))
+        return (job["working_data"], session_raw, *finished, dash.no_update)
+    if status == JOB_CANCELLED:
+        cancelled = _with_pmap_status(working_data, "PaCMAP cancelled - click Apply to rerun.")
+        return (cancelled, dash.no_update, *finished, dash.no_update)
+    alert = dbc.Alert(
+        f"PaCMAP failed: {job.get('error', 'unknown error')}",
+        color="danger",
+        dismissable=True,
     )
-    session["working_data"] = dict_working_data
-    dct_plotting_data = {
-        "feature_selection_dropdown_value": feature_selection,
-        "loc_id_dropdown_value": loc_id_selection,
-        "date_filter_range_dropdown_value": date_filter_range,
-        "map_group_dropdown_value": map_group,
-        "plot_group_dropdown_1_value": plot_group_1,
-        "plot_group_dropdown_2_value": plot_group_2,
-        "pmap_neighbors": n_neighbors,
-    }
-    session["plotting_data"].update(dct_plotting_data)
-    return dump_store(dict_working_data), dump_store(session)
+    failed = _with_pmap_status(working_data, "PaCMAP failed - see the error above.")
+    return (failed, dash.no_update, *finished, alert)
+
+
+# CANCEL A BACKGROUND APPLY JOB
+@app.callback(
+    Output("dimred-job-progress", "label", allow_duplicate=True),
+    Input("dimred-job-cancel", "n_clicks"),
+    State("dimred-job", "data"),
+    prevent_initial_call=True,
+)
+@log_and_prevent_update("app.callbacks.jobs")
+def cancel_dimred_job(n_clicks: Optional[int], job_id: Optional[str]) -> Any:
+    """Flag the in-flight Apply job for cancellation; poll_dimred_job hides the
+    progress bar once the job acknowledges it."""
+    if not n_clicks or not job_id:
+        raise PreventUpdate
+    cancel_job(job_id)
+    logger.info("Cancellation requested for job %s", job_id)
+    return "Cancelling..."
 
 
 # populate the PCA X/Y component dropdowns from however many PCs were computed
@@ -1001,8 +1160,8 @@ def update_pca_component_dropdowns(
     PC1/PC2."""
     if working_data is None:
         raise PreventUpdate
-    working_data = load_store(working_data)
-    ldg_df = pd.read_json(io.StringIO(working_data["ldg_df"]))
+    working_data = load_session(working_data)
+    ldg_df = decode_frame(working_data["ldg_df"])
     components = sorted(
         (c for c in ldg_df.columns if c != "metals"), key=lambda c: int(c[2:])
     )
@@ -1029,7 +1188,7 @@ def update_loc_id_dropdown(
     if selectedData is None:
         if meta_data is None:
             return []
-        meta_data = load_store(meta_data)
+        meta_data = load_session(meta_data)
         return meta_data["loc_id_all"]
     selected_loc_ids = []
     for point in selectedData.get("points", []):
@@ -1086,15 +1245,20 @@ def open_blank_custom_group_modal(
     """
     if session is None:
         raise PreventUpdate
-    session = load_store(session)
+    session = load_session(session)
     meta_data = session["meta_data"]
     cols_key_meta = meta_data["cols_key_meta"]
-    df_master = json_to_pandas(session, "df_master", cols_key_meta["date"])
+    df_master = load_frame(session, "df_master", cols_key_meta["date"])
     # Restrict to the last-Applied date Filter, same as process_dimension_reduction/
     # process_clustering, so a manual assignment can never target an entity the
     # Filter excluded (see design decision on export-marker precedence).
     date_filter_range = session["plotting_data"].get("date_filter_range_dropdown_value")
-    df_master = subset_df_dateRange(df_master, cols_key_meta["date"], date_filter_range)
+    df_master = subset_df_dateRange(
+        df_master,
+        cols_key_meta["date"],
+        date_filter_range,
+        date_index=load_date_index(session, df_master, cols_key_meta["date"]),
+    )
     options = _build_entity_dropdown_options(
         df_master, cols_key_meta["loc_id"], cols_key_meta["entity_id"], cols_key_meta["date"]
     )
@@ -1143,19 +1307,24 @@ def populate_custom_group_from_selection(
     """
     if session is None:
         raise PreventUpdate
-    session = load_store(session)
+    session = load_session(session)
     meta_data = session["meta_data"]
     cols_key_meta = meta_data["cols_key_meta"]
     loc_id_col = cols_key_meta["loc_id"]
     entity_id_col = cols_key_meta["entity_id"]
     date_col = cols_key_meta["date"]
-    df_master = json_to_pandas(session, "df_master", date_col)
+    df_master = load_frame(session, "df_master", date_col)
     # Restrict to the last-Applied date Filter (see open_blank_custom_group_modal) -
     # a lasso selection may visually include Filter-excluded points (the map/plots
     # aren't Filter-aware), but they silently drop out of df_master here and so
     # can never be assigned to a category.
     date_filter_range = session["plotting_data"].get("date_filter_range_dropdown_value")
-    df_master = subset_df_dateRange(df_master, date_col, date_filter_range)
+    df_master = subset_df_dateRange(
+        df_master,
+        date_col,
+        date_filter_range,
+        date_index=load_date_index(session, df_master, date_col),
+    )
 
     selected_entity_ids: List[str] = []
     if map_selected:
@@ -1266,7 +1435,7 @@ def finalize_custom_group(
             ),
         )
 
-    session = load_store(session)
+    session = load_session(session)
     session = SessionManager.add_custom_group(session, new_col_name.strip(), draft)
     alert = dbc.Alert(
         f"✅ Custom group '{new_col_name}' created. Click 'Apply' to include it in "
@@ -1275,7 +1444,14 @@ def finalize_custom_group(
         dismissable=True,
         duration=10000,
     )
-    return dump_store(session), dump_store(session["meta_data"]), False, {}, alert
+    workspace_id = session.get("workspace_id")
+    return (
+        dump_session(session, workspace_id),
+        dump_session(session["meta_data"], workspace_id),
+        False,
+        {},
+        alert,
+    )
 
 
 # CUSTOM GROUP: auto-generate categories via KMeans clustering, straight into the draft
@@ -1314,13 +1490,13 @@ def run_clustering_into_draft(
     if session is None:
         raise PreventUpdate
 
-    session = load_store(session)
+    session = load_session(session)
     meta_data = session["meta_data"]
     cols_key_meta = meta_data["cols_key_meta"]
     cols_key_plot = meta_data["cols_key_plot"]
     entity_id_col = cols_key_meta["entity_id"]
     date_col = cols_key_meta["date"]
-    df_master = json_to_pandas(session, "df_master", date_col)
+    df_master = load_frame(session, "df_master", date_col)
 
     # Same analytes/locations/date-Filter last applied to the PCA/PaCMAP
     # plots (not necessarily whatever the dropdowns/picker are currently
@@ -1343,6 +1519,17 @@ def run_clustering_into_draft(
         n_clusters,
         col_date=date_col,
         date_range=date_filter_range,
+        log_composition=load_log_composition(
+            session, df_master, cols_key_plot["numeric_clr"]
+        ),
+        selection_index=load_selection_index(
+            session,
+            df_master,
+            cols_key_meta["loc_id"],
+            date_col,
+            cols_key_plot["numeric_simple"],
+            cols_key_plot["numeric_clr"],
+        ),
     )
     assignments = {
         f"Cluster {label}": group[entity_id_col].tolist()
@@ -1351,7 +1538,12 @@ def run_clustering_into_draft(
 
     # Entity dropdown for any further manual adjustment in this same modal
     # session should also only offer Filter-included entities.
-    df_master_filtered = subset_df_dateRange(df_master, date_col, date_filter_range)
+    df_master_filtered = subset_df_dateRange(
+        df_master,
+        date_col,
+        date_filter_range,
+        date_index=load_date_index(session, df_master, date_col),
+    )
     options = _build_entity_dropdown_options(
         df_master_filtered, cols_key_meta["loc_id"], entity_id_col, date_col
     )
@@ -1393,11 +1585,11 @@ def download_color_mapping_csv(
     """Export every row's effective (override-merged) color per plotting group."""
     if session is None:
         return dash.no_update
-    session = load_store(session)
+    session = load_session(session)
     meta_data = session["meta_data"]
     overrides = load_store(custom_color_overrides) or {}
     effective_colors = merge_color_overrides(meta_data["dict_generic_colors"], overrides)
-    df_master = json_to_pandas(session, "df_master", meta_data["cols_key_meta"]["date"])
+    df_master = load_frame(session, "df_master", meta_data["cols_key_meta"]["date"])
     df_export = build_color_mapping_export_df(
         df_master,
         meta_data["cols_key_meta"]["plotting_groups"],
@@ -1420,14 +1612,14 @@ def download_custom_groups_csv(n_clicks: Optional[int], session: Optional[str])
     """Export the ENTITY_ID -> LOCATION_ID -> DATE -> custom-group-columns lookup."""
     if session is None:
         return dash.no_update
-    session = load_store(session)
+    session = load_session(session)
     meta_data = session["meta_data"]
     custom_group_columns = meta_data.get("custom_group_columns", [])
     if not custom_group_columns:
         logger.warning("Download custom groups CSV requested but no custom groups exist yet.")
         return dash.no_update
     cols_key_meta = meta_data["cols_key_meta"]
-    df_master = json_to_pandas(session, "df_master", cols_key_meta["date"])
+    df_master = load_frame(session, "df_master", cols_key_meta["date"])
     date_filter_range = session["plotting_data"].get("date_filter_range_dropdown_value")
     df_export = build_custom_group_export_df(
         df_master,
@@ -1442,10 +1634,27 @@ def download_custom_groups_csv(n_clicks: Optional[int], session: Optional[str])
 
 
 # plotting callbacks
+def _sole_trigger() -> Optional[str]:
+    """ID of the one Input that fired the current callback, or None when
+    several fired together (e.g. on a session load)."""
+    return ctx.triggered_id if len(ctx.triggered_prop_ids) == 1 else None
+
+
+def _scatter_layouts(layouts: Dict[str, Optional[str]], fig_pca: Any, fig_pmap: Any) -> Any:
+    """scatter-layouts Store value after sending `fig_pca`/`fig_pmap`: each
+    rebuilt figure's layout signature, unchanged for a patched one."""
+    updated = dict(layouts)
+    for kind, fig in (("pca", fig_pca), ("pmap", fig_pmap)):
+        if isinstance(fig, dict):
+            updated[kind] = figure_layout_signature(fig)
+    return updated if updated != layouts else dash.no_update
+
+
 @app.callback(
     [
         Output(component_id="pca-plot", component_property="figure"),
         Output(component_id="pmap-plot", component_property="figure"),
+        Output(component_id="scatter-layouts", component_property="data"),
     ],
     [
         Input("working-data", "data"),
@@ -1460,10 +1669,11 @@ def download_custom_groups_csv(n_clicks: Optional[int], session: Optional[str])
     [
         State(component_id="meta-data", component_property="data"),
         State(component_id="pmap-neighbors", component_property="value"),
+        State(component_id="scatter-layouts", component_property="data"),
     ],
     prevent_initial_call=True,
 )
-@log_and_prevent_update("app.callbacks.plotting", fallback=DataPlotter.empty_figs())
+@log_and_prevent_update("app.callbacks.plotting", fallback=(*DataPlotter.empty_figs(), None))
 def plot_data(
     working_data: Optional[str],
     selectedData: Optional[dict],
@@ -1475,18 +1685,55 @@ def plot_data(
     pca_y_component: Optional[str],
     meta_data: Optional[str],
     n_neighbors: Optional[int],
-) -> Tuple[Any, Any]:
-    """Rebuild the PCA and PaCMAP biplots from the current working data/selection."""
+    scatter_layouts: Optional[Dict[str, Optional[str]]],
+) -> Tuple[Any, Any, Any]:
+    """Rebuild the PCA and PaCMAP biplots from the current working data/selection.
+
+    A color override or a PCA component change alone keeps every trace, so
+    those send a dash.Patch (a few KB) instead of the rebuilt figures - as
+    long as the trace layout recorded in scatter-layouts for the figure in
+    the browser still holds; otherwise that figure is rebuilt. Other changes
+    reuse a recently rendered figure from figure_cache when the same view
+    was drawn before, and only build what isn't cached."""
     if working_data is None:
-        return DataPlotter.empty_figs()
-
+        return (*DataPlotter.empty_figs(), None)
+
+    x_col, y_col = pca_x_component or "PC1", pca_y_component or "PC2"
+    trigger = _sole_trigger()
+    layouts = scatter_layouts or {}
+    # A patch addresses traces by index, so it needs the layout signature of
+    # the PCA figure it is applied to.
+    patch_only = (
+        trigger in ("custom-color-overrides", "pca-x-component", "pca-y-component")
+        and layouts.get("pca") is not None
+    )
+    cache_inputs = (
+        working_data,
+        meta_data,
+        custom_color_overrides,
+        selectedData,
+        [plot_group_1, plot_group_2],
+        date_range,
+    )
+    key_pca = figure_cache_key("pca", *cache_inputs, view=(x_col, y_col))
+    key_pmap = figure_cache_key("pmap", *cache_inputs, view=(n_neighbors,))
+    fig_pca = fig_pmap = None
+    if not patch_only:
+        fig_pca, fig_pmap = get_figure(key_pca), get_figure(key_pmap)
+        if fig_pca is not None and fig_pmap is not None:
+            return fig_pca, fig_pmap, _scatter_layouts(layouts, fig_pca, fig_pmap)
+
+    # A snapshot handle's digest names the working data's content, so
+    # DataPlotter can cache what it derives from it.
+    handle = load_store(working_data)
+    working_data_key = handle["digest"] if is_session_handle(handle) else None
+    working_data = load_session(working_data)
+    meta_data = load_session(meta_data)
     overrides = load_store(custom_color_overrides) or {}
     if overrides and meta_data is not None:
-        meta_data_loaded = load_store(meta_data)
-        meta_data_loaded["dict_generic_colors"] = merge_color_overrides(
-            meta_data_loaded["dict_generic_colors"], overrides
+        meta_data["dict_generic_colors"] = merge_color_overrides(
+            meta_data["dict_generic_colors"], overrides
         )
-        meta_data = dump_store(meta_data_loaded)
 
     data_plotter = DataPlotter(
         working_data,
@@ -1494,12 +1741,23 @@ def plot_data(
         selectedData,
         [plot_group_1, plot_group_2],
         date_range,
+        working_data_key=working_data_key,
     )
-    fig_pca = data_plotter.plot_pca(
-        x_col=pca_x_component or "PC1", y_col=pca_y_component or "PC2"
-    )
-    fig_pmap = data_plotter.plot_pmap(n_neighbors=n_neighbors)
-    return fig_pca, fig_pmap
+    if patch_only and trigger == "custom-color-overrides":
+        fig_pca, fig_pmap = data_plotter.patch_colors(layouts["pca"], layouts.get("pmap"))
+        if data_plotter.df_plot_pmap is None:
+            fig_pmap = dash.no_update  # the placeholder has nothing to recolor
+        elif layouts.get("pmap") is None:
+            fig_pmap = None  # no recorded layout to patch against
+    elif patch_only:
+        fig_pca = data_plotter.patch_pca(x_col=x_col, y_col=y_col, layout_pca=layouts["pca"])
+        fig_pmap = dash.no_update
+    # None here: not cached, or its trace layout changed so it can't be patched.
+    if fig_pca is None:
+        fig_pca = put_figure(key_pca, data_plotter.plot_pca(x_col=x_col, y_col=y_col))
+    if fig_pmap is None:
+        fig_pmap = put_figure(key_pmap, data_plotter.plot_pmap(n_neighbors=n_neighbors))
+    return fig_pca, fig_pmap, _scatter_layouts(layouts, fig_pca, fig_pmap)
 
 
 # TURN OFF FOR DEPLOYMENT WITH GUNICORN
@@ -0,0 +1,105 @@
+// Resumable chunked upload behind #chunked-upload-button (see src/upload_spool.py).
+//
+// The selected file is PUT to /upload/<id> in chunk_bytes slices of raw
+// bytes - no base64 - and only the resulting upload ID reaches Dash, via the
+// upload-file-id store. A failed chunk is retried after asking the server how
+// much it already has, so a dropped request resumes instead of restarting.
+(function () {
+    "use strict";
+
+    var MAX_RETRIES = 5;
+
+    function uploadBase() {
+        var config = document.getElementById("_dash-config");
+        var prefix = "/";
+        if (config) {
+            try {
+                prefix = JSON.parse(config.textContent).requests_pathname_prefix || "/";
+            } catch (e) {
+                prefix = "/";
+            }
+        }
+        return prefix + "upload";
+    }
+
+    function setProps(id, props) {
+        if (window.dash_clientside && window.dash_clientside.set_props) {
+            window.dash_clientside.set_props(id, props);
+        }
+    }
+
+    function setStatus(text) {
+        setProps("chunked-upload-status", {children: text});
+    }
+
+    function request(method, url, body) {
+        return fetch(url, {method: method, body: body, credentials: "same-origin"}).then(
+            function (response) {
+                return response.json().then(function (payload) {
+                    if (!response.ok) {
+                        var error = new Error(payload.error || response.statusText);
+                        error.status = response.status;
+                        throw error;
+                    }
+                    return payload;
+                });
+            }
+        );
+    }
+
+    function sleep(ms) {
+        return new Promise(function (resolve) {
+            setTimeout(resolve, ms);
+        });
+    }
+
+    async function sendChunks(file, base, uploadId, chunkBytes) {
+        var offset = 0;
+        var retries = 0;
+        while (offset < file.size) {
+            var chunk = file.slice(offset, offset + chunkBytes);
+            try {
+                var result = await request("PUT", base + "/" + uploadId + "?offset=" + offset, chunk);
+                offset = result.received;
+                retries = 0;
+                setStatus("Uploading " + Math.floor((100 * offset) / file.size) + "%");
+            } catch (error) {
+                if (++retries > MAX_RETRIES || error.status === 404 || error.status === 413) {
+                    throw error;
+                }
+                await sleep(500 * retries);
+                offset = (await request("GET", base + "/" + uploadId)).received;
+            }
+        }
+    }
+
+    async function upload(file) {
+        var base = uploadBase();
+        setStatus("Uploading 0%");
+        var started = await request("POST", base);
+        await sendChunks(file, base, started.upload_id, started.chunk_bytes);
+        await request("POST", base + "/" + started.upload_id + "/complete");
+        setStatus("");
+        setProps("upload-file-id", {data: {upload_id: started.upload_id, filename: file.name}});
+    }
+
+    // The button is rendered by React after this script runs, so listen on
+    // the document rather than binding to the element.
+    document.addEventListener("click", function (event) {
+        if (!event.target || !event.target.closest("#chunked-upload-button")) {
+            return;
+        }
+        var input = document.createElement("input");
+        input.type = "file";
+        input.accept = ".csv,text/csv";
+        input.addEventListener("change", function () {
+            if (!input.files.length) {
+                return;
+            }
+            upload(input.files[0]).catch(function (error) {
+                setStatus("Upload failed: " + error.message);
+            });
+        });
+        input.click();
+    });
+})();
@@ -375,13 +375,14 @@ range_slider_date_filter = html.Div(
 )
 
 
+# Not a dcc.Upload: assets/chunked_upload.js opens a file picker for this
+# button, sends the raw file to the /upload routes (src/upload_spool.py) in
+# chunks and sets upload-file-id once it has landed, so the file is never
+# base64'd into a callback payload.
 uploaders = html.Div(
     children=[
-        dcc.Upload(
-            id="upload-data",
-            children=html.Button("Upload File"),
-            multiple=False,
-        ),
+        html.Button("Upload File", id="chunked-upload-button"),
+        html.Small(id="chunked-upload-status", className="ms-2 align-self-center"),
     ],
     className="d-flex justify-content-center",
     style=BUTTON_STYLE,
@@ -493,6 +494,13 @@ dropdown_n_neighbers = html.Div(
             value=15,
             style=DROPDOWN_NUM_STYLE,
         ),
+        # Start PaCMAP from the previous embedding (see
+        # dimension_reduction_functions.warm_start_init).
+        dcc.Checklist(
+            id="pmap-warm-start",
+            options=[{"label": " Warm start", "value": "warm"}],
+            value=[],
+        ),
     ]
 )
 
@@ -570,10 +578,37 @@ apply_row = html.Div(
     className="d-flex flex-row align-items-end",
 )
 
+# Progress/cancel for a background Apply job (see src/job_runner.py). Hidden
+# until a job is submitted; dimred-job-poll drives the progress updates.
+dimred_job_status = html.Div(
+    id="dimred-job-status",
+    children=[
+        dbc.Progress(
+            id="dimred-job-progress",
+            value=0,
+            label="",
+            striped=True,
+            animated=True,
+            style={"flex": "1", "height": "20px", "margin-right": "8px"},
+        ),
+        dbc.Button(
+            "Cancel",
+            id="dimred-job-cancel",
+            color="secondary",
+            size="sm",
+            outline=True,
+        ),
+        dcc.Interval(id="dimred-job-poll", interval=750, n_intervals=0, disabled=True),
+    ],
+    className="align-items-center",
+    style={"display": "none"},
+)
+
 selector_div = html.Div(
     children=[
         range_slider_date_filter,
         apply_row,
+        dimred_job_status,
         dropdown_loc_ids,
         dropdown_features,
     ],
@@ -611,15 +646,24 @@ def create_page_map():
             ),  # TODO: consider using 'session' storage for plotting data to reduce parsing/unparsing JSON each time plot is updated
             dcc.Store(id="side_click"),
             dcc.Store(id="map-relayout-store"),
+            dcc.Store(
+                id="upload-file-id", storage_type="memory"
+            ),  # {upload_id, filename}, set by assets/chunked_upload.js once a file is spooled
             dcc.Store(
                 id="raw-upload-store"
-            ),  # {content_string, columns} for the pending upload, staged until mapping is confirmed
+            ),  # {upload_id, columns} for the pending upload, staged until mapping is confirmed
             dcc.Store(
                 id="custom-color-overrides", storage_type="memory"
             ),  # mirrors session["custom_color_overrides"], cheap Input for update_map/plot_data
             dcc.Store(
                 id="custom-group-draft", storage_type="memory"
             ),  # {category_value: [entity_id, ...]} while custom-group-modal is open
+            dcc.Store(
+                id="dimred-job", storage_type="memory"
+            ),  # job ID of the in-flight background Apply, see src/job_runner.py
+            dcc.Store(
+                id="scatter-layouts", storage_type="memory"
+            ),  # {"pca"/"pmap": trace layout signature} of the biplots shown, see plot_data
             navbar,
             sidebar,
             floating_alert_container,
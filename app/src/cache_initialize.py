@@ -1,33 +1,107 @@
 import hashlib
-from typing import Any
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+import numpy as np
 from pandas import DataFrame
 from pandas.util import hash_pandas_object
 
+# Byte budget for the per-process decoded-DataFrame cache (see frame_cache
+# below). Each gunicorn worker holds its own copy.
+FRAME_CACHE_MAX_BYTES = int(os.getenv("FRAME_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Byte budget for the per-process PaCMAP neighbor-graph cache (see
+# knn_graph_cache below).
+KNN_GRAPH_CACHE_MAX_BYTES = int(os.getenv("KNN_GRAPH_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+# Byte budget for the per-process log-composition cache (see
+# log_composition_cache below).
+LOG_COMPOSITION_CACHE_MAX_BYTES = int(
+    os.getenv("LOG_COMPOSITION_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
+# Byte budget for the per-process selection-index cache (see
+# selection_index_cache below).
+SELECTION_INDEX_CACHE_MAX_BYTES = int(
+    os.getenv("SELECTION_INDEX_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+)
+# Byte budget for the per-process date-index cache (see date_index_cache
+# below).
+DATE_INDEX_CACHE_MAX_BYTES = int(os.getenv("DATE_INDEX_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Byte budget for the per-process rendered-figure cache (see figure_cache
+# below), counted in characters of figure JSON.
+FIGURE_CACHE_MAX_BYTES = int(os.getenv("FIGURE_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+
 
 def make_custom_cache_key_dimensionReduction(*args: Any, **kwargs: Any) -> str:
     """
     Generate a cache key for the dimension reduction functions.
 
-    Not currently wired up to any Flask-Caching decorator - caching is
-    scaffolded but unused (see GOTCHAS.md). Kept as ordinary unused code, not
-    a dead-code block to remove.
+    Used by result_cache.cached_dimension_reduction (which hashes it into a
+    fixed-length Redis key). `date_range` is only appended when passed, so
+    keys built without it are unchanged.
     """
     keys = []
     keys.append(str(kwargs.get("feature_selection")))
     keys.append(str(kwargs.get("loc_id_selection")))
     keys.append(str(kwargs.get("n_neighbors")))
     keys.append(str(kwargs.get("data_hash")))
+    if "date_range" in kwargs:
+        keys.append(str(kwargs["date_range"]))
     return "_".join(keys)  # Joining the keys into a single string for the cache key
 
 
+# Prefix of fingerprints from generate_df_hash_version; bare 32-character md5
+# digests are version 1 (see generate_df_hash_version_legacy).
+DATA_HASH_VERSION = 2
+_DATA_HASH_PREFIX = f"v{DATA_HASH_VERSION}:"
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, elementwise on uint64 (wrapping arithmetic)."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
 def generate_df_hash_version(df: DataFrame) -> str:
     """
-    Generate a hash for the dataframe by sorting it first to ensure consistency,
-    even if the order of rows or columns changes.
+    Fingerprint the dataframe's contents independently of row and column
+    order, without sorting it.
+
+    Each row is hashed with hash_pandas_object (columns taken in name order)
+    and the row hashes are combined commutatively - their wrapping sum, plus
+    the sum of a remixed copy so structured inputs don't cancel out. The two
+    sums, the row count and the column names/dtypes are digested with
+    blake2b. Linear in the frame size, where the version 1 hash mergesorted
+    every column first.
 
     Actively used by DataPreprocessor.__init__ (data_manager.py) to fingerprint
-    uploaded data - unlike make_custom_cache_key_dimensionReduction above, this
-    function is not dead/unused code.
+    uploaded data. Returns `"v2:<hex>"`; see `data_hash_matches` for values
+    stored by older versions.
+    """
+    df = df.reindex(columns=sorted(df.columns, key=str))
+    row_hashes = hash_pandas_object(df, index=False).to_numpy()
+    sums = np.array(
+        [row_hashes.sum(dtype=np.uint64), _mix64(row_hashes).sum(dtype=np.uint64)],
+        dtype="<u8",
+    )
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(
+        json.dumps([len(df), [[str(col), str(dtype)] for col, dtype in df.dtypes.items()]]).encode()
+    )
+    digest.update(sums.tobytes())
+    return _DATA_HASH_PREFIX + digest.hexdigest()
+
+
+def generate_df_hash_version_legacy(df: DataFrame) -> str:
+    """
+    The version 1 fingerprint: sort the rows by every column (and the
+    columns by name), then md5 the hash_pandas_object values. Only kept to
+    check `data_hash` values stored before version 2 - see
+    `data_hash_matches`.
     """
     # Sort the DataFrame to ensure consistent ordering
     sorted_df = df.sort_values(by=list(df.columns), kind="mergesort").sort_index(
@@ -41,3 +115,131 @@ def generate_df_hash_version(df: DataFrame) -> str:
     data_hash = hashlib.md5(hashable_data).hexdigest()
 
     return data_hash
+
+
+def data_hash_version(data_hash: str) -> int:
+    """Which generate_df_hash_version produced `data_hash` (1 = legacy md5)."""
+    if data_hash.startswith("v") and ":" in data_hash:
+        return int(data_hash[1 : data_hash.index(":")])
+    return 1
+
+
+def data_hash_matches(df: DataFrame, data_hash: str) -> bool:
+    """Whether `df` has the stored fingerprint `data_hash`, recomputing it
+    with whichever hash version produced it."""
+    if data_hash_version(data_hash) == 1:
+        return generate_df_hash_version_legacy(df) == data_hash
+    return generate_df_hash_version(df) == data_hash
+
+
+def dataframe_nbytes(df: DataFrame) -> int:
+    """Approximate in-memory size of `df`, including object/string payloads."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class LRUCache:
+    """
+    Thread-safe, byte-bounded least-recently-used cache.
+
+    Entries are evicted oldest-first once the summed `sizeof(value)` exceeds
+    `max_bytes`; a single value larger than `max_bytes` is never stored.
+    Hit/miss/eviction counters and the hit rate are kept for logging and
+    tests (`stats()`).
+
+    Parameters
+    ----------
+    max_bytes : int
+        Byte budget across all entries.
+    sizeof : callable
+        Returns the size in bytes of a cached value.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int]) -> None:
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for `key` (marking it most recently used),
+        or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Insert/replace `key`, evicting least-recently-used entries as needed."""
+        nbytes = self._sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        """Counters snapshot: entries, bytes, hits, misses, evictions, and
+        hit_rate (hits / lookups, 0.0 before the first lookup)."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Decoded session DataFrames, keyed by (workspace_id, data_hash, mutation,
+# frame key, date column) - see session_codec.load_frame. Values are never
+# handed out directly; callers get a copy.
+frame_cache = LRUCache(FRAME_CACHE_MAX_BYTES, dataframe_nbytes)
+
+# Sorted nearest-neighbor index arrays, keyed by a digest of the exact matrix
+# PaCMAP embeds (so data, feature selection and row selection are all part of
+# the key) - see neighbor_graph.cached_neighbor_pairs.
+knn_graph_cache = LRUCache(KNN_GRAPH_CACHE_MAX_BYTES, lambda graph: int(graph.nbytes))
+
+# compositional_data_functions.LogComposition of a session's df_master, keyed
+# like frame_cache plus the compositional columns - see
+# session_codec.load_log_composition.
+log_composition_cache = LRUCache(LOG_COMPOSITION_CACHE_MAX_BYTES, lambda logs: logs.nbytes)
+
+# selection_engine.SelectionIndex of a session's df_master, keyed like
+# frame_cache plus the column mapping - see session_codec.load_selection_index.
+selection_index_cache = LRUCache(SELECTION_INDEX_CACHE_MAX_BYTES, lambda index: index.nbytes)
+
+# selection_engine.DateIndex of a working_data frame, keyed by the
+# working-data snapshot digest, frame and date column - see
+# session_codec.load_date_index.
+date_index_cache = LRUCache(DATE_INDEX_CACHE_MAX_BYTES, lambda index: index.nbytes)
+
+# Serialized PCA/PaCMAP figure JSON, keyed by everything the figure is drawn
+# from - see figure_cache.figure_cache_key.
+figure_cache = LRUCache(FIGURE_CACHE_MAX_BYTES, len)
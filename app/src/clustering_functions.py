@@ -13,10 +13,10 @@ import numpy as np
 from pandas import DataFrame
 from sklearn.cluster import KMeans
 
-from .data_process import subset_df_dateRange, subset_df_locIds, subset_df_numericFeatures
-from .compositional_data_functions import clr_transform_scale
+from .compositional_data_functions import LogComposition, clr_transform_scale
 from .dimension_reduction_functions import pca_loading_matrix, MAX_PCA_COMPONENTS
 from .logging_config import get_logger
+from .selection_engine import SelectionIndex, select_frame
 
 logger = get_logger(__name__)
 
@@ -86,6 +86,8 @@ def process_clustering(
     n_clusters: int,
     col_date: Optional[str] = None,
     date_range: Optional[Sequence[str]] = None,
+    log_composition: Optional[LogComposition] = None,
+    selection_index: Optional[SelectionIndex] = None,
 ) -> DataFrame:
     """Subset `df` to the selected date range/locations/analytes, build a
     feature matrix in `feature_space`, and run KMeans on it.
@@ -118,6 +120,12 @@ def process_clustering(
         cluster assignment.
     date_range : list of str, optional
         `[start_date, end_date]`, inclusive. No filtering applied if None.
+    log_composition : LogComposition, optional
+        Precomputed logs of `df`'s compositional columns (see
+        session_codec.load_log_composition).
+    selection_index : SelectionIndex, optional
+        Precomputed row/column lookups for `df` (see
+        session_codec.load_selection_index). Built per call if None.
 
     Returns
     -------
@@ -140,12 +148,16 @@ def process_clustering(
     if feature_space not in FEATURE_SPACE_CHOICES:
         raise ValueError(f"Unknown feature_space {feature_space!r}")
 
-    df = subset_df_dateRange(df, col_date, date_range)
-    df = subset_df_locIds(df, col_loc_id, loc_id_selection)
-    df, cols_numeric_all, cols_numeric_clr_subset = subset_df_numericFeatures(
-        df, cols_numeric_simple, cols_numeric_clr, feature_selection
+    if selection_index is None:
+        selection_index = SelectionIndex(
+            df, col_loc_id, col_date, cols_numeric_simple, cols_numeric_clr
+        )
+    df, cols_numeric_all, cols_numeric_clr_subset = select_frame(
+        df, selection_index, loc_id_selection, feature_selection, date_range
+    )
+    df_clr = clr_transform_scale(
+        df, cols_numeric_all, cols_numeric_clr_subset, log_composition
     )
-    df_clr = clr_transform_scale(df, cols_numeric_all, cols_numeric_clr_subset)
 
     if not isinstance(n_clusters, int) or not (2 <= n_clusters <= len(df_clr)):
         raise ValueError(
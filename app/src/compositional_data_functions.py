@@ -1,6 +1,8 @@
+import threading
+from typing import List, Optional
+
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from pandas import DataFrame
+from pandas import DataFrame, Index
 
 
 def array_anynull(X: np.ndarray) -> bool:
@@ -52,7 +54,170 @@ def clr_transform(X: np.ndarray) -> np.ndarray:
     return Y
 
 
-def clr_transform_scale(df: DataFrame, cols_numeric_all, cols_numeric_clr) -> DataFrame:
+class LogComposition:
+    """log() of a frame's compositional columns, computed once so each
+    selection's CLR is a row/column slice plus a row-mean recentering (the
+    closure divide cancels out of the log-ratio). Cells that can't be logged
+    (zero, negative, missing) hold -inf/NaN, so selections that include them
+    still raise in `clr_standardize`.
+
+    The logs are only taken the first time `values` is read - by
+    `clr_transform_scale` - so a holder that never CLRs (e.g. an Apply
+    served from the result memo) doesn't pay for them. Until then only a
+    float64 copy of the compositional columns is held, logged in place
+    later, so `nbytes` is the same before and after."""
+
+    def __init__(self, df: DataFrame, cols_numeric_clr: List[str]) -> None:
+        self.index: Index = df.index
+        self.columns: List[str] = list(cols_numeric_clr)
+        self._values = np.array(df[self.columns], dtype=np.float64, order="C")
+        self._logged = False
+        self._lock = threading.Lock()
+
+    @property
+    def values(self) -> np.ndarray:
+        """(n_rows, n_columns) float64 logs, computed on first access."""
+        with self._lock:
+            if not self._logged:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    np.log(self._values, out=self._values)
+                self._logged = True
+            return self._values
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the held array (`values`, logged or not)."""
+        return int(self._values.nbytes)
+
+
+def build_log_composition(df: DataFrame, cols_numeric_clr: List[str]) -> LogComposition:
+    """
+    Log every compositional column of `df` (typically df_master), deferred
+    until the logs are first used (see LogComposition).
+
+    Parameters
+    ----------
+    df : DataFrame
+        Frame whose rows later selections are drawn from; its index must be
+        unique.
+    cols_numeric_clr : list
+        Compositional columns.
+
+    Returns
+    -------
+    LogComposition
+    """
+    return LogComposition(df, cols_numeric_clr)
+
+
+def clr_standardize(
+    X: np.ndarray,
+    n_clr: int,
+    out: Optional[np.ndarray] = None,
+    dtype: Optional[np.dtype] = None,
+    logged: bool = False,
+) -> np.ndarray:
+    """
+    Fused CLR + StandardScaler over one contiguous block.
+
+    Equivalent to `clr_transform` on the last `n_clr` columns followed by
+    `StandardScaler().fit_transform` on all of them, but done in place in
+    `out` with no intermediate arrays. The closure step is skipped
+    (log(x / sum(x)) - mean(log(x / sum(x))) == log(x) - mean(log(x))), and
+    the zero/NaN check falls out of the log instead of needing its own pass.
+
+    Parameters
+    ----------
+    X : np.ndarray
+        (n_samples, n_features) analytes, standard-scale-only columns first
+        and the `n_clr` compositional columns last.
+    n_clr : int
+        Number of trailing columns to CLR-transform.
+    out : np.ndarray, optional
+        C-contiguous buffer to write into, same shape as X; may be X itself.
+        Allocated if None. Its contents are unspecified if a ValueError is
+        raised.
+    dtype : np.dtype, optional
+        float64 (default) or float32 when `out` is allocated here; ignored
+        when `out` is given.
+    logged : bool, default False
+        The compositional columns already hold log values (see
+        LogComposition) - skip the log.
+
+    Returns
+    -------
+    np.ndarray
+        `out`.
+
+    Raises
+    ------
+    ValueError
+        If a compositional value is zero, negative or missing.
+    """
+    if out is None:
+        out = np.empty(X.shape, dtype=dtype or np.float64)
+    elif out.shape != X.shape or not out.flags.c_contiguous:
+        raise ValueError("out must be a C-contiguous array shaped like X")
+    if out is not X:
+        np.copyto(out, X, casting="same_kind")
+    n_rows, n_cols = out.shape
+    if n_rows == 0 or n_cols == 0:
+        return out
+
+    if n_clr:
+        block = out[:, n_cols - n_clr :]
+        if not logged:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                np.log(block, out=block)
+        row_mean = block.sum(axis=1, keepdims=True)
+        if not np.isfinite(row_mean).all():
+            raise ValueError(
+                "Missing values or zeros detected in data, please remove before transformation"
+            )
+        row_mean /= n_clr
+        block -= row_mean
+
+    # StandardScaler: population std, near-constant columns left unscaled.
+    simple = out[:, : n_cols - n_clr]
+    if simple.size and np.isnan(simple.sum()):
+        mean = np.nanmean(out, axis=0)
+        out -= mean
+        scale = np.sqrt(np.nanmean(out * out, axis=0))
+    else:
+        mean = out.mean(axis=0)
+        out -= mean
+        scale = np.sqrt(np.einsum("ij,ij->j", out, out) / n_rows)
+    scale[scale < 10 * np.finfo(out.dtype).eps] = 1.0
+    out /= scale
+    return out
+
+
+def _as_slice(positions: np.ndarray) -> Optional[slice]:
+    """`positions` as an equivalent step-1 slice, if it is one."""
+    if len(positions) and (np.diff(positions) == 1).all():
+        return slice(int(positions[0]), int(positions[-1]) + 1)
+    return None
+
+
+def _gather(values: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """values[rows][:, cols], as views rather than gathers wherever the
+    selection is a contiguous run (e.g. every location selected, no date
+    Filter) - a row gather costs more than re-logging the rows would."""
+    row_slice, col_slice = _as_slice(rows), _as_slice(cols)
+    if row_slice is not None:
+        block = values[row_slice]
+        return block[:, col_slice] if col_slice is not None else block[:, cols]
+    if col_slice is not None:
+        return values[rows, col_slice]
+    return values[np.ix_(rows, cols)]
+
+
+def clr_transform_scale(
+    df: DataFrame,
+    cols_numeric_all,
+    cols_numeric_clr,
+    log_composition: Optional[LogComposition] = None,
+) -> DataFrame:
     """
     Centred Log Ratio transformation.
 
@@ -65,13 +230,33 @@ def clr_transform_scale(df: DataFrame, cols_numeric_all, cols_numeric_clr) -> Da
         Columns to transform with StandardScaler
 
     cols_numeric_clr : list
-        Columns to transform with CLR before StandardScaler
+        Columns to transform with CLR before StandardScaler (a subset of
+        cols_numeric_all)
+
+    log_composition : LogComposition, optional
+        Precomputed logs of the frame `df` was subset from. If it covers
+        every row and compositional column of `df`, the CLR columns are
+        sliced from it instead of being logged again.
 
     Returns
     -----
     DataFrame
         Transformed data.
     """
-    df[cols_numeric_clr] = clr_transform(df[cols_numeric_clr].values)
-    df[cols_numeric_all] = StandardScaler().fit_transform(df[cols_numeric_all].values)
+    clr = set(cols_numeric_clr)
+    cols_simple = [col for col in cols_numeric_all if col not in clr]
+    cols = cols_simple + list(cols_numeric_clr)
+    rows = col_idx = None
+    if log_composition is not None and log_composition.index.is_unique:
+        rows = log_composition.index.get_indexer(df.index)
+        col_idx = Index(log_composition.columns).get_indexer(list(cols_numeric_clr))
+    if rows is None or (rows < 0).any() or (col_idx < 0).any():
+        X = np.array(df[cols], dtype=np.float64, order="C")
+        df[cols] = clr_standardize(X, len(cols_numeric_clr), out=X)
+        return df
+
+    X = np.empty((len(df), len(cols)), dtype=np.float64)
+    X[:, : len(cols_simple)] = df[cols_simple].to_numpy(dtype=np.float64)
+    X[:, len(cols_simple) :] = _gather(log_composition.values, rows, col_idx)
+    df[cols] = clr_standardize(X, len(cols_numeric_clr), out=X, logged=True)
     return df
@@ -1,27 +1,44 @@
-from .plotting import make_fig_pca, make_fig_pmap, empty_fig, PlotContext
+from .plotting import (
+    make_fig_pca,
+    make_fig_pmap,
+    empty_fig,
+    placeholder_fig,
+    patch_pca_components,
+    patch_scatter_colors,
+    PlotContext,
+)
 from .data_process import (
     df_col_group_to_dict,
     make_plotting_group_color_dicts,
     make_color_dict,
     assign_custom_group_column,
     extract_coordinate_dataframe,
-    subset_df_locIds,
-    pandas_to_json,
-    json_to_pandas,
+)
+from .session_codec import (
+    SESSION_VERSION,
+    cache_frame,
+    decode_frame,
+    encode_date_index,
+    encode_frame,
+    load_date_index,
+    load_frame,
 )
 from .data_model import ColumnMapping
-from .data_mapping import build_mapped_dataset
+from .data_mapping import build_mapped_dataset, read_mapped_csv
 from .dimension_reduction_functions import MAX_PCA_COMPONENTS
 
 from .cache_initialize import generate_df_hash_version
 from .logging_config import get_logger
 
+import numpy as np
 import pandas as pd
 
 import base64
+import hashlib
 import io
 import json
-from typing import Any, Dict, List, Optional, Tuple
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 logger = get_logger(__name__)
 
@@ -58,10 +75,22 @@ class DataPreprocessor:
     `self.validation.has_errors` before calling `get_session_dict()`.
     """
 
-    def __init__(self, content_string: str, mapping: ColumnMapping) -> None:
+    def __init__(
+        self,
+        content_string: Optional[str],
+        mapping: ColumnMapping,
+        csv_path: Optional[Union[str, os.PathLike]] = None,
+    ) -> None:
+        """`content_string` is the base64 payload of a `dcc.Upload`; pass
+        None and `csv_path` instead to read a spooled upload (see
+        upload_spool) straight from disk. Only `mapping`'s columns are
+        parsed (see data_mapping.read_mapped_csv)."""
         try:
-            decoded = base64.b64decode(content_string)
-            df_raw = pd.read_csv(io.BytesIO(decoded), float_precision="high")
+            if csv_path is not None:
+                source = csv_path
+            else:
+                source = io.BytesIO(base64.b64decode(content_string))
+            df_raw = read_mapped_csv(source, mapping)
             self.content_hash = generate_df_hash_version(df_raw)
         except Exception:
             logger.exception("Failed to decode/parse uploaded CSV content")
@@ -153,7 +182,11 @@ class DataPreprocessor:
         plotting_groups = _require(self.cols_key_meta, "plotting_groups", "cols_key_meta")
         numeric_all = _require(self.cols_key_plot, "numeric_all", "cols_key_plot")
         return {
-            "df_master": pandas_to_json(self.df_master, date_col),
+            "df_master": encode_frame(self.df_master, date_col),
+            # Sorted-date permutation of df_master for the date Filter; rows
+            # are never reordered after upload, so it stays valid across
+            # add_custom_group mutations.
+            "date_index": encode_date_index(self.df_master, date_col),
             "meta_data": {
                 "cols_key_plot": self.cols_key_plot,
                 "cols_key_meta": self.cols_key_meta,
@@ -166,6 +199,7 @@ class DataPreprocessor:
             },
             "data_hash": {
                 "data_hash": self.content_hash,
+                "mutation": 0,  # bumped whenever df_master changes, see add_custom_group
             },
             "working_data": None,  # Placeholder for working data
             "custom_color_overrides": {},  # {group_col: {value: hex}}, see SessionManager.add_custom_group
@@ -182,8 +216,9 @@ class DataPreprocessor:
                 "plot_group_dropdown_2_options": plotting_groups,
                 "plot_group_dropdown_2_value": plotting_groups[0],
                 "pmap_neighbors": 15,  # Default value for neighbors in pmap
+                "pmap_warm_start": False,  # start PaCMAP from the session's pmap_embedding
             },
-            "version": 1,
+            "version": SESSION_VERSION,
         }
 
 
@@ -193,11 +228,12 @@ class DataPlotter:
 
     def __init__(
         self,
-        working_data: str,
-        meta_data: str,
+        working_data: Union[str, Dict[str, Any]],
+        meta_data: Union[str, Dict[str, Any]],
         selected_loc_ids: Optional[dict],
         plot_groups: List[str],
         date_range: List[int],
+        working_data_key: Optional[str] = None,
     ) -> None:
         self.initialize_data(
             working_data,
@@ -205,29 +241,37 @@ class DataPlotter:
             selected_loc_ids,
             plot_groups,
             date_range,
+            working_data_key,
         )
 
     def initialize_data(
         self,
-        working_data: str,
-        meta_data: str,
+        working_data: Union[str, Dict[str, Any]],
+        meta_data: Union[str, Dict[str, Any]],
         selected_loc_ids: Optional[dict],
         plot_groups: List[str],
         date_range: List[int],
+        working_data_key: Optional[str] = None,
     ) -> None:
-        """Parse the JSON store payloads and build df_plot_pca/df_plot_pmap.
-        Logs and re-raises the original exception (preserving its type/
-        traceback) on any failure, rather than masking it behind a generic
-        ValueError."""
+        """Parse the JSON store payloads (or take already-loaded dicts, e.g.
+        from store_utils.load_session) and build df_plot_pca/df_plot_pmap.
+        `working_data_key` names the working_data content (its snapshot
+        handle's digest), for caching what is derived from it; nothing is
+        cached without one. Logs and re-raises the original exception
+        (preserving its type/traceback) on any failure, rather than masking
+        it behind a generic ValueError."""
+        self.working_data_key = working_data_key
         try:
-            self.working_data = json.loads(working_data)
-            self.meta_data = json.loads(meta_data)
+            self.working_data = (
+                json.loads(working_data) if isinstance(working_data, str) else working_data
+            )
+            self.meta_data = json.loads(meta_data) if isinstance(meta_data, str) else meta_data
             self.cols_key_plot = _require(self.meta_data, "cols_key_plot", "meta_data")
             self.cols_key_meta = _require(self.meta_data, "cols_key_meta", "meta_data")
             self.dict_marker_map = _require(self.meta_data, "dict_marker_map", "meta_data")
             self.load_dataframes(selected_loc_ids)
             self.df_between_dates(date_range)
-            self.ldg_df = pd.read_json(io.StringIO(self.working_data["ldg_df"]))
+            self.ldg_df = decode_frame(self.working_data["ldg_df"])
             self.expl_var = self.working_data["expl_var"]
             self.plot_groups = plot_groups
         except Exception:
@@ -238,19 +282,39 @@ class DataPlotter:
         """Build df_plot_pca/df_plot_pmap, optionally subset to the map's
         current selection (selected_loc_ids, a Plotly selectedData dict)."""
         date_col = _require(self.cols_key_meta, "date", "cols_key_meta")
-        self.df_plot_pca = json_to_pandas(self.working_data, "df_plot_pca", date_col)
-        self.df_plot_pmap = json_to_pandas(self.working_data, "df_plot_pmap", date_col)
+        self.df_plot_pca = load_frame(self.working_data, "df_plot_pca", date_col)
+        # None while PaCMAP is still running in the background (or after its
+        # job was cancelled/failed) - plot_pmap shows a placeholder instead.
+        self.df_plot_pmap = (
+            load_frame(self.working_data, "df_plot_pmap", date_col)
+            if self.working_data.get("df_plot_pmap")
+            else None
+        )
+        # Row positions of the map selection in the unsubset frames; applied
+        # together with the date Mask in df_between_dates, so the Mask can
+        # use working_data's date index (built over every row).
+        self._selected_rows: Optional[np.ndarray] = None
         if selected_loc_ids is not None:
             self.selected_loc_ids = [point["customdata"][0] for point in selected_loc_ids["points"]]
-            self.df_plot_pca = self._subset_df_locIds(self.df_plot_pca)
-            self.df_plot_pmap = self._subset_df_locIds(self.df_plot_pmap)
+            col_loc_id = _require(self.cols_key_meta, "loc_id", "cols_key_meta")
+            self._selected_rows = np.flatnonzero(
+                self.df_plot_pca[col_loc_id].isin(self.selected_loc_ids).to_numpy()
+            )
         else:
             self.selected_loc_ids = _require(self.meta_data, "loc_id_all", "meta_data")
 
     def df_between_dates(self, date_range: List[int]) -> None:
-        """Filter df_plot_pca/df_plot_pmap to rows within `date_range` (years),
-        a no-op when no date column is mapped."""
-        if not self.df_plot_pca.index.equals(self.df_plot_pmap.index):
+        """Filter df_plot_pca/df_plot_pmap to the map selection (see
+        load_dataframes) and to rows within `date_range` (years); the date
+        part is a no-op when no date column is mapped.
+
+        The year window is resolved by binary search on the sorted dates of
+        df_plot_pca, sorted once per `working_data_key` and process (see
+        session_codec.load_date_index), so dragging the date slider doesn't
+        compare every row."""
+        if self.df_plot_pmap is not None and not self.df_plot_pca.index.equals(
+            self.df_plot_pmap.index
+        ):
             # Asserts are stripped under `python -O`; this invariant must hold
             # regardless of optimization flags, so raise explicitly instead.
             raise ValueError(
@@ -259,23 +323,39 @@ class DataPlotter:
                 "cannot align them for date-range filtering."
             )
         col_date = _require(self.cols_key_meta, "date", "cols_key_meta")
-        if not col_date:
-            # No date column mapped - date-range filtering is disabled, keep
-            # all rows.
+        rows = self._selected_rows
+        if col_date:
+            date_index = load_date_index(
+                self.working_data,
+                self.df_plot_pca,
+                col_date,
+                cache_key=(
+                    (self.working_data_key, "df_plot_pca") if self.working_data_key else None
+                ),
+            )
+            if date_index is not None:
+                date_rows = date_index.year_rows(date_range[0], date_range[1])
+            else:
+                _series_years = self.df_plot_pca[col_date].dt.year
+                date_rows = np.flatnonzero(
+                    ((_series_years >= date_range[0]) & (_series_years <= date_range[1])).to_numpy()
+                )
+            rows = date_rows if rows is None else np.intersect1d(rows, date_rows)
+        if rows is None:
+            # No map selection and no date column mapped - keep all rows.
             return
-        _series_years = self.df_plot_pca[col_date].dt.year
-        _idx_between_dates = self.df_plot_pca[
-            (_series_years >= date_range[0]) & (_series_years <= date_range[1])
-        ].index
-        self.df_plot_pca = self.df_plot_pca.loc[_idx_between_dates].copy()
-        self.df_plot_pmap = self.df_plot_pmap.loc[_idx_between_dates].copy()
-
-    def _subset_df_locIds(self, df: pd.DataFrame) -> pd.DataFrame:
-        return subset_df_locIds(
-            df,
-            _require(self.cols_key_meta, "loc_id", "cols_key_meta"),
-            self.selected_loc_ids,
-        ).reset_index(drop=True)
+        self.df_plot_pca = self._take_rows(self.df_plot_pca, rows)
+        if self.df_plot_pmap is not None:
+            self.df_plot_pmap = self._take_rows(self.df_plot_pmap, rows)
+
+    def _take_rows(self, df: pd.DataFrame, rows: np.ndarray) -> pd.DataFrame:
+        """`df.iloc[rows]`. Under a map selection rows are labelled by their
+        position within the selection, as when the selection was applied
+        with `subset_df_locIds(...).reset_index(drop=True)`."""
+        df = df.iloc[rows]
+        if self._selected_rows is not None:
+            df.index = np.searchsorted(self._selected_rows, rows)
+        return df
 
     @staticmethod
     def empty_figs() -> Tuple[Any, Any]:
@@ -322,7 +402,13 @@ class DataPlotter:
         )
 
     def plot_pmap(self, n_neighbors: int) -> Any:
-        """Render the PaCMAP biplot figure for the current plot groups/selection."""
+        """Render the PaCMAP biplot figure for the current plot groups/selection,
+        or a placeholder if the embedding hasn't arrived - "computing", or
+        working_data's `pmap_status` once its job was cancelled or failed."""
+        if self.df_plot_pmap is None:
+            return placeholder_fig(
+                self.working_data.get("pmap_status") or "Computing PaCMAP embedding..."
+            )
         return make_fig_pmap(
             self.df_plot_pmap,
             self._build_plot_context(),
@@ -349,6 +435,40 @@ class DataPlotter:
             y_col=y_col,
         )
 
+    def patch_colors(
+        self, layout_pca: Optional[str] = None, layout_pmap: Optional[str] = None
+    ) -> Tuple[Optional[Any], Optional[Any]]:
+        """(pca_patch, pmap_patch) recoloring the biplots plot_pca/plot_pmap
+        drew for this selection, e.g. after a custom color override.
+
+        layout_pca/layout_pmap are the figures' layout signatures (see
+        plotting.figure_layout_signature); a patch is None where that figure's
+        trace layout changed and it has to be rebuilt instead. The PaCMAP
+        patch is also None while its placeholder is showing."""
+        ctx = self._build_plot_context()
+        patch_pmap = (
+            patch_scatter_colors(self.df_plot_pmap, ctx, layout_signature=layout_pmap)
+            if self.df_plot_pmap is not None
+            else None
+        )
+        return patch_scatter_colors(self.df_plot_pca, ctx, layout_signature=layout_pca), patch_pmap
+
+    def patch_pca(
+        self, x_col: str = "PC1", y_col: str = "PC2", layout_pca: Optional[str] = None
+    ) -> Optional[Any]:
+        """Patch moving the plot_pca figure for this selection onto the
+        x_col/y_col components, or None if its trace layout changed (see
+        patch_colors)."""
+        return patch_pca_components(
+            self.df_plot_pca,
+            self.ldg_df,
+            self.expl_var,
+            self._build_plot_context(),
+            x_col=x_col,
+            y_col=y_col,
+            layout_signature=layout_pca,
+        )
+
 
 class SessionManager:
     """Packaging helpers for building the `working_data` session payload."""
@@ -419,7 +539,7 @@ class SessionManager:
         date_col = cols_key_meta.get("date")
         entity_id_col = _require(cols_key_meta, "entity_id", "cols_key_meta")
 
-        df_master = json_to_pandas(session, "df_master", date_col)
+        df_master = load_frame(session, "df_master", date_col)
         df_master = assign_custom_group_column(df_master, entity_id_col, new_col_name, assignments)
 
         plotting_groups = list(cols_key_meta["plotting_groups"]) + [new_col_name]
@@ -455,7 +575,13 @@ class SessionManager:
                 options.append(new_col_name)
             plotting_data[key] = options
 
-        session["df_master"] = pandas_to_json(df_master, date_col)
+        session["df_master"] = encode_frame(df_master, date_col)
+        data_hash = session.setdefault("data_hash", {})
+        data_hash["content"] = SessionManager._chain_content(
+            data_hash, new_col_name, assignments
+        )
+        data_hash["mutation"] = data_hash.get("mutation", 0) + 1
+        cache_frame(session, "df_master", df_master, date_col)
         session["meta_data"] = meta_data
         session["plotting_data"] = plotting_data
         logger.info(
@@ -466,19 +592,46 @@ class SessionManager:
         )
         return session
 
+    @staticmethod
+    def _chain_content(
+        data_hash: Dict[str, Any], new_col_name: str, assignments: Dict[str, List[str]]
+    ) -> Optional[str]:
+        """data_hash["content"] after adding a custom group: a digest of the
+        previous content and the group's name and assignments, so sessions
+        that added the same groups to the same upload agree on it (see
+        result_cache.dimension_reduction_data_token). None if the previous
+        content is unknown - a session mutated before it was recorded."""
+        previous = data_hash.get("content")
+        if previous is None and not data_hash.get("mutation"):
+            previous = data_hash.get("data_hash")
+        if previous is None:
+            return None
+        group = {str(value): sorted(map(str, ids)) for value, ids in assignments.items()}
+        payload = json.dumps([previous, new_col_name, group], sort_keys=True)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
     @staticmethod
     def package_plotting_data(
-        plot_components_pca: tuple, plot_components_pmap: pd.DataFrame, meta_data: dict
+        plot_components_pca: tuple,
+        plot_components_pmap: Optional[pd.DataFrame],
+        meta_data: dict,
     ) -> Dict[str, Any]:
         """Bundle PCA/PaCMAP dimension-reduction outputs into the JSON-serializable
-        `working_data` shape DataPlotter expects."""
+        `working_data` shape DataPlotter expects (frames encoded with
+        `session_codec.encode_frame`). `plot_components_pmap` is None while
+        PaCMAP is still being computed (see job_runner.build_pca_working_data);
+        `df_plot_pmap` is then None too."""
         date_col = _require(
             _require(meta_data, "cols_key_meta", "meta_data"), "date", "cols_key_meta"
         )
         dict_working_data = {
-            "df_plot_pca": pandas_to_json(plot_components_pca[0], date_col),
-            "ldg_df": plot_components_pca[1].to_json(),
+            "df_plot_pca": encode_frame(plot_components_pca[0], date_col),
+            "ldg_df": encode_frame(plot_components_pca[1]),
             "expl_var": plot_components_pca[2],
-            "df_plot_pmap": pandas_to_json(plot_components_pmap, date_col),
+            "df_plot_pmap": (
+                encode_frame(plot_components_pmap, date_col)
+                if plot_components_pmap is not None
+                else None
+            ),
         }
         return dict_working_data
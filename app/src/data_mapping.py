@@ -5,23 +5,40 @@
 # collecting structured warnings/errors along the way instead of silently
 # corrupting data or failing with a single opaque boolean.
 #
+# Validation is batched: each mapped column is coerced once with every check
+# for its role derived from that array, string-like columns (dates, colors,
+# entity IDs) are worked on per distinct value, and checking stops once
+# VALIDATION_ERROR_BUDGET errors have been collected.
+#
 # Classes
 # -------
 # ValidationIssue
 # ValidationResult
 # MappedDataset
+# ParsePlan
 #
 # Functions
 # ---------
 # build_mapped_dataset
-
+# build_parse_plan
+# read_mapped_csv
+# sniff_csv
+# infer_dtype_hints
+# suggest_role_mapping
+# role_column_options
+
+import importlib.util
+import io
+import os
 import re
+import warnings
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
+import numpy as np
 import pandas as pd
 
-from .data_model import ColumnMapping
+from .data_model import ROLE_REGISTRY, ColumnMapping, ColumnRole, RoleSpec
 
 _HEX_COLOR_PATTERN = re.compile(r"^#[0-9A-Fa-f]{6}$")
 _MAX_SAMPLE_VALUES = 10
@@ -32,6 +49,53 @@ _MAX_SAMPLE_VALUES = 10
 # the user named their raw location/date columns.
 ENTITY_ID_COL = "ENTITY_ID"
 
+# Rows read by sniff_csv for dtype hints when the mapping modal opens; the
+# full file is only parsed on Confirm (DataPreprocessor).
+SNIFF_SAMPLE_ROWS = int(os.getenv("SNIFF_SAMPLE_ROWS", 200))
+# Share of a sample's non-missing values that must parse for a numeric/date hint.
+_SNIFF_MIN_PARSED = 0.9
+
+# Which sniffed hints (see infer_dtype_hints) fit each RoleSpec.dtype_hint.
+# "string" roles (IDs, groups, markers) accept anything.
+_COMPATIBLE_HINTS = {
+    "numeric": {"numeric"},
+    "float_lat": {"numeric"},
+    "float_lon": {"numeric"},
+    "date": {"date"},
+    "hex_color": {"hex_color"},
+}
+
+# Engine for the full parse on Confirm: "c", or "pyarrow" to parse with
+# several threads (optional dependency - falls back to "c" if not installed).
+CSV_PARSE_ENGINE = os.getenv("CSV_PARSE_ENGINE", "c")
+
+# read_csv dtype declared for each RoleSpec.dtype_hint. Date columns are left
+# to inference and parsed per row by _coerce_date.
+_PARSE_DTYPES = {
+    "numeric": "float64",
+    "float_lat": "float64",
+    "float_lon": "float64",
+    "string": "category",
+    "hex_color": "category",
+}
+# Roles left to read_csv's inference, as before parse plans: plotting-group
+# and marker values are used as-is for color/marker lookups, so a numeric
+# group column stays numeric (and its blanks NaN) rather than becoming a mix
+# of strings and NaN.
+_INFERRED_ROLES = {ColumnRole.PLOTTING_GROUP.value, ColumnRole.MARKER_SYMBOL.value}
+
+# Error issues build_mapped_dataset collects before it stops checking further
+# columns (the upload is blocked either way); 0 checks every column.
+VALIDATION_ERROR_BUDGET = int(os.getenv("VALIDATION_ERROR_BUDGET", 20))
+
+# Column-name patterns used to pre-select single-column roles.
+_ROLE_NAME_PATTERNS = {
+    ColumnRole.LOCATION_ID: re.compile(r"site|location|station|well|loc_?id", re.I),
+    ColumnRole.LATITUDE: re.compile(r"^(y|lat.*)$|latitude", re.I),
+    ColumnRole.LONGITUDE: re.compile(r"^(x|lon.*|lng.*)$|longitude", re.I),
+    ColumnRole.DATE: re.compile(r"date|time", re.I),
+}
+
 
 @dataclass
 class ValidationIssue:
@@ -86,6 +150,39 @@ class MappedDataset:
     validation: ValidationResult
 
 
+@dataclass
+class ParsePlan:
+    """How `read_mapped_csv` reads an upload for one ColumnMapping.
+
+    Parameters
+    ----------
+    usecols : list
+        Mapped columns present in the file, in file order; nothing else is
+        parsed.
+    dtype : dict
+        `{column: read_csv dtype}` from each column's RoleSpec.dtype_hint.
+    engine : str
+        "c" or "pyarrow".
+    """
+
+    usecols: List[str]
+    dtype: Dict[str, str]
+    engine: str = "c"
+
+    def read_csv_kwargs(self, numeric_dtypes: bool = True) -> Dict[str, Any]:
+        """`pd.read_csv` arguments; `numeric_dtypes=False` leaves numeric
+        columns to inference (see read_mapped_csv)."""
+        dtype = {
+            col: declared
+            for col, declared in self.dtype.items()
+            if numeric_dtypes or declared != "float64"
+        }
+        kwargs: Dict[str, Any] = {"usecols": self.usecols, "dtype": dtype, "engine": self.engine}
+        if self.engine == "c":
+            kwargs["float_precision"] = "high"
+        return kwargs
+
+
 def _add_issue(issues, field_name, severity, message, offending_values=None):
     """Append a ValidationIssue to `issues`, capping offending_values to
     _MAX_SAMPLE_VALUES stringified samples."""
@@ -188,69 +285,101 @@ def _check_columns_exist(df_raw: pd.DataFrame, mapping: ColumnMapping, issues) -
     return len(missing) == 0
 
 
-def _coerce_lat_lon(df: pd.DataFrame, col: str, bound: float, field_name: str, issues) -> pd.Series:
-    """Coerce `col` to numeric; error on any row that's missing or outside
-    +/-`bound` (90 for latitude, 180 for longitude)."""
-    coerced = pd.to_numeric(df[col], errors="coerce")
-    bad_mask = coerced.isna() | coerced.abs().gt(bound)
-    if bad_mask.any():
-        _add_issue(
-            issues,
-            field_name,
-            "error",
-            f"Column '{col}': {int(bad_mask.sum())} row(s) have missing or out-of-range "
-            f"{field_name} values (must be within +/-{bound}).",
-            offending_values=df.loc[bad_mask, col],
-        )
-    return coerced
+def _sample(values: pd.Series, mask: np.ndarray) -> pd.Series:
+    """The first _MAX_SAMPLE_VALUES entries of `values` where `mask` holds -
+    without materializing every offending row."""
+    return values.iloc[np.flatnonzero(mask)[:_MAX_SAMPLE_VALUES]]
 
 
-def _coerce_numeric_column(df: pd.DataFrame, col: str, field_name: str, issues) -> pd.Series:
-    """Coerce `col` to numeric; warn (not error) on values that fail to parse
-    or are missing, since analyte gaps degrade rather than block the upload."""
-    original_na = df[col].isna()
-    coerced = pd.to_numeric(df[col], errors="coerce")
-    newly_bad = coerced.isna() & ~original_na
-    if newly_bad.any():
-        _add_issue(
-            issues,
-            field_name,
-            "warning",
-            f"Column '{col}': {int(newly_bad.sum())} value(s) could not be parsed as "
-            "numeric and were treated as missing.",
-            offending_values=df.loc[newly_bad, col],
-        )
-    if coerced.isna().any():
+def _as_float(values: pd.Series) -> np.ndarray:
+    """`values` as a float64 array, unparseable entries as NaN. Columns
+    read_mapped_csv already typed as float are not re-parsed."""
+    if pd.api.types.is_float_dtype(values):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _coerce_numeric(
+    df: pd.DataFrame,
+    col: str,
+    field_name: str,
+    issues,
+    bound: Optional[float] = None,
+    positive: bool = False,
+) -> np.ndarray:
+    """
+    Coerce `col` to float once and run every check for its role against
+    that one array:
+
+    - `bound` (latitude 90, longitude 180): error on any row that's missing
+      or outside +/-`bound`;
+    - otherwise warn (not error) on values that fail to parse or are
+      missing, since analyte gaps degrade rather than block the upload;
+    - `positive` (CLR analytes): also error on any missing/zero/negative
+      value - the CLR transform requires strictly positive input.
+    """
+    raw = df[col]
+    coerced = _as_float(raw)
+    missing = np.isnan(coerced)
+    if bound is not None:
+        with np.errstate(invalid="ignore"):
+            bad_mask = missing | (np.abs(coerced) > bound)
+        if bad_mask.any():
+            _add_issue(
+                issues,
+                field_name,
+                "error",
+                f"Column '{col}': {int(bad_mask.sum())} row(s) have missing or out-of-range "
+                f"{field_name} values (must be within +/-{bound}).",
+                offending_values=_sample(raw, bad_mask),
+            )
+        return coerced
+
+    if missing.any():
+        newly_bad = missing & raw.notna().to_numpy()
+        if newly_bad.any():
+            _add_issue(
+                issues,
+                field_name,
+                "warning",
+                f"Column '{col}': {int(newly_bad.sum())} value(s) could not be parsed as "
+                "numeric and were treated as missing.",
+                offending_values=_sample(raw, newly_bad),
+            )
         _add_issue(
             issues,
             field_name,
             "warning",
-            f"Column '{col}' has {int(coerced.isna().sum())} missing numeric value(s).",
+            f"Column '{col}' has {int(missing.sum())} missing numeric value(s).",
         )
+    if positive:
+        with np.errstate(invalid="ignore"):
+            bad_mask = missing | (coerced <= 0)
+        if bad_mask.any():
+            _add_issue(
+                issues,
+                "numeric_clr",
+                "error",
+                f"Column '{col}' (compositional/CLR) has {int(bad_mask.sum())} value(s) that "
+                "are missing or <= 0; CLR requires strictly positive values.",
+                offending_values=coerced[bad_mask][:_MAX_SAMPLE_VALUES],
+            )
     return coerced
 
 
-def _check_clr_positive(coerced: pd.Series, col: str, issues):
-    """Error on any missing/zero/negative value in a CLR-mapped analyte
-    column - the CLR transform requires strictly positive input."""
-    bad_mask = coerced.isna() | coerced.le(0)
-    if bad_mask.any():
-        _add_issue(
-            issues,
-            "numeric_clr",
-            "error",
-            f"Column '{col}' (compositional/CLR) has {int(bad_mask.sum())} value(s) that "
-            "are missing or <= 0; CLR requires strictly positive values.",
-            offending_values=coerced[bad_mask],
-        )
-
-
 def _coerce_date(df: pd.DataFrame, col: str, issues):
     """Coerce a date column per-row instead of the old whole-column
-    substitute-with-now() fallback. Returns (coerced_series_or_None, unusable)."""
-    original_present = df[col].notna()
-    coerced = pd.to_datetime(df[col], errors="coerce")
-    bad_mask = coerced.isna() & original_present
+    substitute-with-now() fallback. Each distinct value is parsed once - a
+    date column repeats the same few thousand days across every site.
+    Returns (coerced_series_or_None, unusable)."""
+    raw = df[col]
+    codes, uniques = pd.factorize(raw)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), errors="coerce")
+    # Code -1 (missing) picks the trailing NaT.
+    parsed = pd.concat([parsed, pd.Series([pd.NaT], dtype=parsed.dtype)], ignore_index=True)
+    coerced = parsed.iloc[codes].set_axis(raw.index)
+    original_present = codes != -1
+    bad_mask = coerced.isna().to_numpy() & original_present
     if len(df) > 0 and bad_mask.sum() == original_present.sum() and original_present.any():
         _add_issue(
             issues,
@@ -258,7 +387,7 @@ def _coerce_date(df: pd.DataFrame, col: str, issues):
             "warning",
             f"Column '{col}' could not be parsed as dates for any row; date-range "
             "filtering will be disabled.",
-            offending_values=df.loc[bad_mask, col],
+            offending_values=_sample(raw, bad_mask),
         )
         return None, True
     if bad_mask.any():
@@ -268,7 +397,7 @@ def _coerce_date(df: pd.DataFrame, col: str, issues):
             "warning",
             f"Column '{col}': {int(bad_mask.sum())} value(s) could not be parsed as dates "
             "and were treated as missing.",
-            offending_values=df.loc[bad_mask, col],
+            offending_values=_sample(raw, bad_mask),
         )
     return coerced, False
 
@@ -276,11 +405,14 @@ def _coerce_date(df: pd.DataFrame, col: str, issues):
 def _check_hex_colors(df: pd.DataFrame, col: str, issues):
     """Warn on any value in a predefined group-color column that isn't a
     '#RRGGBB' hex string - affected groups fall back to an auto-generated
-    palette rather than blocking the upload."""
-    str_vals = df[col].astype(str)
-    invalid_mask = ~str_vals.map(lambda v: bool(_HEX_COLOR_PATTERN.fullmatch(v)))
-    if invalid_mask.any():
-        invalid_uniques = df.loc[invalid_mask, col].unique()
+    palette rather than blocking the upload. Only distinct values are
+    matched."""
+    codes, uniques = pd.factorize(df[col], use_na_sentinel=False)
+    str_uniques = pd.Series(uniques, dtype=object).astype(str)
+    invalid = ~str_uniques.str.fullmatch(_HEX_COLOR_PATTERN).to_numpy(dtype=bool)
+    if invalid.any():
+        # In order of first appearance, as Series.unique() would list them.
+        invalid_uniques = np.asarray(uniques, dtype=object)[invalid]
         _add_issue(
             issues,
             "group_color",
@@ -291,10 +423,45 @@ def _check_hex_colors(df: pd.DataFrame, col: str, issues):
         )
 
 
-def _check_duplicate_entity_ids(entity_id: pd.Series, issues):
-    """Warn if any composite location+date ENTITY_ID value repeats, which
-    usually signals duplicate lab records rather than a mapping problem."""
-    dup_mask = entity_id.duplicated(keep=False)
+def _build_entity_ids(loc_ids: pd.Series, dates: Optional[pd.Series], issues) -> pd.Series:
+    """
+    Composite location+time identifier (see ENTITY_ID_COL), falling back to
+    the bare location ID row-wise on missing dates and whole-column when
+    `dates` is None. Strings are only formatted per distinct (location,
+    date) pair.
+
+    Warns if any value repeats, which usually signals duplicate lab records
+    rather than a mapping problem.
+    """
+    loc_codes, loc_uniques = pd.factorize(loc_ids, use_na_sentinel=False)
+    # Distinct raw IDs can stringify alike (1 and "1" in an object column).
+    loc_string_codes, loc_strings = pd.factorize(
+        np.asarray(pd.Index(loc_uniques).astype(str), dtype=object), use_na_sentinel=False
+    )
+    loc_codes = loc_string_codes[loc_codes]
+    loc_strings = np.asarray(loc_strings, dtype=object)
+    if dates is None:
+        entity_codes, entity_strings = loc_codes, loc_strings
+    else:
+        date_codes, date_uniques = pd.factorize(dates)
+        n_dates = len(date_uniques) + 1
+        pair_codes, pairs = pd.factorize(loc_codes.astype(np.int64) * n_dates + (date_codes + 1))
+        pair_locs, pair_dates = np.divmod(pairs, n_dates)
+        date_strings = np.asarray(pd.DatetimeIndex(date_uniques).strftime("%Y-%m-%d"), dtype=object)
+        entity_strings = loc_strings[pair_locs]
+        dated = (pair_dates > 0) & pd.notna(entity_strings)
+        entity_strings[dated] = (
+            entity_strings[dated] + "_" + date_strings[pair_dates[dated] - 1]
+        )
+        entity_codes = pair_codes
+        if not dated.all():
+            # An undated location can spell the same ID as a dated one
+            # (location "A_2023-01-01" vs "A" on that day).
+            string_codes, entity_strings = pd.factorize(entity_strings, use_na_sentinel=False)
+            entity_strings = np.asarray(entity_strings, dtype=object)
+            entity_codes = string_codes[pair_codes]
+
+    dup_mask = pd.Series(entity_codes).duplicated(keep=False).to_numpy()
     if dup_mask.any():
         _add_issue(
             issues,
@@ -302,18 +469,45 @@ def _check_duplicate_entity_ids(entity_id: pd.Series, issues):
             "warning",
             f"{int(dup_mask.sum())} row(s) share the same location+date combination; "
             "these may be duplicate lab records.",
-            offending_values=entity_id[dup_mask].unique(),
+            offending_values=entity_strings[pd.unique(entity_codes[dup_mask])],
         )
+    return pd.Series(entity_strings[entity_codes], index=loc_ids.index, dtype="str")
+
+
+def _over_budget(issues, error_budget: int) -> bool:
+    """True (after recording why) once more than `error_budget` errors are
+    collected; 0 means no budget."""
+    n_errors = sum(issue.severity == "error" for issue in issues)
+    if not error_budget or n_errors <= error_budget:
+        return False
+    _add_issue(
+        issues,
+        "general",
+        "error",
+        f"Validation stopped after {n_errors} errors; fix these and upload again to "
+        "check the remaining columns.",
+    )
+    return True
 
 
-def build_mapped_dataset(df_raw: pd.DataFrame, mapping: ColumnMapping) -> MappedDataset:
+def build_mapped_dataset(
+    df_raw: pd.DataFrame, mapping: ColumnMapping, error_budget: Optional[int] = None
+) -> MappedDataset:
     """Validate `mapping` against `df_raw` and, if there are no blocking errors,
     build the canonical (df_master, cols_key_plot, cols_key_meta) structures the
     rest of the app expects - the same shape `DataPreprocessor` has always produced.
 
+    Each mapped column is coerced once and every check for its role runs on
+    that result, column by column; checking stops at the first column that
+    takes the error count past `error_budget` (default
+    VALIDATION_ERROR_BUDGET, 0 for no limit) since the upload is blocked
+    either way.
+
     Always returns a `MappedDataset`; check `.validation.has_errors` before using
     `.df_master`/`.cols_key_plot`/`.cols_key_meta`, which are None when blocked.
     """
+    if error_budget is None:
+        error_budget = VALIDATION_ERROR_BUDGET
     issues: List[ValidationIssue] = []
 
     _check_duplicate_columns(mapping, issues)
@@ -326,23 +520,21 @@ def build_mapped_dataset(df_raw: pd.DataFrame, mapping: ColumnMapping) -> Mapped
         # Can't safely proceed without the columns row identity/plotting depend on.
         return MappedDataset(None, None, None, ValidationResult(issues))
 
-    df = df_raw.copy()
-
-    df[mapping.latitude] = _coerce_lat_lon(df, mapping.latitude, 90, "latitude", issues)
-    df[mapping.longitude] = _coerce_lat_lon(df, mapping.longitude, 180, "longitude", issues)
-
-    for col in mapping.numeric_simple:
-        df[col] = _coerce_numeric_column(df, col, "numeric_simple", issues)
-
-    for col in mapping.numeric_clr:
-        coerced = _coerce_numeric_column(df, col, "numeric_clr", issues)
-        _check_clr_positive(coerced, col, issues)
-        df[col] = coerced
+    # Copy-on-write: the coerced columns assigned below never reach df_raw.
+    df = df_raw.copy(deep=False)
 
+    checks = [
+        (mapping.latitude, dict(field_name="latitude", bound=90)),
+        (mapping.longitude, dict(field_name="longitude", bound=180)),
+    ]
+    checks += [(col, dict(field_name="numeric_simple")) for col in mapping.numeric_simple]
+    checks += [(col, dict(field_name="numeric_clr", positive=True)) for col in mapping.numeric_clr]
     if mapping.map_marker_size:
-        df[mapping.map_marker_size] = _coerce_numeric_column(
-            df, mapping.map_marker_size, "map_marker_size", issues
-        )
+        checks.append((mapping.map_marker_size, dict(field_name="map_marker_size")))
+    for col, kwargs in checks:
+        df[col] = _coerce_numeric(df, col, issues=issues, **kwargs)
+        if _over_budget(issues, error_budget):
+            return MappedDataset(None, None, None, ValidationResult(issues))
 
     date_col = mapping.date
     if date_col:
@@ -356,16 +548,9 @@ def build_mapped_dataset(df_raw: pd.DataFrame, mapping: ColumnMapping) -> Mapped
         if color_col in df.columns:
             _check_hex_colors(df, color_col, issues)
 
-    # Composite location+time identifier. Falls back to the bare location ID
-    # (row-wise on missing/unparseable dates, whole-column when no usable date
-    # role is mapped at all) - see ENTITY_ID_COL.
-    loc_id_str = df[mapping.location_id].astype(str)
-    if date_col:
-        date_str = df[date_col].dt.strftime("%Y-%m-%d")
-        df[ENTITY_ID_COL] = loc_id_str.where(date_str.isna(), loc_id_str + "_" + date_str)
-    else:
-        df[ENTITY_ID_COL] = loc_id_str
-    _check_duplicate_entity_ids(df[ENTITY_ID_COL], issues)
+    df[ENTITY_ID_COL] = _build_entity_ids(
+        df[mapping.location_id], df[date_col] if date_col else None, issues
+    )
 
     validation = ValidationResult(issues)
     if validation.has_errors:
@@ -391,7 +576,7 @@ def build_mapped_dataset(df_raw: pd.DataFrame, mapping: ColumnMapping) -> Mapped
     meta_cols.extend(mapping.group_colors.values())
     meta_cols = list(dict.fromkeys(meta_cols))  # de-dupe, preserve order
 
-    df_master = df[meta_cols + numeric_all].copy()
+    df_master = df[meta_cols + numeric_all]
 
     cols_key_plot = {
         "meta": meta_cols,
@@ -410,3 +595,175 @@ def build_mapped_dataset(df_raw: pd.DataFrame, mapping: ColumnMapping) -> Mapped
     }
 
     return MappedDataset(df_master, cols_key_plot, cols_key_meta, validation)
+
+
+def sniff_csv(source: Any, n_rows: int = SNIFF_SAMPLE_ROWS) -> pd.DataFrame:
+    """
+    Read just the header and first `n_rows` rows of a CSV - enough to fill
+    the mapping modal's dropdowns and dtype hints without parsing the file.
+
+    Parameters
+    ----------
+    source : str, path-like or file-like
+        Anything `pd.read_csv` accepts.
+    n_rows : int, default SNIFF_SAMPLE_ROWS
+        Sample size.
+    """
+    return pd.read_csv(source, nrows=n_rows)
+
+
+def _parsed_share(parsed: pd.Series, present: pd.Series) -> float:
+    return float(parsed[present].notna().mean()) if present.any() else 0.0
+
+
+def infer_dtype_hints(df_sample: pd.DataFrame) -> Dict[str, str]:
+    """
+    Classify each column of a `sniff_csv` sample as "numeric", "date",
+    "hex_color" or "string", in RoleSpec.dtype_hint terms.
+
+    Numeric/date hints need at least 90% of the non-missing sample values to
+    parse, matching the per-row coercion build_mapped_dataset applies later.
+    All-missing columns are "string".
+    """
+    hints = {}
+    for col in df_sample.columns:
+        values = df_sample[col]
+        present = values.notna()
+        if pd.api.types.is_bool_dtype(values) or not present.any():
+            hints[col] = "string"
+        elif pd.api.types.is_numeric_dtype(values) or _parsed_share(
+            pd.to_numeric(values, errors="coerce"), present
+        ) >= _SNIFF_MIN_PARSED:
+            hints[col] = "numeric"
+        elif values[present].astype(str).str.fullmatch(_HEX_COLOR_PATTERN).all():
+            hints[col] = "hex_color"
+        else:
+            with warnings.catch_warnings():
+                # Mixed/unknown formats fall back to dateutil with a warning.
+                warnings.simplefilter("ignore", UserWarning)
+                dates = pd.to_datetime(values, errors="coerce")
+            hints[col] = "date" if _parsed_share(dates, present) >= _SNIFF_MIN_PARSED else "string"
+    return hints
+
+
+def _within(df_sample: pd.DataFrame, col: str, bound: float) -> bool:
+    coerced = pd.to_numeric(df_sample[col], errors="coerce")
+    return bool(coerced.abs().le(bound).all())
+
+
+def suggest_role_mapping(df_sample: pd.DataFrame, hints: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Pre-selected values for the mapping modal, keyed by ColumnRole value
+    (multi roles get lists), from a `sniff_csv` sample and its hints.
+
+    Location ID, latitude, longitude and date are picked by column name
+    among dtype-compatible columns (lat/lon also by value range; date falls
+    back to the first date-like column). Every
+    remaining numeric column is suggested as a simple analyte - moving
+    compositional ones to the CLR role is left to the user. Other roles
+    start empty. These are only suggestions; Confirm validates as usual.
+    """
+    specs = {spec.role: spec for spec in ROLE_REGISTRY}
+    taken = set()
+    suggestions: Dict[str, Any] = {}
+    bounds = {ColumnRole.LATITUDE: 90, ColumnRole.LONGITUDE: 180}
+    for role in (ColumnRole.LATITUDE, ColumnRole.LONGITUDE, ColumnRole.DATE, ColumnRole.LOCATION_ID):
+        compatible = _COMPATIBLE_HINTS.get(specs[role].dtype_hint)
+        for col, hint in hints.items():
+            if col in taken or not _ROLE_NAME_PATTERNS[role].search(str(col)):
+                continue
+            if compatible is not None and hint not in compatible:
+                continue
+            if role in bounds and not _within(df_sample, col, bounds[role]):
+                continue
+            suggestions[role.value] = col
+            taken.add(col)
+            break
+    if ColumnRole.DATE.value not in suggestions:
+        # A parseable date column is distinctive enough without a telling name.
+        dates = [col for col, hint in hints.items() if hint == "date" and col not in taken]
+        if dates:
+            suggestions[ColumnRole.DATE.value] = dates[0]
+            taken.add(dates[0])
+    suggestions[ColumnRole.NUMERIC_SIMPLE.value] = [
+        col for col, hint in hints.items() if hint == "numeric" and col not in taken
+    ]
+    return suggestions
+
+
+def role_column_options(spec: RoleSpec, hints: Dict[str, str]) -> List[Dict[str, str]]:
+    """
+    Dropdown options for one RoleSpec: every column, labelled with its
+    sniffed hint, with the dtype-compatible ones listed first.
+    """
+    compatible = _COMPATIBLE_HINTS.get(spec.dtype_hint)
+    columns = sorted(
+        hints, key=lambda col: compatible is not None and hints[col] not in compatible
+    )
+    return [{"label": f"{col} ({hints[col]})", "value": col} for col in columns]
+
+
+def build_parse_plan(
+    mapping: ColumnMapping, header: List[str], engine: str = CSV_PARSE_ENGINE
+) -> ParsePlan:
+    """
+    Parse plan reading only `mapping`'s columns out of a file whose header
+    is `header`.
+
+    Mapped columns missing from `header` are left out so that
+    build_mapped_dataset reports them. A column mapped to roles with
+    conflicting dtypes gets no declared dtype. `engine="pyarrow"` falls back
+    to "c" when pyarrow isn't installed.
+    """
+    specs = {spec.role.value: spec for spec in ROLE_REGISTRY}
+    present = set(header)
+    dtype: Dict[str, Optional[str]] = {}
+    for field_name, col in _flatten_role_columns(mapping):
+        if col not in present:
+            continue
+        declared = (
+            None
+            if field_name in _INFERRED_ROLES
+            else _PARSE_DTYPES.get(specs[field_name].dtype_hint)
+        )
+        dtype[col] = declared if dtype.get(col, declared) == declared else None
+    if engine == "pyarrow" and importlib.util.find_spec("pyarrow") is None:
+        engine = "c"
+    return ParsePlan(
+        usecols=[col for col in header if col in dtype],
+        dtype={col: declared for col, declared in dtype.items() if declared is not None},
+        engine=engine,
+    )
+
+
+def read_mapped_csv(
+    source: Any, mapping: ColumnMapping, engine: str = CSV_PARSE_ENGINE
+) -> pd.DataFrame:
+    """
+    Read the mapped columns of an uploaded CSV per `build_parse_plan`,
+    ready for build_mapped_dataset.
+
+    Location-ID and color columns come back categorical and numeric roles
+    as float64; plotting-group and marker columns are inferred. If a
+    numeric column holds text the typed parse fails, so the file is re-read
+    with numeric columns inferred instead, leaving build_mapped_dataset to
+    coerce and warn row by row as before.
+
+    Parameters
+    ----------
+    source : str, path-like or binary file-like
+        Read twice (header, then body); file-likes must be seekable.
+    mapping : ColumnMapping
+    engine : str, default CSV_PARSE_ENGINE
+    """
+
+    def read(**kwargs: Any) -> pd.DataFrame:
+        if isinstance(source, io.IOBase):
+            source.seek(0)
+        return pd.read_csv(source, **kwargs)
+
+    plan = build_parse_plan(mapping, read(nrows=0).columns.tolist(), engine)
+    try:
+        return read(**plan.read_csv_kwargs())
+    except (TypeError, ValueError):
+        return read(**plan.read_csv_kwargs(numeric_dtypes=False))
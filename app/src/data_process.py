@@ -26,13 +26,14 @@
 # data_mapping.py (per-row errors="coerce" + structured warnings, replacing
 # the old whole-column datetime.now() fallback that used to live here).
 from typing import Any, Dict, List, Optional, Sequence, Tuple
-from pandas import DataFrame, Timestamp, concat, read_json, to_datetime
+from pandas import DataFrame, Series, Timestamp, concat, read_json, to_datetime
 import io
 
 # import 'alphabet' from plotly
 import plotly.colors as pc
 
 from .logging_config import get_logger
+from .selection_engine import DateIndex
 
 logger = get_logger(__name__)
 
@@ -85,7 +86,10 @@ def make_color_dict(df: DataFrame, col_plot_group: str) -> Dict[Any, str]:
     dict
         Dictionary with the plotting groups as keys and the colors as values.
     """
-    unique_values = sorted(df[col_plot_group].unique())
+    # Missing values sort last: a text column with blanks holds str and NaN,
+    # which can't be compared with each other.
+    values = Series(df[col_plot_group].unique())
+    unique_values = sorted(values.dropna()) + values[values.isna()].tolist()[:1]
     has_unassigned = DEFAULT_UNASSIGNED_CATEGORY in unique_values
     palette_values = [v for v in unique_values if v != DEFAULT_UNASSIGNED_CATEGORY]
     _n_unique_colors = len(palette_values)
@@ -471,7 +475,10 @@ def subset_df_locIds(df: DataFrame, col_loc_id: str, loc_ids_subset) -> DataFram
 
 
 def subset_df_dateRange(
-    df: DataFrame, col_date: Optional[str], date_range: Optional[Sequence[str]]
+    df: DataFrame,
+    col_date: Optional[str],
+    date_range: Optional[Sequence[str]],
+    date_index: Optional[DateIndex] = None,
 ) -> DataFrame:
     """
     Subset a DataFrame to rows whose `col_date` falls within an inclusive
@@ -493,6 +500,10 @@ def subset_df_dateRange(
     date_range : list or tuple of str, optional
         `[start_date, end_date]`, inclusive, as ISO date strings (e.g. from
         `dcc.DatePickerRange`) or anything `pandas.Timestamp` can parse.
+    date_index : DateIndex, optional
+        Sorted index of `df[col_date]` (see session_codec.load_date_index);
+        the range is then found by binary search instead of comparing every
+        row. Same rows, same order.
 
     Returns
     -------
@@ -503,6 +514,8 @@ def subset_df_dateRange(
     if not col_date or not date_range:
         return df.copy()
     start, end = Timestamp(date_range[0]), Timestamp(date_range[1])
+    if date_index is not None:
+        return df.iloc[date_index.rows(start, end)].copy()
     return df[(df[col_date] >= start) & (df[col_date] <= end)].copy()
 
 
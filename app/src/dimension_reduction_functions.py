@@ -1,23 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+import numpy as np
 from pandas import DataFrame
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
 import pacmap
 
-from typing import Optional, Sequence, Tuple
+from typing import Callable, Optional, Sequence, Tuple
 
-from .data_process import (
-    make_df_for_biplot,
-    subset_df_dateRange,
-    subset_df_locIds,
-    subset_df_numericFeatures,
-)
-from .compositional_data_functions import clr_transform_scale
+from .data_process import make_df_for_biplot
+from .compositional_data_functions import LogComposition, clr_transform, clr_transform_scale
 from .logging_config import get_logger
+from .neighbor_graph import cached_neighbor_pairs
+from .selection_engine import SelectionIndex, select_frame
 
 logger = get_logger(__name__)
 
 
 MAX_PCA_COMPONENTS = 5
 
+# PCA solver: "auto" picks one from the matrix shape (see choose_pca_solver);
+# any sklearn svd_solver name forces that solver.
+PCA_SOLVER = os.getenv("PCA_SOLVER", "auto")
+
+# process_pca reduces selections of at least PCA_CHUNKED_MIN_ROWS rows with
+# run_pca_chunked, PCA_CHUNK_ROWS rows at a time, instead of building the
+# full CLR'd/scaled copy of the selection.
+PCA_CHUNKED_MIN_ROWS = int(os.getenv("PCA_CHUNKED_MIN_ROWS", 500_000))
+PCA_CHUNK_ROWS = int(os.getenv("PCA_CHUNK_ROWS", 50_000))
+
+# Whether process_dimension_reduction runs PaCMAP on a worker thread while PCA
+# runs on the calling thread (both spend most of their time in BLAS/numba
+# code that releases the GIL). "0" runs them back to back. This only affects
+# the synchronous Apply fallback - with background jobs the PCA biplot is
+# rendered before PaCMAP starts (see job_runner.build_pca_working_data).
+DIMRED_OVERLAP = os.getenv("DIMRED_OVERLAP", "1") != "0"
+
+# PaCMAP (phase 1, phase 2, phase 3) iterations for a warm start. Phase 1
+# (mid-near pairs dominate) only matters for laying out global structure
+# from scratch, which the previous embedding already provides. PaCMAP's
+# cold default is (100, 100, 250).
+PMAP_WARM_START_ITERS = (0, 50, 100)
+# Fraction of rows that must be in the previous embedding to warm start;
+# below this a cold fit is both faster to converge and less biased.
+PMAP_WARM_START_MIN_OVERLAP = float(os.getenv("PMAP_WARM_START_MIN_OVERLAP", 0.5))
+
 
 def run_pca(
     df: DataFrame, cat_cols: list, analytes: list, n_components: int = MAX_PCA_COMPONENTS
@@ -58,7 +88,98 @@ def run_pca(
     return df_plot, ldg_df, expl_var
 
 
-def run_pmap(df: DataFrame, cat_cols: list, analytes: list, n_neighbors: int = 15):
+def _chunk_bounds(n_rows: int, chunk_rows: int, min_rows: int) -> list:
+    """(start, stop) row blocks of `chunk_rows`; a tail shorter than
+    `min_rows` joins the block before it."""
+    starts = list(range(0, n_rows, chunk_rows))
+    if len(starts) > 1 and n_rows - starts[-1] < min_rows:
+        starts.pop()
+    return list(zip(starts, starts[1:] + [n_rows]))
+
+
+def run_pca_chunked(
+    df: DataFrame,
+    cat_cols: list,
+    analytes: list,
+    cols_numeric_clr: list,
+    n_components: int = MAX_PCA_COMPONENTS,
+    chunk_rows: Optional[int] = None,
+) -> tuple:
+    """
+    `run_pca` on the CLR+scaled `analytes` of an untransformed `df`, done
+    in row blocks so the transformed matrix is never built whole.
+
+    Three passes over `df`: CLR each block (CLR is row-wise) and accumulate
+    StandardScaler's running means/variances; scale each block with the
+    final statistics and `IncrementalPCA.partial_fit` it; project each
+    block. Beyond `df` itself, peak memory is one block of analytes plus the
+    (n_rows x n_components) scores.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        Selected rows (see select_frame), analytes not yet transformed.
+    cat_cols : list-like
+        Categorical columns in df.
+    analytes : list-like
+        Analytes to run PCA on, in model order.
+    cols_numeric_clr : list-like
+        The compositional subset of `analytes`, CLR-transformed before
+        scaling.
+    n_components : int, default MAX_PCA_COMPONENTS
+        Capped as in `run_pca`.
+    chunk_rows : int, optional
+        Rows per block. Defaults to PCA_CHUNK_ROWS.
+
+    Returns
+    -----
+    df_plot, ldg_df, expl_var
+        As `run_pca`. Components may differ from it in sign.
+
+    Raises
+    ------
+    ValueError
+        If a compositional value is zero or missing (see clr_transform).
+    """
+    n_components = max(1, min(n_components, len(analytes), len(df)))
+    positions = df.columns.get_indexer(analytes)
+    clr_mask = np.isin(analytes, list(cols_numeric_clr))
+    bounds = _chunk_bounds(len(df), max(chunk_rows or PCA_CHUNK_ROWS, n_components), n_components)
+
+    def blocks():
+        for start, stop in bounds:
+            X = df.iloc[start:stop, positions].to_numpy(dtype=np.float64, copy=True)
+            if clr_mask.any():
+                X[:, clr_mask] = clr_transform(X[:, clr_mask])
+            yield X
+
+    start_time = time.perf_counter()
+    scaler = StandardScaler()
+    for X in blocks():
+        scaler.partial_fit(X)
+    ipca = IncrementalPCA(n_components=n_components)
+    for X in blocks():
+        ipca.partial_fit(scaler.transform(X))
+    scores = np.vstack([ipca.transform(scaler.transform(X)) for X in blocks()])
+    logger.info(
+        "Chunked PCA on %d x %d in %d blocks took %.3fs",
+        len(df),
+        len(analytes),
+        len(bounds),
+        time.perf_counter() - start_time,
+    )
+    df_plot = make_df_for_biplot(scores, df, col_list=cat_cols, num_comp=n_components)
+    ldg_df = loading_matrix(ipca, list(analytes))
+    return df_plot, ldg_df, ipca.explained_variance_ratio_.tolist()
+
+
+def run_pmap(
+    df: DataFrame,
+    cat_cols: list,
+    analytes: list,
+    n_neighbors: int = 15,
+    init: Optional[np.ndarray] = None,
+):
     """
     Run PacMAP on a dataframe.
 
@@ -71,19 +192,104 @@ def run_pmap(df: DataFrame, cat_cols: list, analytes: list, n_neighbors: int = 1
     analytes : list-like
         Analytes to run PCA on.
     n_neighbors : int, default 15
-        Number of neighbors for PacMAP.
+        Number of neighbors for PacMAP. The nearest-neighbor pairs come from
+        a per-process graph cache (see neighbor_graph.py), so re-running on
+        the same data with the same or a smaller n_neighbors skips the kNN
+        search.
+    init : numpy array, optional
+        (n_rows, 2) starting coordinates (see `warm_start_init`). If given,
+        the fit runs PMAP_WARM_START_ITERS iterations from there instead of
+        a full cold fit from PaCMAP's PCA initialization.
 
     Returns
     -----
     df_pmap
         Dataframe for plotting biplot.
     """
-    pmap_trns = pacmap.PaCMAP(n_neighbors=n_neighbors, random_state=42).fit_transform(df[analytes])
+    X = df[analytes].to_numpy(dtype="float32")
+    pmap_obj = pacmap.PaCMAP(
+        n_neighbors=n_neighbors,
+        random_state=42,
+        pair_neighbors=cached_neighbor_pairs(X, n_neighbors),
+        **({"num_iters": PMAP_WARM_START_ITERS} if init is not None else {}),
+    )
+    pmap_trns = pmap_obj.fit_transform(X, init=init)
     df_pmap = make_df_for_biplot(pmap_trns, df, col_list=cat_cols, prefix="PMAP")
     return df_pmap
 
 
-def pca_loading_matrix(df, n_components=2):
+def warm_start_init(
+    df: DataFrame, analytes: list, previous_embedding: Optional[DataFrame]
+) -> Optional[np.ndarray]:
+    """
+    Starting coordinates for a PaCMAP fit of `df` from a previous embedding.
+
+    Rows are matched on the index (df_master's row labels, which survive
+    subsetting). Rows the previous embedding doesn't have start at the mean
+    position of their 5 nearest retained rows in analyte space, so added
+    locations land near similar samples rather than at the origin.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        Transformed dataframe about to be embedded.
+    analytes : list-like
+        Analyte columns PaCMAP will embed.
+    previous_embedding : pandas dataframe, optional
+        A previous `run_pmap` result (PMAP1/PMAP2 columns).
+
+    Returns
+    -------
+    numpy array or None
+        (len(df), 2) coordinates, or None - fit cold - if there is no
+        previous embedding, row labels are ambiguous, or fewer than
+        PMAP_WARM_START_MIN_OVERLAP of the rows were previously embedded.
+    """
+    if previous_embedding is None or len(df) == 0:
+        return None
+    if not (df.index.is_unique and previous_embedding.index.is_unique):
+        return None
+    retained = df.index.isin(previous_embedding.index)
+    if retained.mean() < PMAP_WARM_START_MIN_OVERLAP:
+        return None
+
+    init = previous_embedding.reindex(df.index)[["PMAP1", "PMAP2"]].to_numpy(
+        dtype="float32", copy=True
+    )
+    if not retained.all():
+        X = df[analytes].to_numpy(dtype="float32")
+        knn = NearestNeighbors(n_neighbors=min(5, int(retained.sum()))).fit(X[retained])
+        _, nbrs = knn.kneighbors(X[~retained])
+        init[~retained] = init[retained][nbrs].mean(axis=1)
+    return init
+
+
+def choose_pca_solver(n_samples: int, n_features: int, n_components: int) -> str:
+    """
+    Pick an sklearn PCA `svd_solver` for an (n_samples, n_features) matrix.
+
+    - "covariance_eigh" when rows far outnumber analytes (the usual shape -
+      e.g. 100k samples x 60 analytes): eigendecomposes the small
+      n_features x n_features covariance matrix instead of factorizing the
+      data, so the cost is one pass over the rows.
+    - "randomized" when only a few of many components are needed from a
+      large, roughly square matrix.
+    - "full" (exact LAPACK SVD) otherwise - small matrices, where it's
+      already fast.
+
+    Returns
+    -------
+    str
+        The solver name.
+    """
+    if n_features <= 1000 and n_samples >= 10 * n_features:
+        return "covariance_eigh"
+    if max(n_samples, n_features) > 500 and n_components < 0.8 * min(n_samples, n_features):
+        return "randomized"
+    return "full"
+
+
+def pca_loading_matrix(df, n_components=2, svd_solver=None):
     """
     Performs PCA and calculates loading matrix.
 
@@ -99,6 +305,10 @@ def pca_loading_matrix(df, n_components=2):
     n_components : int, default 6
         Number of PCA components.
 
+    svd_solver : str, optional
+        sklearn PCA solver. Defaults to PCA_SOLVER, where "auto" means
+        `choose_pca_solver`. The solver used and the fit time are logged.
+
     Returns
     -----
     temp_pca
@@ -114,11 +324,23 @@ def pca_loading_matrix(df, n_components=2):
     # if labels list not given assign columns of df
     labels_list = df.columns.tolist()
 
+    svd_solver = svd_solver or PCA_SOLVER
+    if svd_solver == "auto":
+        svd_solver = choose_pca_solver(df.shape[0], df.shape[1], n_components)
+
     # build PCA
-    temp_pca = PCA(n_components=n_components, random_state=42)
+    temp_pca = PCA(n_components=n_components, svd_solver=svd_solver, random_state=42)
 
     # transform
+    start = time.perf_counter()
     df_pca = temp_pca.fit_transform(df)
+    logger.info(
+        "PCA (%s solver) on %d x %d took %.3fs",
+        svd_solver,
+        df.shape[0],
+        df.shape[1],
+        time.perf_counter() - start,
+    )
 
     # call loading matrix function
     ld_mat = loading_matrix(temp_pca, labels_list)
@@ -157,6 +379,183 @@ def loading_matrix(pca_obj, labels_list):
     return ld_mat
 
 
+def select_features(
+    df: DataFrame,
+    col_loc_id: str,
+    cols_numeric_simple: list,
+    cols_numeric_clr: list,
+    feature_selection: list,
+    loc_id_selection: list,
+    col_date: Optional[str] = None,
+    date_range: Optional[Sequence[str]] = None,
+    selection_index: Optional[SelectionIndex] = None,
+) -> Tuple[DataFrame, list, list]:
+    """
+    Subset `df` to the selected date range/locations/analytes, untransformed.
+    See `process_dimension_reduction` for the parameters.
+
+    The subset is resolved to row/column positions by `selection_index`
+    (built here if not given) and copied out of `df` once.
+
+    Returns
+    -------
+    df_selected
+        The selected rows (metadata columns carried through).
+    cols_numeric_all
+        The selected analyte columns, in model order.
+    cols_numeric_clr
+        The compositional subset of `cols_numeric_all`.
+
+    Raises
+    ------
+    ValueError
+        If `feature_selection` is empty - fitting PCA/PaCMAP on zero columns
+        fails deep inside sklearn/pacmap with an unhelpful error otherwise.
+    """
+    if not feature_selection:
+        logger.error("Dimension reduction requested with empty feature_selection")
+        raise ValueError("No analytes selected for dimension reduction")
+
+    if selection_index is None:
+        selection_index = SelectionIndex(
+            df, col_loc_id, col_date, cols_numeric_simple, cols_numeric_clr
+        )
+    return select_frame(df, selection_index, loc_id_selection, feature_selection, date_range)
+
+
+def prepare_features(
+    df: DataFrame,
+    col_loc_id: str,
+    cols_numeric_simple: list,
+    cols_numeric_clr: list,
+    feature_selection: list,
+    loc_id_selection: list,
+    col_date: Optional[str] = None,
+    date_range: Optional[Sequence[str]] = None,
+    on_subset: Optional[Callable[[], None]] = None,
+    log_composition: Optional[LogComposition] = None,
+    selection_index: Optional[SelectionIndex] = None,
+) -> Tuple[DataFrame, list]:
+    """
+    `select_features`, then CLR+scale the selection - the shared input of
+    PCA and PaCMAP. See `process_dimension_reduction` for the parameters;
+    `on_subset` is called between subsetting and the transform.
+
+    Returns
+    -------
+    df_clr
+        Transformed dataframe (metadata columns carried through).
+    cols_numeric_all
+        The selected analyte columns, in model order.
+
+    Raises
+    ------
+    ValueError
+        If `feature_selection` is empty (see select_features).
+    """
+    df, cols_numeric_all, cols_numeric_clr = select_features(
+        df,
+        col_loc_id,
+        cols_numeric_simple,
+        cols_numeric_clr,
+        feature_selection,
+        loc_id_selection,
+        col_date=col_date,
+        date_range=date_range,
+        selection_index=selection_index,
+    )
+    if on_subset is not None:
+        on_subset()
+    df_clr = clr_transform_scale(df, cols_numeric_all, cols_numeric_clr, log_composition)
+    return df_clr, cols_numeric_all
+
+
+def process_pca(
+    df,
+    col_loc_id,
+    cols_meta,
+    cols_numeric_simple,
+    cols_numeric_clr,
+    feature_selection,
+    loc_id_selection,
+    col_date: Optional[str] = None,
+    date_range: Optional[Sequence[str]] = None,
+    log_composition: Optional[LogComposition] = None,
+    selection_index: Optional[SelectionIndex] = None,
+) -> Tuple[DataFrame, DataFrame, list]:
+    """
+    The PCA half of `process_dimension_reduction` (same parameters, minus
+    the PaCMAP-only ones) - milliseconds even on thousands of rows, so it can
+    run inline while PaCMAP is deferred. Selections of PCA_CHUNKED_MIN_ROWS
+    rows or more go through `run_pca_chunked` instead of a full CLR'd copy.
+
+    Returns
+    -------
+    (df_plot_pca, ldg_df, expl_var)
+    """
+    df, cols_numeric_all, cols_numeric_clr = select_features(
+        df,
+        col_loc_id,
+        cols_numeric_simple,
+        cols_numeric_clr,
+        feature_selection,
+        loc_id_selection,
+        col_date=col_date,
+        date_range=date_range,
+        selection_index=selection_index,
+    )
+    if len(df) >= PCA_CHUNKED_MIN_ROWS:
+        return run_pca_chunked(df, cols_meta, cols_numeric_all, cols_numeric_clr)
+    df_clr = clr_transform_scale(df, cols_numeric_all, cols_numeric_clr, log_composition)
+    return run_pca(df_clr, cols_meta, cols_numeric_all)
+
+
+def process_pmap(
+    df,
+    col_loc_id,
+    cols_meta,
+    cols_numeric_simple,
+    cols_numeric_clr,
+    feature_selection,
+    loc_id_selection,
+    n_neighbors,
+    col_date: Optional[str] = None,
+    date_range: Optional[Sequence[str]] = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+    previous_embedding: Optional[DataFrame] = None,
+    log_composition: Optional[LogComposition] = None,
+    selection_index: Optional[SelectionIndex] = None,
+) -> DataFrame:
+    """
+    The PaCMAP half of `process_dimension_reduction` (same parameters).
+
+    Returns
+    -------
+    df_plot_pmap
+    """
+    report = progress or (lambda fraction, message: None)
+
+    report(0.0, "Selecting data")
+    df_clr, cols_numeric_all = prepare_features(
+        df,
+        col_loc_id,
+        cols_numeric_simple,
+        cols_numeric_clr,
+        feature_selection,
+        loc_id_selection,
+        col_date=col_date,
+        date_range=date_range,
+        on_subset=lambda: report(0.1, "Transforming data"),
+        log_composition=log_composition,
+        selection_index=selection_index,
+    )
+    init = warm_start_init(df_clr, cols_numeric_all, previous_embedding)
+    report(0.2, "Running PaCMAP" if init is None else "Running PaCMAP (warm start)")
+    df_plot_pmap = run_pmap(df_clr, cols_meta, cols_numeric_all, n_neighbors, init=init)
+    report(1.0, "Done")
+    return df_plot_pmap
+
+
 def process_dimension_reduction(
     df,
     col_loc_id,
@@ -168,10 +567,19 @@ def process_dimension_reduction(
     n_neighbors,
     col_date: Optional[str] = None,
     date_range: Optional[Sequence[str]] = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+    overlap: Optional[bool] = None,
+    previous_embedding: Optional[DataFrame] = None,
+    log_composition: Optional[LogComposition] = None,
+    selection_index: Optional[SelectionIndex] = None,
 ) -> Tuple[Tuple[DataFrame, DataFrame, list], DataFrame]:
     """
     Subset `df` to the selected date range/locations/analytes, CLR+scale it,
-    and run both PCA and PaCMAP on the result.
+    and run both PCA and PaCMAP on the result - overlapped (see `overlap`),
+    since the two only share the (read-only) transformed feature matrix.
+    Only the synchronous Apply fallback (job_runner.build_working_data)
+    comes through here; with background jobs, PCA and PaCMAP run as
+    separate phases instead.
 
     Parameters
     ----------
@@ -198,6 +606,26 @@ def process_dimension_reduction(
         display-only "Mask" in `DataPlotter.df_between_dates`.
     date_range : list of str, optional
         `[start_date, end_date]`, inclusive. No filtering applied if None.
+    progress : callable, optional
+        `progress(fraction, message)`, called between stages (fraction in
+        [0, 1]). Also the cancellation checkpoint - any exception it raises
+        aborts the run (see job_runner.JobCancelled). With `overlap` an
+        abort after PaCMAP has started only stops the wait for it: PaCMAP
+        has no checkpoints of its own, so its thread runs to completion in
+        the background and the result is discarded.
+    overlap : bool, optional
+        Run PaCMAP on a worker thread while PCA runs on this one. Defaults
+        to `DIMRED_OVERLAP`; False runs them serially.
+    previous_embedding : pandas DataFrame, optional
+        An earlier `df_plot_pmap` to warm start PaCMAP from (see
+        `warm_start_init`). Cold fit if None.
+    log_composition : LogComposition, optional
+        Precomputed logs of `df`'s compositional columns (see
+        session_codec.load_log_composition); the CLR step slices it instead
+        of re-logging the selection.
+    selection_index : SelectionIndex, optional
+        Precomputed row/column lookups for `df` (see
+        session_codec.load_selection_index). Built per call if None.
 
     Returns
     -------
@@ -209,16 +637,43 @@ def process_dimension_reduction(
         If `feature_selection` is empty - fitting PCA/PaCMAP on zero columns
         fails deep inside sklearn/pacmap with an unhelpful error otherwise.
     """
-    if not feature_selection:
-        logger.error("process_dimension_reduction called with empty feature_selection")
-        raise ValueError("No analytes selected for dimension reduction")
-
-    df = subset_df_dateRange(df, col_date, date_range)
-    df = subset_df_locIds(df, col_loc_id, loc_id_selection)
-    df, cols_numeric_all, cols_numeric_clr = subset_df_numericFeatures(
-        df, cols_numeric_simple, cols_numeric_clr, feature_selection
+    report = progress or (lambda fraction, message: None)
+
+    report(0.0, "Selecting data")
+    df_clr, cols_numeric_all = prepare_features(
+        df,
+        col_loc_id,
+        cols_numeric_simple,
+        cols_numeric_clr,
+        feature_selection,
+        loc_id_selection,
+        col_date=col_date,
+        date_range=date_range,
+        on_subset=lambda: report(0.1, "Transforming data"),
+        log_composition=log_composition,
+        selection_index=selection_index,
     )
-    df_clr = clr_transform_scale(df, cols_numeric_all, cols_numeric_clr)
-    df_plot_pca, ldg_df, expl_var = run_pca(df_clr, cols_meta, cols_numeric_all)
-    df_plot_pmap = run_pmap(df_clr, cols_meta, cols_numeric_all, n_neighbors)
-    return (df_plot_pca, ldg_df, expl_var), df_plot_pmap
+    init = warm_start_init(df_clr, cols_numeric_all, previous_embedding)
+    overlap = DIMRED_OVERLAP if overlap is None else overlap
+    if not overlap:
+        report(0.2, "Running PCA")
+        pca_result = run_pca(df_clr, cols_meta, cols_numeric_all)
+        report(0.3, "Running PaCMAP")
+        df_plot_pmap = run_pmap(df_clr, cols_meta, cols_numeric_all, n_neighbors, init=init)
+    else:
+        report(0.2, "Running PCA and PaCMAP")
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dimred")
+        try:
+            pmap_future = executor.submit(
+                run_pmap, df_clr, cols_meta, cols_numeric_all, n_neighbors, init=init
+            )
+            pca_result = run_pca(df_clr, cols_meta, cols_numeric_all)
+            report(0.3, "Running PaCMAP")
+            df_plot_pmap = pmap_future.result()
+        finally:
+            # Don't block an aborted run (e.g. a cancelled job) on PaCMAP.
+            # This doesn't stop a fit already in progress - the thread keeps
+            # running until run_pmap returns (see `progress` above).
+            executor.shutdown(wait=False, cancel_futures=True)
+    report(1.0, "Done")
+    return pca_result, df_plot_pmap
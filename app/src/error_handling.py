@@ -13,14 +13,54 @@ Stacking order with the existing `callback_prevent_initial_output` decorator
     @callback_prevent_initial_output
     def my_callback(...):
         ...
+
+A callback that finds its session snapshot expired server-side (see
+store_utils.SessionExpiredError) isn't a bug to log with a traceback: both
+decorators, and `on_callback_error` (the app-level Dash `on_error` for
+undecorated callbacks), clear the session Stores and explain why instead.
 """
 
 from functools import wraps
 from typing import Any, Callable
 
 import dash
+import dash_bootstrap_components as dbc
 
 from .logging_config import get_logger
+from .store_utils import SessionExpiredError
+
+logger = get_logger(__name__)
+
+# Stores holding session handles; cleared when their snapshot has expired.
+SESSION_STORES = ("session", "meta-data", "working-data")
+SESSION_EXPIRED_MESSAGE = (
+    "Your session has expired on the server - reload the data or a saved session."
+)
+
+
+def surface_session_expired(err: Exception) -> bool:
+    """If `err` is a SessionExpiredError, reset the app to its no-data state
+    (clear SESSION_STORES, show SESSION_EXPIRED_MESSAGE) via dash.set_props
+    and return True; otherwise return False."""
+    if not isinstance(err, SessionExpiredError):
+        return False
+    logger.warning("Session snapshot expired; clearing the session stores")
+    for store in SESSION_STORES:
+        dash.set_props(store, {"data": None})
+    dash.set_props(
+        "global-alert-container",
+        {"children": dbc.Alert(SESSION_EXPIRED_MESSAGE, color="warning", dismissable=True)},
+    )
+    return True
+
+
+def on_callback_error(err: Exception) -> None:
+    """App-level Dash `on_error`: handles an expired session (see
+    surface_session_expired) with no_update outputs, and re-raises anything
+    else unchanged."""
+    if surface_session_expired(err):
+        return None
+    raise err
 
 
 def log_and_prevent_update(logger_name: str, fallback: Any = dash.no_update) -> Callable:
@@ -41,8 +81,9 @@ def log_and_prevent_update(logger_name: str, fallback: Any = dash.no_update) ->
                 return func(*args, **kwargs)
             except dash.exceptions.PreventUpdate:
                 raise
-            except Exception:
-                logger.exception("Unhandled error in callback %s", func.__name__)
+            except Exception as e:
+                if not surface_session_expired(e):
+                    logger.exception("Unhandled error in callback %s", func.__name__)
                 return fallback
 
         return wrapper
@@ -76,7 +117,8 @@ def log_and_surface_error(
             except dash.exceptions.PreventUpdate:
                 raise
             except Exception as e:
-                logger.exception("Unhandled error in callback %s", func.__name__)
+                if not surface_session_expired(e):
+                    logger.exception("Unhandled error in callback %s", func.__name__)
                 if isinstance(fallback, tuple):
                     result = list(fallback)
                     result.insert(error_output_index, f"Error: {e}")
@@ -0,0 +1,96 @@
+"""Per-process memoization of rendered PCA/PaCMAP figures.
+
+Toggling the plot-group dropdowns or the date slider back and forth
+re-renders figures that were built seconds earlier, and a Plotly build plus
+its serialization costs seconds at 100k points. Rendered figures are kept as
+JSON in `cache_initialize.figure_cache` (byte-bounded LRU, one per gunicorn
+worker), keyed by everything `DataPlotter` draws them from, so revisiting a
+recent view is a lookup and a `json.loads`.
+
+The key uses `store_utils.store_digest` of the raw `working-data`,
+`meta-data` and `custom-color-overrides` Store payloads - a snapshot handle
+already names its content, and an inlined payload is hashed - so nothing has
+to be loaded to look a figure up.
+
+Functions
+---------
+figure_cache_key
+get_figure
+put_figure
+"""
+
+import json
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import plotly.graph_objects as go
+
+from .cache_initialize import figure_cache
+from .logging_config import get_logger
+from .store_utils import store_digest
+
+logger = get_logger(__name__)
+
+
+def figure_cache_key(
+    kind: str,
+    working_data: Optional[str],
+    meta_data: Optional[str],
+    custom_color_overrides: Optional[str],
+    selected_data: Optional[dict],
+    plot_groups: Sequence[Optional[str]],
+    date_range: Optional[Sequence[int]],
+    view: Sequence[Any] = (),
+) -> Tuple[Any, ...]:
+    """
+    figure_cache key for one biplot.
+
+    Parameters
+    ----------
+    kind : str
+        "pca" or "pmap".
+    working_data, meta_data, custom_color_overrides : str, optional
+        The raw Store payloads, as the plot_data callback receives them.
+    selected_data : dict, optional
+        The map's Plotly selectedData; only its location IDs matter (see
+        DataPlotter.load_dataframes).
+    plot_groups : list
+        Primary and secondary plotting-group columns.
+    date_range : list of int, optional
+        Date slider window (years).
+    view : tuple
+        Figure-specific inputs, e.g. the PCA components or PaCMAP's
+        n_neighbors.
+    """
+    selection = None
+    if selected_data is not None:
+        loc_ids = {str(point["customdata"][0]) for point in selected_data["points"]}
+        selection = tuple(sorted(loc_ids))
+    return (
+        kind,
+        store_digest(working_data),
+        store_digest(meta_data),
+        store_digest(custom_color_overrides),
+        selection,
+        tuple(plot_groups),
+        tuple(date_range) if date_range is not None else None,
+        tuple(view),
+    )
+
+
+def get_figure(key: Tuple[Any, ...]) -> Optional[Dict[str, Any]]:
+    """The cached figure for `key` as a figure dict, or None on a miss."""
+    fig_json = figure_cache.get(key)
+    if fig_json is None:
+        logger.debug("Figure cache miss for %s (%s)", key[0], figure_cache.stats())
+        return None
+    return json.loads(fig_json)
+
+
+def put_figure(key: Tuple[Any, ...], fig: go.Figure) -> Dict[str, Any]:
+    """Cache `fig` under `key` and return it as a figure dict.
+
+    The figure is serialized once here; handing Dash the parsed dict rather
+    than the Figure saves it a second, slower serialization of its own."""
+    fig_json = fig.to_json()
+    figure_cache.put(key, fig_json)
+    return json.loads(fig_json)
@@ -0,0 +1,437 @@
+"""Background execution of the Apply (PCA/PaCMAP) computation.
+
+Apply is two-phase: PCA (milliseconds) runs inline in the callback via
+`build_pca_working_data`, which writes `working-data` with `df_plot_pmap`
+set to None so the PCA biplot renders immediately; PaCMAP (seconds) is
+then submitted as a job to a per-worker process pool, and the browser polls
+`get_job` (via a dcc.Interval) for progress and, once the job is done, picks
+up the new `session`/`working-data` Store handles the job wrote server-side
+with the embedding filled in (merged into the browser's current session by
+`merge_pmap_job_session`). Job state lives in Redis (see
+session_manager's job_* helpers), so any gunicorn worker can answer a poll
+or a cancel for a job submitted through another.
+
+Cancellation is cooperative: `process_pmap` reports progress between stages
+and the job's progress callback raises `JobCancelled` at the next
+checkpoint once the cancel flag is set. PaCMAP's fit itself has no
+checkpoints, so a cancel that arrives mid-fit takes effect when the fit
+returns. Submitting a new job for a workspace cancels (supersedes) its
+previous one.
+
+A job whose worker process dies (OOM, a killed spawn child) can't record
+its own failure, so each job's future also gets a done-callback
+(`_record_job_exit`) that marks the job failed - or cancelled, if the
+future was - unless the job already finished; a broken pool is then
+replaced on the next submission.
+
+Without Redis, `jobs_available()` is False and app.py runs
+`build_working_data` (PCA and PaCMAP together) synchronously instead.
+
+Each finished PaCMAP embedding is kept in the session as `pmap_embedding`.
+With the request's `pmap_warm_start` set, the next fit starts from it (see
+dimension_reduction_functions.warm_start_init), so small selection edits
+converge in fewer iterations and the layout stays put between Applies.
+
+Functions
+---------
+build_pca_working_data
+build_pmap_working_data
+build_working_data
+merge_pmap_job_session
+jobs_available
+submit_pmap_job
+get_job
+cancel_job
+"""
+
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pandas import DataFrame
+
+from .data_manager import SessionManager
+from .logging_config import configure_logging, get_logger
+from .result_cache import (
+    cached_dimension_reduction,
+    cached_pca,
+    cached_pmap,
+    dimension_reduction_data_token,
+)
+from .session_codec import (
+    decode_frame,
+    encode_frame,
+    load_frame,
+    load_log_composition,
+    load_selection_index,
+)
+from .session_manager import (
+    load_job_state,
+    ping,
+    save_job_state,
+    swap_workspace_job,
+)
+from .store_utils import dump_session, load_session
+
+logger = get_logger(__name__)
+
+# Set to "0" to always run Apply synchronously inside the request.
+BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS", "1") != "0"
+# Worker processes per gunicorn worker.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_FINISHED = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback once the job has been cancelled."""
+
+
+def _selection_args(session: Dict[str, Any], request: Dict[str, Any]) -> Dict[str, Any]:
+    """Keyword arguments shared by cached_pca/cached_pmap/
+    cached_dimension_reduction for an Apply request."""
+    meta_data = session["meta_data"]
+    cols_key_meta = meta_data["cols_key_meta"]
+    cols_key_plot = meta_data["cols_key_plot"]
+    col_date = cols_key_meta["date"]
+    df_master = load_frame(session, "df_master", col_date)
+    return {
+        "df": df_master,
+        "col_loc_id": cols_key_meta["loc_id"],
+        "cols_meta": cols_key_plot["meta"],
+        "cols_numeric_simple": cols_key_plot["numeric_simple"],
+        "cols_numeric_clr": cols_key_plot["numeric_clr"],
+        "feature_selection": request["feature_selection"],
+        "loc_id_selection": request["loc_id_selection"],
+        "col_date": col_date,
+        "date_range": request["date_filter_range"],
+        "data_hash": dimension_reduction_data_token(session),
+        "log_composition": load_log_composition(
+            session, df_master, cols_key_plot["numeric_clr"]
+        ),
+        "selection_index": load_selection_index(
+            session,
+            df_master,
+            cols_key_meta["loc_id"],
+            col_date,
+            cols_key_plot["numeric_simple"],
+            cols_key_plot["numeric_clr"],
+        ),
+    }
+
+
+def _previous_embedding(
+    session: Dict[str, Any], request: Dict[str, Any]
+) -> Optional[DataFrame]:
+    """The session's last PaCMAP embedding, if the request asks to warm start."""
+    if not request.get("pmap_warm_start") or not session.get("pmap_embedding"):
+        return None
+    return decode_frame(session["pmap_embedding"])
+
+
+def _remember_embedding(session: Dict[str, Any], df_plot_pmap: DataFrame) -> None:
+    session["pmap_embedding"] = encode_frame(df_plot_pmap[["PMAP1", "PMAP2"]])
+
+
+def _store_working_data(
+    session: Dict[str, Any],
+    request: Dict[str, Any],
+    plot_components_pca: tuple,
+    plot_components_pmap: Optional[Any],
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Package the results into working_data and record the Apply inputs in
+    session["plotting_data"]."""
+    dict_working_data = SessionManager.package_plotting_data(
+        plot_components_pca, plot_components_pmap, session["meta_data"]
+    )
+    session["working_data"] = dict_working_data
+    session["plotting_data"].update(
+        {
+            "feature_selection_dropdown_value": request["feature_selection"],
+            "loc_id_dropdown_value": request["loc_id_selection"],
+            "date_filter_range_dropdown_value": request["date_filter_range"],
+            "map_group_dropdown_value": request["map_group"],
+            "plot_group_dropdown_1_value": request["plot_group_1"],
+            "plot_group_dropdown_2_value": request["plot_group_2"],
+            "pmap_neighbors": request["n_neighbors"],
+            "pmap_warm_start": bool(request.get("pmap_warm_start")),
+        }
+    )
+    return dict_working_data, session
+
+
+# The plotting_data entries _store_working_data records for an Apply.
+APPLY_PLOTTING_KEYS = (
+    "feature_selection_dropdown_value",
+    "loc_id_dropdown_value",
+    "date_filter_range_dropdown_value",
+    "map_group_dropdown_value",
+    "plot_group_dropdown_1_value",
+    "plot_group_dropdown_2_value",
+    "pmap_neighbors",
+    "pmap_warm_start",
+)
+
+
+def build_pca_working_data(
+    session: Dict[str, Any], request: Dict[str, Any]
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Phase 1 of Apply: run (cached) PCA and fold it into the session, with
+    `df_plot_pmap` left as None for `build_pmap_working_data` to fill in.
+
+    Parameters
+    ----------
+    session : dict
+        The *loaded* session dict. Mutated in place.
+    request : dict
+        The Apply inputs: feature_selection, loc_id_selection, n_neighbors,
+        date_filter_range, map_group, plot_group_1, plot_group_2, and
+        optionally pmap_warm_start.
+
+    Returns
+    -------
+    (working_data, session)
+    """
+    plot_components_pca = cached_pca(**_selection_args(session, request))
+    return _store_working_data(session, request, plot_components_pca, None)
+
+
+def build_pmap_working_data(
+    session: Dict[str, Any],
+    request: Dict[str, Any],
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Phase 2 of Apply: run (cached) PaCMAP and add `df_plot_pmap` to the
+    session's phase-1 working_data.
+
+    Parameters
+    ----------
+    session : dict
+        The *loaded* session dict as written by `build_pca_working_data`.
+        Mutated in place.
+    request : dict
+        See `build_pca_working_data`.
+    progress : callable, optional
+        See `process_dimension_reduction`.
+
+    Returns
+    -------
+    (working_data, session)
+    """
+    args = _selection_args(session, request)
+    df_plot_pmap = cached_pmap(
+        n_neighbors=request["n_neighbors"],
+        progress=progress,
+        previous_embedding=_previous_embedding(session, request),
+        **args,
+    )
+    _remember_embedding(session, df_plot_pmap)
+    dict_working_data = session["working_data"]
+    dict_working_data["df_plot_pmap"] = encode_frame(df_plot_pmap, args["col_date"])
+    return dict_working_data, session
+
+
+def build_working_data(
+    session: Dict[str, Any],
+    request: Dict[str, Any],
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Both phases of Apply in one call (PCA and PaCMAP run concurrently) - the
+    synchronous fallback when background jobs aren't available. Same
+    parameters/return as `build_pmap_working_data`, starting from any
+    loaded session.
+    """
+    plot_components_pca, plot_components_pmap = cached_dimension_reduction(
+        n_neighbors=request["n_neighbors"],
+        progress=progress,
+        previous_embedding=_previous_embedding(session, request),
+        **_selection_args(session, request),
+    )
+    _remember_embedding(session, plot_components_pmap)
+    return _store_working_data(session, request, plot_components_pca, plot_components_pmap)
+
+
+def merge_pmap_job_session(
+    session: Dict[str, Any], job_session: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Fold a finished PaCMAP job's results into the session as it is now.
+
+    The job ran on the session snapshot taken when it was submitted, so
+    writing that snapshot back would revert whatever the user changed while
+    it ran (custom groups, their dropdown options, ...). Only what Apply
+    produces is taken from the job: `working_data`, `pmap_embedding` and the
+    APPLY_PLOTTING_KEYS entries of `plotting_data`.
+
+    Parameters
+    ----------
+    session : dict
+        The *loaded* current session. Mutated in place.
+    job_session : dict
+        The *loaded* session the job published.
+
+    Returns
+    -------
+    dict
+        `session`.
+    """
+    session["working_data"] = job_session["working_data"]
+    if job_session.get("pmap_embedding"):
+        session["pmap_embedding"] = job_session["pmap_embedding"]
+    plotting_data = job_session.get("plotting_data", {})
+    session.setdefault("plotting_data", {}).update(
+        {key: plotting_data[key] for key in APPLY_PLOTTING_KEYS if key in plotting_data}
+    )
+    return session
+
+
+def jobs_available() -> bool:
+    """True if Apply should run as a background job (enabled and Redis is up)."""
+    return BACKGROUND_JOBS and ping()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Lazily create this process's pool - after gunicorn has forked, and
+    with the spawn start method so workers never inherit Redis connections
+    or locks mid-use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=JOB_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=configure_logging,
+            )
+        return _executor
+
+
+def submit_pmap_job(session_raw: str, workspace_id: str, request: Dict[str, Any]) -> str:
+    """
+    Queue phase 2 (PaCMAP) of an Apply request, superseding the workspace's
+    previous job.
+
+    Parameters
+    ----------
+    session_raw : str
+        The `session` Store payload (a server-side handle) written by phase
+        1 - the job loads the session itself rather than pickling df_master
+        across processes.
+    workspace_id : str
+        The session's workspace; the job's outputs are stored under it.
+    request : dict
+        See `build_pca_working_data`.
+
+    Returns
+    -------
+    str
+        The new job's ID.
+    """
+    job_id = uuid.uuid4().hex
+    save_job_state(job_id, status=JOB_QUEUED, progress="0", message="Queued", cancel="0")
+    previous = swap_workspace_job(workspace_id, job_id)
+    if previous:
+        logger.info("Job %s superseded by %s", previous, job_id)
+        cancel_job(previous)
+    executor = _get_executor()
+    future = executor.submit(_run_pmap_job, job_id, workspace_id, session_raw, request)
+    future.add_done_callback(lambda future: _record_job_exit(job_id, future, executor))
+    return job_id
+
+
+def _record_job_exit(job_id: str, future: Future, executor: ProcessPoolExecutor) -> None:
+    """Done-callback for a job's future: if the job never recorded a
+    finished state itself - its future was cancelled, or its worker died -
+    record one now so pollers stop waiting on it. Drops `executor` if it is
+    broken, so the next submission starts a fresh pool."""
+    global _executor
+    if future.cancelled():
+        status, error = JOB_CANCELLED, None
+    else:
+        exc = future.exception()
+        if exc is None:
+            return
+        status, error = JOB_FAILED, f"PaCMAP worker stopped unexpectedly ({exc!r})"
+        if isinstance(exc, BrokenProcessPool):
+            with _executor_lock:
+                if _executor is executor:
+                    _executor = None
+    try:
+        if load_job_state(job_id).get("status") in JOB_FINISHED:
+            return
+        logger.error("Job %s exited without finishing: %s", job_id, error or status)
+        fields = {"status": status, "message": status.capitalize()}
+        if error:
+            fields["error"] = error
+        save_job_state(job_id, **fields)
+    except Exception:
+        logger.exception("Could not record the exit of job %s", job_id)
+
+
+def get_job(job_id: str) -> Dict[str, Any]:
+    """
+    Current state of a job.
+
+    Returns
+    -------
+    dict
+        `status`, `progress` (int percent), `message`, plus `session` and
+        `working_data` Store payloads once done, or `error` once failed.
+        `status` is JOB_FAILED for an unknown/expired job.
+    """
+    state = load_job_state(job_id)
+    if not state:
+        return {"status": JOB_FAILED, "progress": 0, "message": "", "error": "Job not found."}
+    state["progress"] = int(state.get("progress", 0))
+    return state
+
+
+def cancel_job(job_id: str) -> None:
+    """Flag a job for cancellation at its next progress checkpoint."""
+    save_job_state(job_id, cancel="1")
+
+
+def _run_pmap_job(
+    job_id: str, workspace_id: str, session_raw: str, request: Dict[str, Any]
+) -> None:
+    """Process-pool entry point: run build_pmap_working_data and publish the
+    result (or failure) to the job's state hash."""
+
+    def progress(fraction: float, message: str) -> None:
+        if load_job_state(job_id).get("cancel") == "1":
+            raise JobCancelled
+        save_job_state(job_id, progress=str(int(fraction * 100)), message=message)
+
+    try:
+        save_job_state(job_id, status=JOB_RUNNING)
+        session = load_session(session_raw)
+        dict_working_data, session = build_pmap_working_data(session, request, progress)
+        progress(1.0, "Saving results")
+        save_job_state(
+            job_id,
+            status=JOB_DONE,
+            progress="100",
+            message="Done",
+            working_data=dump_session(dict_working_data, workspace_id),
+            session=dump_session(session, workspace_id),
+        )
+    except JobCancelled:
+        logger.info("Job %s cancelled", job_id)
+        save_job_state(job_id, status=JOB_CANCELLED, message="Cancelled")
+    except Exception as e:
+        logger.exception("Job %s failed", job_id)
+        save_job_state(job_id, status=JOB_FAILED, message="Failed", error=str(e))
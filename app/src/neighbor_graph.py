@@ -0,0 +1,164 @@
+"""Reusable nearest-neighbor graphs for PaCMAP.
+
+PaCMAP spends a large share of each fit finding every row's nearest
+neighbors, and that search doesn't depend on `n_neighbors` beyond how many
+neighbors it keeps. `cached_neighbor_pairs` keeps one graph per matrix,
+with each row's neighbors sorted the way PaCMAP ranks them, and slices off
+the first `n_neighbors` for each request - so lowering n_neighbors, or
+returning to a value already fitted, only costs the optimizer.
+
+A graph is searched for `n_neighbors + 50` candidates, the pool PaCMAP
+itself ranks, with the same approximate search PaCMAP uses by default (a
+faiss HNSW index, 32 links per node, single-threaded so the graph is
+deterministic). A cold fit therefore costs what PaCMAP's own pair sampling
+would. A request for more neighbors than the cached graph holds searches
+again and replaces it.
+
+Neighbors are ranked by PaCMAP's scaled distance d_ij^2 / (sigma_i sigma_j),
+with sigma_i the mean distance to row i's 4th-6th neighbors, as in
+`pacmap.pacmap.generate_pair`. For the n_neighbors a graph was built for,
+the pairs are PaCMAP's own. A smaller n_neighbors served from a wider graph
+ranks more candidates than PaCMAP would (sigma and the pool come from the
+wider search), so its pairs can differ slightly from a fresh PaCMAP fit.
+
+Functions
+---------
+build_neighbor_graph
+neighbor_pairs
+can_use_neighbor_graph
+cached_neighbor_pairs
+"""
+
+import hashlib
+import os
+import time
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from .cache_initialize import knn_graph_cache
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Largest n_neighbors served from a cached graph; above it PaCMAP samples
+# its own pairs.
+KNN_GRAPH_MAX_NEIGHBORS = int(os.getenv("KNN_GRAPH_MAX_NEIGHBORS", 150))
+# PaCMAP ranks n_neighbors + 50 candidates.
+_EXTRA_CANDIDATES = 50
+# Links per node of the HNSW index - PaCMAP's faiss backend default.
+_HNSW_LINKS = 32
+# PaCMAP's default mid-near/further pair ratios.
+_MN_RATIO = 0.5
+_FP_RATIO = 2.0
+# PaCMAP reduces dimensionality with TruncatedSVD before its search above
+# this many features, which changes the neighbors - don't precompute then.
+_MAX_FEATURES = 100
+
+
+def build_neighbor_graph(X: np.ndarray, n_candidates: int) -> np.ndarray:
+    """
+    Find each row's approximate nearest neighbors, ranked by PaCMAP's scaled
+    distance.
+
+    Parameters
+    ----------
+    X : numpy.ndarray
+        (n_samples, n_features) float32 matrix PaCMAP will embed.
+    n_candidates : int
+        Neighbors to find per row (at least 6, at most n_samples - 1).
+
+    Returns
+    -------
+    numpy.ndarray
+        (n_samples, n_candidates) int32 neighbor indices, best first.
+    """
+    n_samples = X.shape[0]
+    # As PaCMAP does with a random_state: threaded HNSW construction is
+    # not deterministic.
+    faiss.omp_set_num_threads(1)
+    index = faiss.IndexHNSWFlat(X.shape[1], _HNSW_LINKS, faiss.METRIC_L2)
+    index.add(X)
+    sq_distances, nbrs = index.search(X, n_candidates + 1)
+    # Drop each row's own index. The search is approximate, so self isn't
+    # always first (and may be missing) - then the farthest candidate goes.
+    is_self = nbrs == np.arange(n_samples)[:, None]
+    is_self[~is_self.any(axis=1), -1] = True
+    keep = ~is_self
+    nbrs = nbrs[keep].reshape(n_samples, n_candidates)
+    distances = np.sqrt(np.maximum(sq_distances[keep], 0)).reshape(n_samples, n_candidates)
+    sig = np.maximum(distances[:, 3:6].mean(axis=1), 1e-10)
+    scaled_dist = distances**2 / sig[:, None] / sig[nbrs]
+    order = np.argsort(scaled_dist, axis=1, kind="stable")
+    return np.take_along_axis(nbrs, order, axis=1).astype(np.int32)
+
+
+def neighbor_pairs(graph: np.ndarray, n_neighbors: int) -> np.ndarray:
+    """
+    PaCMAP `pair_neighbors` for the first `n_neighbors` columns of `graph`.
+
+    Returns
+    -------
+    numpy.ndarray
+        (n_samples * n_neighbors, 2) int32 array of (row, neighbor) pairs.
+    """
+    n = graph.shape[0]
+    rows = np.repeat(np.arange(n, dtype=np.int32), n_neighbors)
+    return np.column_stack([rows, graph[:, :n_neighbors].ravel()])
+
+
+def can_use_neighbor_graph(n_samples: int, n_features: int, n_neighbors: int) -> bool:
+    """
+    True if PaCMAP would use `n_neighbors` as given for this matrix shape.
+
+    PaCMAP shrinks n_neighbors (and the mid-near/further pair counts) on
+    small samples and projects wide data with TruncatedSVD before its own
+    search; precomputed pairs would no longer match either way, so those
+    fits fall back to PaCMAP's own pair sampling.
+    """
+    n_mn = int(round(n_neighbors * _MN_RATIO))
+    n_fp = int(round(n_neighbors * _FP_RATIO))
+    return (
+        n_features <= _MAX_FEATURES
+        and n_neighbors <= KNN_GRAPH_MAX_NEIGHBORS
+        and n_neighbors + n_mn + n_fp < n_samples - 1
+    )
+
+
+def cached_neighbor_pairs(X: np.ndarray, n_neighbors: int) -> Optional[np.ndarray]:
+    """
+    `neighbor_pairs` for `X`, reusing this process's cached graph for the
+    same matrix when it holds at least `n_neighbors + 50` candidates.
+
+    Parameters
+    ----------
+    X : numpy.ndarray
+        (n_samples, n_features) matrix PaCMAP will embed.
+    n_neighbors : int
+        PaCMAP's n_neighbors.
+
+    Returns
+    -------
+    numpy.ndarray or None
+        None if `can_use_neighbor_graph` is False - let PaCMAP sample pairs
+        itself.
+    """
+    n_samples, n_features = X.shape
+    if not can_use_neighbor_graph(n_samples, n_features, n_neighbors):
+        return None
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    key = (X.shape, hashlib.blake2b(X.tobytes(), digest_size=16).hexdigest())
+    n_candidates = min(n_neighbors + _EXTRA_CANDIDATES, n_samples - 1)
+    graph = knn_graph_cache.get(key)
+    if graph is None or graph.shape[1] < n_candidates:
+        start = time.perf_counter()
+        graph = build_neighbor_graph(X, n_candidates)
+        knn_graph_cache.put(key, graph)
+        logger.info(
+            "Built %d-neighbor graph for %d rows in %.3fs",
+            n_candidates,
+            n_samples,
+            time.perf_counter() - start,
+        )
+    return neighbor_pairs(graph, n_neighbors)
@@ -1,11 +1,14 @@
+import hashlib
 import inspect
+import os
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import plotly.graph_objects as go
 import numpy as np
 import pandas as pd
 import plotly.express as px
+from dash import Patch
 
 from .logging_config import get_logger
 
@@ -29,6 +32,19 @@ size_line_2 = 0.2
 _DEFAULT_COLOR = "#808080"
 _DEFAULT_MARKER_SYMBOL = "circle"
 
+# Biplot render mode: "per_location" (an SVG trace and legend entry per
+# location), "batched" (a WebGL trace per plotting-group category, see
+# _add_batched_traces) or "auto" - batched once a plot has more than
+# SCATTER_BATCH_MIN_LOCATIONS locations or SCATTER_BATCH_MIN_POINTS points.
+SCATTER_RENDER_MODE = os.getenv("SCATTER_RENDER_MODE", "auto")
+SCATTER_BATCH_MIN_LOCATIONS = int(os.getenv("SCATTER_BATCH_MIN_LOCATIONS", 200))
+SCATTER_BATCH_MIN_POINTS = int(os.getenv("SCATTER_BATCH_MIN_POINTS", 20_000))
+_RENDER_MODES = ("auto", "per_location", "batched")
+
+# PCA biplots draw only the LOADINGS_TOP_K longest loading vectors in the
+# plotted plane (0 = all of them); see _annotate_loadings.
+LOADINGS_TOP_K = int(os.getenv("LOADINGS_TOP_K", 0))
+
 
 @dataclass
 class PlotContext:
@@ -52,6 +68,24 @@ def empty_fig() -> go.Figure:
     return go.Figure()
 
 
+def placeholder_fig(message: str) -> go.Figure:
+    """A blank figure with `message` centered in it, e.g. while a plot's data
+    is still being computed."""
+    fig = go.Figure()
+    fig.add_annotation(
+        text=message,
+        x=0.5,
+        y=0.5,
+        xref="paper",
+        yref="paper",
+        showarrow=False,
+        font={"size": 16, "color": "grey"},
+    )
+    fig.update_xaxes(visible=False)
+    fig.update_yaxes(visible=False)
+    return fig
+
+
 def _bounds_from_coordinates(
     latitudes: np.ndarray, longitudes: np.ndarray, padding: float = 0.1
 ) -> Dict[str, float]:
@@ -161,18 +195,25 @@ def _find_axis_limits(
     return x_min - x_margin, x_max + x_margin, y_min - y_margin, y_max + y_margin
 
 
-def _format_date_range(df: pd.DataFrame, date_col: Optional[str]) -> str:
-    """min->max formatted date range for `df`'s rows, used to label a
-    split-by-category legend entry (see make_base_scatter_plot) - a bare
-    location id would otherwise repeat identically across every split
-    entry for that location, so the legend needs something that
-    distinguishes them."""
+def _parsed_dates(df: pd.DataFrame, date_col: Optional[str]) -> Optional[pd.Series]:
+    """`df[date_col]` as datetimes (unparseable values -> NaT), or None if
+    there is no date column. Parsed once per figure, not per trace."""
     if not date_col or date_col not in df.columns:
-        return "unknown date range"
-    dates = pd.to_datetime(df[date_col], errors="coerce").dropna()
-    if dates.empty:
+        return None
+    return pd.to_datetime(df[date_col], errors="coerce")
+
+
+def _format_date_range(dates: Optional[pd.Series]) -> str:
+    """min->max formatted date range of a trace's `dates` (see
+    _parsed_dates), used to label a split-by-category legend entry (see
+    make_base_scatter_plot) - a bare location id would otherwise repeat
+    identically across every split entry for that location, so the legend
+    needs something that distinguishes them."""
+    if dates is None:
         return "unknown date range"
     date_min, date_max = dates.min(), dates.max()
+    if pd.isna(date_min):
+        return "unknown date range"
     if date_min == date_max:
         return f"{date_min.date()}"
     return f"{date_min.date()}->{date_max.date()}"
@@ -214,33 +255,323 @@ def _wrap_legend_label(label: str, max_len: int = 20) -> str:
     return f"{loc_code}<br>{bracket_part}"
 
 
-def _generate_text(
-    site: str,
-    df: pd.DataFrame,
-    primary_domain: str,
-    secondary_domain: str,
-    date_col: Optional[str],
-) -> List[str]:
-    """Per-point hover text for a scatter trace, one entry per row of `df`."""
-    if date_col:
-        formatted_dates = df[date_col]
-    else:
-        formatted_dates = ["N/A"] * len(df)
+def _hover_dates(df: pd.DataFrame, date_col: Optional[str]) -> np.ndarray:
+    """Per-point date strings for the hover label, formatted column-wise:
+    "YYYY-MM-DD", with the time of day only if some row has one."""
+    if not date_col:
+        return np.full(len(df), "N/A")
+    dates = df[date_col]
+    if not pd.api.types.is_datetime64_dtype(dates):
+        # Unparsed or tz-aware dates: shown as stored.
+        return dates.to_numpy(dtype=str)
+    values = dates.to_numpy()
+    dated = values[~np.isnat(values)]
+    if (dated.astype("datetime64[D]") == dated).all():
+        return np.datetime_as_string(values, unit="D")
+    return np.char.replace(np.datetime_as_string(values, unit="s"), "T", " ")
+
+
+def _hover_template(primary_value: Any, secondary_value: Any) -> str:
+    """Hover label for one trace. The site and date come from each point's
+    customdata (`[loc_id, entity_id, date]`); the domains are the same for
+    every point of a trace, so they are written into the template and no
+    per-point text is built or sent."""
+    lines = [f"<b>%{{customdata[0]}}</b><br><b>Primary Domain:</b> {primary_value}"]
+    if primary_value != secondary_value:
+        lines.append(f"<b>Secondary Domain:</b> {secondary_value}")
+    lines.append("<b>Date:</b> %{customdata[2]}<extra></extra>")
+    return "<br>".join(lines)
+
+
+def _style_colors(
+    ctx: PlotContext, primary_value: Any, secondary_value: Any
+) -> Tuple[str, str, float]:
+    """(face color, outline color, outline width) for a primary/secondary
+    domain pair - a thin black outline when both domains share a color."""
+    color_face = ctx.dict_color_map_primary.get(primary_value)
+    color_line = ctx.dict_color_map_secondary.get(secondary_value)
+    if color_face is None or color_line is None:
+        # Stale/mismatched group value (e.g. dropdown state built before
+        # a re-upload) - fall back to a generic color rather than
+        # KeyError-ing the whole plot.
+        logger.warning(
+            "No color mapping for group value(s) %r/%r; using default color",
+            primary_value,
+            secondary_value,
+        )
+        color_face = color_face or _DEFAULT_COLOR
+        color_line = color_line or _DEFAULT_COLOR
+    size_line = size_line_1 if color_line != color_face else size_line_2
+    color_line = color_line if color_line != color_face else "black"
+    return color_face, color_line, size_line
+
+
+def _resolve_render_mode(df: pd.DataFrame, ctx: PlotContext, render_mode: Optional[str]) -> str:
+    """The concrete mode ("per_location" or "batched") to draw `df` in, for
+    `render_mode` or SCATTER_RENDER_MODE if None."""
+    render_mode = render_mode or SCATTER_RENDER_MODE
+    if render_mode not in _RENDER_MODES:
+        raise ValueError(
+            f"Unknown scatter render mode {render_mode!r}; expected one of {_RENDER_MODES}"
+        )
+    if render_mode != "auto":
+        return render_mode
+    if (
+        len(df) > SCATTER_BATCH_MIN_POINTS
+        or df[ctx.col_loc_id].nunique() > SCATTER_BATCH_MIN_LOCATIONS
+    ):
+        return "batched"
+    return "per_location"
 
-    if df[primary_domain].iloc[0] == df[secondary_domain].iloc[0]:
-        texts = [
-            f"<b>{site}</b><br><b>Primary Domain:</b> {p}<br><b>Date:</b> {date}"
-            for p, date in zip(df[primary_domain], formatted_dates)
-        ]
-    else:
-        texts = [
-            f"<b>{site}</b><br><b>Primary Domain:</b> {p}<br><b>Secondary Domain:</b> {s}<br><b>Date:</b> {date}"
-            for p, s, date in zip(
-                df[primary_domain], df[secondary_domain], formatted_dates
+
+@dataclass
+class _ScatterTrace:
+    """One biplot trace as laid out by make_base_scatter_plot: which rows of
+    the frame it draws (None for a legend-only proxy) and how it is styled.
+    The figure builders and the Patch builders (patch_scatter_colors,
+    patch_pca_components) share this layout, so a trace's index in the
+    figure is its index in scatter_traces' list."""
+
+    rows: Optional[np.ndarray]
+    primary_value: Any
+    secondary_value: Any
+    marker_symbol: Any
+    name: Any
+    legendgroup: str
+    showlegend: bool
+
+
+def _location_traces(df: pd.DataFrame, ctx: PlotContext) -> List[_ScatterTrace]:
+    """One trace (and legend entry) per location, in location order - split
+    further per primary/secondary domain pair present at that location."""
+    # A location's rows can span more than one primary/secondary domain value
+    # when custom groups are scoped to ctx.col_entity_id (e.g. different dates
+    # at the same LOCATION_ID assigned to different custom categories) -
+    # taking the first value for the whole location would silently paint
+    # every point there with only the first date's category color. Split into
+    # one sub-trace per distinct (primary, secondary) pair actually present,
+    # in order of first appearance. Grouping by position (key[1]/key[-1])
+    # rather than by label: col_primary_domain and col_secondary_domain are
+    # frequently the same column.
+    domain_cols = list(dict.fromkeys([ctx.col_primary_domain, ctx.col_secondary_domain]))
+    positions = df.groupby(
+        [ctx.col_loc_id] + domain_cols, sort=False, observed=True, dropna=False
+    ).indices
+    pairs_by_location: Dict[Any, List[Tuple[Any, Any, np.ndarray]]] = {}
+    for key, rows in positions.items():
+        if pd.isna(key[0]):
+            continue  # rows without a location are not plotted
+        pairs_by_location.setdefault(key[0], []).append((key[1], key[-1], rows))
+
+    dates = _parsed_dates(df, ctx.col_date)
+    traces = []
+    for loc_code in sorted(pairs_by_location):
+        marker_symbol = ctx.name_marker_map.get(loc_code)
+        if marker_symbol is None:
+            logger.warning(
+                "No marker symbol mapped for location %r; using default marker",
+                loc_code,
+            )
+            marker_symbol = _DEFAULT_MARKER_SYMBOL
+        # A single category at this location: keep the plain one-trace,
+        # one-legend-entry-per-location behavior. Multiple categories: each
+        # needs its own legend entry (a reader needs to see that this location
+        # has split categories, and which is which), so name each sub-trace
+        # "loc_code [date_min->date_max]" instead of collapsing them under one
+        # shared, ambiguous "loc_code" entry.
+        domain_pairs = pairs_by_location[loc_code]
+        split_by_category = len(domain_pairs) > 1
+        for primary_value, secondary_value, rows in domain_pairs:
+            trace_name = loc_code
+            if split_by_category:
+                trace_dates = dates.iloc[rows] if dates is not None else None
+                trace_name = _wrap_legend_label(f"{loc_code} [{_format_date_range(trace_dates)}]")
+            traces.append(
+                _ScatterTrace(
+                    rows=rows,
+                    primary_value=primary_value,
+                    secondary_value=secondary_value,
+                    marker_symbol=marker_symbol,
+                    name=trace_name,
+                    legendgroup=str(loc_code),
+                    showlegend=True,
+                )
             )
-        ]
+    return traces
 
-    return texts
+
+def _marker_symbols(loc_ids: pd.Series, name_marker_map: Dict[Any, str]) -> np.ndarray:
+    """Per-point marker symbols for `loc_ids`, defaulting (with one warning)
+    for locations missing from `name_marker_map`."""
+    symbols = loc_ids.map(name_marker_map)
+    missing = symbols.isna().to_numpy()
+    if missing.any():
+        logger.warning(
+            "No marker symbol mapped for %d location(s), e.g. %r; using default marker",
+            loc_ids[missing].nunique(),
+            loc_ids[missing].iloc[0],
+        )
+    return np.where(missing, _DEFAULT_MARKER_SYMBOL, symbols.to_numpy(dtype=object))
+
+
+def _batched_traces(df: pd.DataFrame, ctx: PlotContext) -> List[_ScatterTrace]:
+    """
+    One trace per style key - primary/secondary domain pair plus marker
+    symbol - whatever the number of locations.
+
+    The symbol is part of the key, not a per-point array: plotly validates
+    enumerated values element by element, which alone took seconds at 100k
+    points. The data traces stay out of the legend; each domain pair
+    instead gets one legend-only proxy trace in the same legendgroup, so
+    clicking its entry still shows/hides the whole category.
+    """
+    domain_cols = list(dict.fromkeys([ctx.col_primary_domain, ctx.col_secondary_domain]))
+    style_keys = df[domain_cols].assign(
+        _symbol=_marker_symbols(df[ctx.col_loc_id], ctx.name_marker_map)
+    )
+    # sort=False: legend order follows the frame (already sorted by plotting
+    # group), and symbols may mix names with plotly's numeric codes.
+    positions = style_keys.groupby(
+        list(style_keys.columns), sort=False, observed=True, dropna=False
+    ).indices
+    traces = []
+    legend_entries = set()
+    for key, rows in positions.items():
+        primary_value, secondary_value, marker_symbol = key[0], key[-2], key[-1]
+        name = (
+            str(primary_value)
+            if primary_value == secondary_value
+            else f"{primary_value} / {secondary_value}"
+        )
+        legendgroup = f"{primary_value}|{secondary_value}"
+        traces.append(
+            _ScatterTrace(
+                rows, primary_value, secondary_value, marker_symbol, name, legendgroup, False
+            )
+        )
+        if legendgroup not in legend_entries:
+            legend_entries.add(legendgroup)
+            traces.append(
+                _ScatterTrace(
+                    None,
+                    primary_value,
+                    secondary_value,
+                    _DEFAULT_MARKER_SYMBOL,
+                    name,
+                    legendgroup,
+                    True,
+                )
+            )
+    return traces
+
+
+def scatter_traces(
+    df: pd.DataFrame, ctx: PlotContext, render_mode: Optional[str] = None
+) -> Tuple[str, List[_ScatterTrace]]:
+    """(resolved render mode, trace layout) make_base_scatter_plot draws
+    `df` with - per location, or batched (see SCATTER_RENDER_MODE)."""
+    render_mode = _resolve_render_mode(df, ctx, render_mode)
+    if render_mode == "batched":
+        return render_mode, _batched_traces(df, ctx)
+    return render_mode, _location_traces(df, ctx)
+
+
+def _layout_signature(render_mode: str, traces: List[_ScatterTrace]) -> str:
+    """Digest of a scatter trace layout: the render mode and, per trace, its
+    legend group and the rows it draws. Two figures with the same signature
+    have the same trace at every index."""
+    digest = hashlib.blake2b(render_mode.encode("utf-8"), digest_size=16)
+    for trace in traces:
+        digest.update(repr((trace.legendgroup, trace.showlegend)).encode("utf-8"))
+        digest.update(b"-" if trace.rows is None else np.asarray(trace.rows, np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def _layout_changed(
+    render_mode: str, traces: List[_ScatterTrace], layout_signature: Optional[str]
+) -> bool:
+    """Whether `traces` no longer match the figure with `layout_signature`
+    (never, when there is no signature to check against)."""
+    if layout_signature is None or layout_signature == _layout_signature(render_mode, traces):
+        return False
+    logger.info("Scatter trace layout changed since the figure was built; rebuilding it")
+    return True
+
+
+def figure_layout_signature(fig: Union[go.Figure, Dict[str, Any]]) -> Optional[str]:
+    """The scatter layout signature make_base_scatter_plot stored in `fig`'s
+    layout.meta, or None for a figure it did not build (e.g. a placeholder)."""
+    if isinstance(fig, go.Figure):
+        meta = fig.layout.meta
+    else:
+        meta = fig.get("layout", {}).get("meta")
+    return meta.get("scatter_layout") if isinstance(meta, dict) else None
+
+
+def _add_scatter_traces(
+    plotly_fig: go.Figure,
+    df: pd.DataFrame,
+    ctx: PlotContext,
+    x_col: str,
+    y_col: str,
+    traces: List[_ScatterTrace],
+    webgl: bool,
+) -> None:
+    """Add `traces` to `plotly_fig`: SVG go.Scatter per location, or WebGL
+    go.Scattergl when batched."""
+    trace_type = go.Scattergl if webgl else go.Scatter
+    entity_col = ctx.col_entity_id if ctx.col_entity_id else ctx.col_loc_id
+    # customdata carries per-point identity (site + composite site/date
+    # entity id) without affecting trace grouping/legend, plus the hover
+    # date. Built once for the whole frame as a fixed-width string array:
+    # plotly coerces lists item by item and deep-copies object arrays
+    # element by element.
+    customdata = np.column_stack(
+        (
+            df[ctx.col_loc_id].to_numpy(dtype=str),
+            df[entity_col].to_numpy(dtype=str),
+            _hover_dates(df, ctx.col_date),
+        )
+    )
+    x_values = df[x_col].to_numpy()
+    y_values = df[y_col].to_numpy()
+    for trace in traces:
+        color_face, color_line, size_line = _style_colors(
+            ctx, trace.primary_value, trace.secondary_value
+        )
+        marker = dict(
+            size=size_marker,
+            color=color_face,
+            line={"color": color_line, "width": size_line},
+            symbol=trace.marker_symbol,
+        )
+        if trace.rows is None:
+            plotly_fig.add_trace(
+                trace_type(
+                    x=[None],
+                    y=[None],
+                    mode="markers",
+                    name=trace.name,
+                    legendgroup=trace.legendgroup,
+                    showlegend=True,
+                    marker=marker,
+                    hoverinfo="skip",
+                )
+            )
+            continue
+        plotly_fig.add_trace(
+            trace_type(
+                x=x_values[trace.rows],
+                y=y_values[trace.rows],
+                mode="markers",
+                name=trace.name,
+                legendgroup=trace.legendgroup,
+                showlegend=trace.showlegend,
+                marker=marker,
+                customdata=customdata[trace.rows],
+                hovertemplate=_hover_template(trace.primary_value, trace.secondary_value),
+            )
+        )
 
 
 def make_base_scatter_plot(
@@ -250,12 +581,18 @@ def make_base_scatter_plot(
     y_col: str,
     x_label: str,
     y_label: str,
+    render_mode: Optional[str] = None,
 ) -> go.Figure:
-    """Shared scatter-plot builder behind make_fig_pca/make_fig_pmap: one trace
-    per location (ctx.col_loc_id), colored/outlined by the primary/secondary
-    plotting-group domains."""
+    """Shared scatter-plot builder behind make_fig_pca/make_fig_pmap, with
+    points colored/outlined by the primary/secondary plotting-group domains:
+    one trace per location (ctx.col_loc_id), or one WebGL trace per domain
+    pair in "batched" `render_mode` (see SCATTER_RENDER_MODE).
+
+    The trace layout's signature is kept in layout.meta (see
+    figure_layout_signature), so a Patch can be checked against it."""
     plotly_fig = go.Figure()
     xmin, xmax, ymin, ymax = _find_axis_limits(df, x_col, y_col)
+    render_mode, traces = scatter_traces(df, ctx, render_mode)
     plotly_fig.update_layout(
         xaxis_title=x_label,
         yaxis_title=y_label,
@@ -264,139 +601,100 @@ def make_base_scatter_plot(
         width=fig_width_px_plot,
         xaxis=dict(autorange=False, range=[xmin, xmax]),
         yaxis=dict(autorange=False, range=[ymin, ymax]),
+        meta={"scatter_layout": _layout_signature(render_mode, traces)},
+    )
+    _add_scatter_traces(
+        plotly_fig, df, ctx, x_col, y_col, traces, webgl=render_mode == "batched"
     )
-    entity_col = ctx.col_entity_id if ctx.col_entity_id else ctx.col_loc_id
-    for loc_code, group_df in df.groupby(ctx.col_loc_id):
-        marker_symbol = ctx.name_marker_map.get(loc_code)
-        if marker_symbol is None:
-            logger.warning(
-                "No marker symbol mapped for location %r; using default marker",
-                loc_code,
-            )
-            marker_symbol = _DEFAULT_MARKER_SYMBOL
-        # A location's rows can span more than one primary/secondary
-        # domain value when custom groups are scoped to ctx.col_entity_id
-        # (e.g. different dates at the same LOCATION_ID assigned to
-        # different custom categories) - taking .unique()[0] for the whole
-        # group would silently paint every point at that location with
-        # only the first date's category color. Split into one sub-trace
-        # per distinct (primary, secondary) pair actually present.
-        # itertuples (positional) rather than iterrows/label-indexing -
-        # col_primary_domain and col_secondary_domain are frequently the
-        # same column name, which would otherwise make this frame have two
-        # identically-labeled columns and turn label-based row access into
-        # an ambiguous Series instead of a scalar.
-        domain_pairs = list(
-            group_df[[ctx.col_primary_domain, ctx.col_secondary_domain]]
-            .drop_duplicates()
-            .itertuples(index=False, name=None)
-        )
-        # A single category at this location: keep the plain one-trace,
-        # one-legend-entry-per-location behavior. Multiple categories:
-        # each needs its own legend entry (a reader needs to see that this
-        # location has split categories, and which is which), so name each
-        # sub-trace "loc_code [date_min->date_max]" instead of collapsing
-        # them under one shared, ambiguous "loc_code" entry.
-        split_by_category = len(domain_pairs) > 1
-        for primary_value, secondary_value in domain_pairs:
-            sub_df = group_df[
-                (group_df[ctx.col_primary_domain] == primary_value)
-                & (group_df[ctx.col_secondary_domain] == secondary_value)
-            ]
-            trace_name = (
-                _wrap_legend_label(
-                    f"{loc_code} [{_format_date_range(sub_df, ctx.col_date)}]"
-                )
-                if split_by_category
-                else loc_code
-            )
-            color_face = ctx.dict_color_map_primary.get(primary_value)
-            color_line = ctx.dict_color_map_secondary.get(secondary_value)
-            if color_face is None or color_line is None:
-                # Stale/mismatched group value (e.g. dropdown state built before
-                # a re-upload) - fall back to a generic color rather than
-                # KeyError-ing the whole plot.
-                logger.warning(
-                    "No color mapping for group value(s) %r/%r; using default color",
-                    primary_value,
-                    secondary_value,
-                )
-                color_face = color_face or _DEFAULT_COLOR
-                color_line = color_line or _DEFAULT_COLOR
-            size_line = size_line_1 if color_line != color_face else size_line_2
-            color_line = color_line if color_line != color_face else "black"
-            # customdata carries per-point identity (site + composite
-            # site/date entity id) without affecting trace grouping/legend.
-            plotly_fig.add_trace(
-                go.Scatter(
-                    x=sub_df[x_col],
-                    y=sub_df[y_col],
-                    mode="markers",
-                    name=trace_name,
-                    legendgroup=str(loc_code),
-                    showlegend=True,
-                    marker=dict(
-                        size=size_marker,
-                        color=color_face,
-                        line={
-                            "color": color_line,
-                            "width": size_line,
-                        },
-                        symbol=marker_symbol,
-                    ),
-                    customdata=sub_df[[ctx.col_loc_id, entity_col]].values,
-                    text=_generate_text(
-                        loc_code,
-                        sub_df,
-                        ctx.col_primary_domain,
-                        ctx.col_secondary_domain,
-                        ctx.col_date,
-                    ),
-                    hoverinfo="text",
-                )
-            )
     return plotly_fig
 
 
+def _loading_traces(
+    ldg_df: pd.DataFrame,
+    x_col: str,
+    y_col: str,
+    col_metal: str = "metals",
+    top_k: Optional[int] = None,
+) -> List[go.Scatter]:
+    """
+    The loading-vector layer of a PCA biplot: one line trace holding every
+    arrow (segments from the origin, separated by None) with an arrowhead
+    marker at each tip, and one text trace with the analyte labels just
+    past the tips.
+
+    Parameters
+    ----------
+    ldg_df : pandas DataFrame
+        Loading matrix (see dimension_reduction_functions.loading_matrix).
+    x_col, y_col : str
+        The plotted components.
+    col_metal : str, default "metals"
+        Analyte-name column.
+    top_k : int, optional
+        Only draw the `top_k` vectors longest in the x_col/y_col plane.
+        Defaults to LOADINGS_TOP_K; None or 0 draws all of them.
+    """
+    top_k = LOADINGS_TOP_K if top_k is None else top_k
+    x = ldg_df[x_col].to_numpy(dtype=float)
+    y = ldg_df[y_col].to_numpy(dtype=float)
+    labels = ldg_df[col_metal].to_numpy(dtype=str)
+    length = np.hypot(x, y)
+    if top_k and top_k < len(length):
+        keep = np.sort(np.argsort(-length, kind="stable")[:top_k])
+        x, y, labels, length = x[keep], y[keep], labels[keep], length[keep]
+
+    # Each arrow is origin -> tip -> gap; only the tip gets a (visible) marker,
+    # pointing away from the origin.
+    line_x = [value for tip in x.tolist() for value in (0.0, tip, None)]
+    line_y = [value for tip in y.tolist() for value in (0.0, tip, None)]
+    marker_size = [0, 9, 0] * len(x)
+
+    # Labels sit slightly past the tip, along the arrow.
+    offset_distance = 0.02
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scale = np.where(length > 0, offset_distance / length, 0.0)
+    return [
+        go.Scatter(
+            x=line_x,
+            y=line_y,
+            mode="lines+markers",
+            line={"color": "black", "width": 0.8},
+            marker={
+                "symbol": "arrow",
+                "angleref": "previous",
+                "size": marker_size,
+                "color": "black",
+            },
+            name="loadings",
+            showlegend=False,
+            hoverinfo="skip",
+        ),
+        go.Scatter(
+            x=(x + x * scale).tolist(),
+            y=(y + y * scale).tolist(),
+            mode="text",
+            text=labels.tolist(),
+            textfont={"size": 13, "color": "black"},
+            name="loading labels",
+            showlegend=False,
+            hoverinfo="skip",
+        ),
+    ]
+
+
 def _annotate_loadings(
     ldg_df: pd.DataFrame,
     plotly_fig: go.Figure,
     x_col: str,
     y_col: str,
     col_metal: str = "metals",
+    top_k: Optional[int] = None,
 ) -> go.Figure:
-    """Draw PCA loading-vector arrows + labels for each analyte in `ldg_df`."""
-    for x, y, metal in zip(ldg_df[x_col], ldg_df[y_col], ldg_df[col_metal]):
-        # Arrow annotation
-        plotly_fig.add_annotation(
-            x=x,
-            y=y,
-            ax=0,
-            ay=0,
-            xref="x",
-            yref="y",
-            axref="x",
-            ayref="y",
-            showarrow=True,
-            arrowhead=3,
-            arrowsize=1.5,
-            arrowwidth=0.8,
-            arrowcolor="black",
-        )
-
-        # Text annotation slightly offset from the arrow tip
-        direction = np.array([x, y]) / np.linalg.norm([x, y])
-        offset_distance = 0.02
-        text_offset = direction * offset_distance
-        plotly_fig.add_annotation(
-            x=x + text_offset[0],
-            y=y + text_offset[1],
-            xref="x",
-            yref="y",
-            text=metal,
-            showarrow=False,
-            font=dict(size=13, color="black"),
-        )
+    """Draw PCA loading-vector arrows + labels for the analytes in `ldg_df`
+    as two traces after the existing ones (see _loading_traces) - two
+    layout annotations per analyte were slow to build and for Plotly.js to
+    lay out with dozens of analytes."""
+    plotly_fig.add_traces(_loading_traces(ldg_df, x_col, y_col, col_metal, top_k))
     return plotly_fig
 
 
@@ -406,9 +704,10 @@ def make_fig_pmap(
     n_neighbors: int = 10,
     x_col: str = "PMAP1",
     y_col: str = "PMAP2",
+    render_mode: Optional[str] = None,
 ) -> go.Figure:
     """PaCMAP biplot (PMAP1/PMAP2 columns by default) for the current plot
-    groups."""
+    groups. See make_base_scatter_plot for `render_mode`."""
     plotly_fig = make_base_scatter_plot(
         df=df,
         ctx=ctx,
@@ -416,6 +715,7 @@ def make_fig_pmap(
         y_col=y_col,
         x_label=f"{x_col} (nNeighbors={n_neighbors})",
         y_label=f"{y_col} (nNeighbors={n_neighbors})",
+        render_mode=render_mode,
     )
     return plotly_fig
 
@@ -434,6 +734,11 @@ def _component_explained_variance(col_name: str, expl_var: List[float], prefix:
         return 0.0
 
 
+def _pca_axis_label(col_name: str, expl_var: List[float]) -> str:
+    """Axis title for a PC column, e.g. "PC1 (42.00%)"."""
+    return f"{col_name} ({_component_explained_variance(col_name, expl_var)*100:.2f}%)"
+
+
 def make_fig_pca(
     df_pca: pd.DataFrame,
     ldg_df: pd.DataFrame,
@@ -442,18 +747,121 @@ def make_fig_pca(
     x_col: str = "PC1",
     y_col: str = "PC2",
     col_metal: str = "metals",
+    render_mode: Optional[str] = None,
+    loadings_top_k: Optional[int] = None,
 ) -> go.Figure:
-    """PCA biplot (PC1/PC2 columns by default + loading-vector annotations)
-    for the current plot groups. x_col/y_col select which computed
-    components to plot (e.g. "PC1"/"PC3")."""
+    """PCA biplot (PC1/PC2 columns by default + loading vectors) for the
+    current plot groups. x_col/y_col select which computed components to
+    plot (e.g. "PC1"/"PC3"); see make_base_scatter_plot for `render_mode`
+    and _loading_traces for `loadings_top_k`."""
     plotly_fig = make_base_scatter_plot(
         df=df_pca,
         ctx=ctx,
         x_col=x_col,
         y_col=y_col,
-        x_label=f"{x_col} ({_component_explained_variance(x_col, expl_var)*100:.2f}%)",
-        y_label=f"{y_col} ({_component_explained_variance(y_col, expl_var)*100:.2f}%)",
+        x_label=_pca_axis_label(x_col, expl_var),
+        y_label=_pca_axis_label(y_col, expl_var),
+        render_mode=render_mode,
     )
 
-    plotly_fig = _annotate_loadings(ldg_df, plotly_fig, x_col, y_col, col_metal)
+    plotly_fig = _annotate_loadings(ldg_df, plotly_fig, x_col, y_col, col_metal, loadings_top_k)
     return plotly_fig
+
+
+def patch_scatter_colors(
+    df: pd.DataFrame,
+    ctx: PlotContext,
+    render_mode: Optional[str] = None,
+    layout_signature: Optional[str] = None,
+) -> Optional[Patch]:
+    """
+    Recolor a figure that make_base_scatter_plot built from the same `df`
+    and `render_mode`, for new color maps in `ctx`.
+
+    Only each trace's marker face/outline is sent - a few KB - instead of
+    the whole figure with every point's coordinates and hover text.
+
+    Parameters
+    ----------
+    df : pandas DataFrame
+        The frame the figure was drawn from.
+    ctx : PlotContext
+        The figure's context, with the new color maps.
+    render_mode : str, optional
+        As passed to make_base_scatter_plot.
+    layout_signature : str, optional
+        figure_layout_signature of the figure being patched. When given and
+        `df` now lays out differently (e.g. "auto" mode crossed the batching
+        threshold), the Patch's trace indices would miss, so None is
+        returned and the figure must be rebuilt.
+
+    Returns
+    -------
+    dash.Patch or None
+    """
+    render_mode, traces = scatter_traces(df, ctx, render_mode)
+    if _layout_changed(render_mode, traces, layout_signature):
+        return None
+    patch = Patch()
+    for idx, trace in enumerate(traces):
+        color_face, color_line, size_line = _style_colors(
+            ctx, trace.primary_value, trace.secondary_value
+        )
+        patch["data"][idx]["marker"]["color"] = color_face
+        patch["data"][idx]["marker"]["line"] = {"color": color_line, "width": size_line}
+    return patch
+
+
+def patch_pca_components(
+    df_pca: pd.DataFrame,
+    ldg_df: pd.DataFrame,
+    expl_var: List[float],
+    ctx: PlotContext,
+    x_col: str = "PC1",
+    y_col: str = "PC2",
+    col_metal: str = "metals",
+    render_mode: Optional[str] = None,
+    loadings_top_k: Optional[int] = None,
+    layout_signature: Optional[str] = None,
+) -> Optional[Patch]:
+    """
+    Move a make_fig_pca figure built from the same `df_pca`, `ctx`,
+    `render_mode` and `loadings_top_k` onto other components.
+
+    Sends the new coordinates, axis ranges/titles and loading-vector
+    traces; styles, customdata and hover templates are unchanged and stay
+    client-side.
+
+    Parameters
+    ----------
+    df_pca, ldg_df, expl_var, ctx, x_col, y_col, col_metal, render_mode, loadings_top_k
+        See make_fig_pca.
+    layout_signature : str, optional
+        See patch_scatter_colors.
+
+    Returns
+    -------
+    dash.Patch or None
+    """
+    render_mode, traces = scatter_traces(df_pca, ctx, render_mode)
+    if _layout_changed(render_mode, traces, layout_signature):
+        return None
+    patch = Patch()
+    x_values = df_pca[x_col].to_numpy()
+    y_values = df_pca[y_col].to_numpy()
+    for idx, trace in enumerate(traces):
+        if trace.rows is None:
+            continue  # legend-only proxy
+        patch["data"][idx]["x"] = x_values[trace.rows].tolist()
+        patch["data"][idx]["y"] = y_values[trace.rows].tolist()
+    xmin, xmax, ymin, ymax = _find_axis_limits(df_pca, x_col, y_col)
+    patch["layout"]["xaxis"]["range"] = [float(xmin), float(xmax)]
+    patch["layout"]["yaxis"]["range"] = [float(ymin), float(ymax)]
+    patch["layout"]["xaxis"]["title"]["text"] = _pca_axis_label(x_col, expl_var)
+    patch["layout"]["yaxis"]["title"]["text"] = _pca_axis_label(y_col, expl_var)
+    # The loading traces follow the scatter traces (see make_fig_pca).
+    loading_traces = _loading_traces(ldg_df, x_col, y_col, col_metal, loadings_top_k)
+    for offset, trace in enumerate(loading_traces):
+        patch["data"][len(traces) + offset] = trace.to_plotly_json()
+    return patch
+
@@ -0,0 +1,334 @@
+"""Redis-backed memoization of PCA/PaCMAP results.
+
+Users tend to toggle back and forth between the same few analyte/location/
+date selections, and every PaCMAP refit costs seconds. Results are stored in
+Redis (shared by every gunicorn worker) under a hash of
+`make_custom_cache_key_dimensionReduction`'s key, with a TTL
+(`session_manager.RESULT_CACHE_TTL`), a per-entry size cap
+(`RESULT_CACHE_MAX_BYTES`) and a byte budget across all entries
+(`session_manager.RESULT_CACHE_BUDGET_BYTES`). Keys are built from the
+data's content (see `dimension_reduction_data_token`), so identical data
+shares entries across workspaces. Redis being unreachable is treated as a
+miss - the result is computed as if no cache existed.
+
+PCA and PaCMAP results are cached as separate entries (PCA's key has no
+n_neighbors), so the two-phase Apply (`cached_pca` inline, `cached_pmap` in
+a background job) and the single-shot `cached_dimension_reduction` share
+them. Warm-started PaCMAP fits depend on the previous embedding, not just on
+the key, so they bypass the PaCMAP entries (the session's own last
+embedding is their cache - see job_runner).
+
+Functions
+---------
+dimension_reduction_data_token
+cached_pca
+cached_pmap
+cached_dimension_reduction
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import redis
+from pandas import DataFrame
+
+from .cache_initialize import make_custom_cache_key_dimensionReduction
+from .compositional_data_functions import LogComposition
+from .dimension_reduction_functions import (
+    process_dimension_reduction,
+    process_pca,
+    process_pmap,
+)
+from .logging_config import get_logger
+from .selection_engine import SelectionIndex
+from .session_codec import decode_frame, encode_frame
+from .session_manager import load_result, save_result
+
+logger = get_logger(__name__)
+
+# Results bigger than this (encoded) are computed but never cached.
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+_KEY_PREFIX = "dimred:"
+
+
+def dimension_reduction_data_token(session: Dict[str, Any]) -> Optional[str]:
+    """
+    The `data_hash` component of the cache key for a loaded session.
+
+    Keyed on content, not on the workspace, so the same file mapped the same
+    way - in another tab, after a re-upload, or from a saved session - reuses
+    earlier results. `data_hash` fingerprints the upload and `content`
+    chains in any custom groups (see SessionManager.add_custom_group); the
+    frame actually reduced also depends on the column mapping, so a digest
+    of meta_data's `cols_key_meta`/`cols_key_plot` is appended.
+
+    Returns
+    -------
+    str or None
+        None for sessions with no data_hash, or with custom groups added
+        before `content` was recorded - don't cache those.
+    """
+    data_hash = session.get("data_hash") or {}
+    content = data_hash.get("content")
+    if content is None and not data_hash.get("mutation"):
+        content = data_hash.get("data_hash")
+    if not content:
+        return None
+    meta_data = session.get("meta_data") or {}
+    mapping = json.dumps(
+        [meta_data.get("cols_key_meta"), meta_data.get("cols_key_plot")],
+        sort_keys=True,
+        default=str,
+    )
+    return f"{content}:{hashlib.blake2b(mapping.encode('utf-8'), digest_size=16).hexdigest()}"
+
+
+PCAResult = Tuple[DataFrame, DataFrame, list]
+
+
+def _cache_key(
+    kind: str,
+    data_hash: str,
+    feature_selection: list,
+    loc_id_selection: list,
+    n_neighbors: Optional[int],
+    date_range: Optional[Sequence[str]],
+) -> str:
+    raw_key = make_custom_cache_key_dimensionReduction(
+        feature_selection=feature_selection,
+        loc_id_selection=loc_id_selection,
+        n_neighbors=n_neighbors,
+        data_hash=data_hash,
+        date_range=list(date_range) if date_range else None,
+    )
+    return f"{_KEY_PREFIX}{kind}:" + hashlib.md5(raw_key.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[str]:
+    try:
+        payload = load_result(key)
+    except redis.RedisError:
+        logger.warning("Result cache unavailable; computing %s directly", key)
+        return None
+    if payload is not None:
+        logger.info("Result cache hit (%s)", key)
+    return payload
+
+
+def _cache_put(key: str, payload: str) -> None:
+    if len(payload) > RESULT_CACHE_MAX_BYTES:
+        logger.info(
+            "Result %s (%d bytes) exceeds RESULT_CACHE_MAX_BYTES; not cached", key, len(payload)
+        )
+        return
+    try:
+        save_result(key, payload)
+    except redis.RedisError:
+        logger.warning("Result cache unavailable; %s not cached", key)
+
+
+def _encode_pca(result: PCAResult, col_date: Optional[str]) -> str:
+    df_plot_pca, ldg_df, expl_var = result
+    return json.dumps(
+        {
+            "df_plot_pca": encode_frame(df_plot_pca, col_date),
+            "ldg_df": encode_frame(ldg_df),
+            "expl_var": expl_var,
+        }
+    )
+
+
+def _decode_pca(payload: str, col_date: Optional[str]) -> PCAResult:
+    data = json.loads(payload)
+    return (
+        decode_frame(data["df_plot_pca"], col_date),
+        decode_frame(data["ldg_df"]),
+        data["expl_var"],
+    )
+
+
+def cached_pca(
+    df: DataFrame,
+    col_loc_id: str,
+    cols_meta: list,
+    cols_numeric_simple: list,
+    cols_numeric_clr: list,
+    feature_selection: list,
+    loc_id_selection: list,
+    col_date: Optional[str] = None,
+    date_range: Optional[Sequence[str]] = None,
+    data_hash: Optional[str] = None,
+    log_composition: Optional[LogComposition] = None,
+    selection_index: Optional[SelectionIndex] = None,
+) -> PCAResult:
+    """
+    `process_pca`, memoized in Redis. Caching is skipped if `data_hash`
+    (see `dimension_reduction_data_token`) is None.
+
+    Returns
+    -------
+    (df_plot_pca, ldg_df, expl_var)
+    """
+
+    def compute():
+        return process_pca(
+            df,
+            col_loc_id,
+            cols_meta,
+            cols_numeric_simple,
+            cols_numeric_clr,
+            feature_selection,
+            loc_id_selection,
+            col_date=col_date,
+            date_range=date_range,
+            log_composition=log_composition,
+            selection_index=selection_index,
+        )
+
+    if data_hash is None:
+        return compute()
+    key = _cache_key("pca", data_hash, feature_selection, loc_id_selection, None, date_range)
+    payload = _cache_get(key)
+    if payload is not None:
+        return _decode_pca(payload, col_date)
+    result = compute()
+    _cache_put(key, _encode_pca(result, col_date))
+    return result
+
+
+def cached_pmap(
+    df: DataFrame,
+    col_loc_id: str,
+    cols_meta: list,
+    cols_numeric_simple: list,
+    cols_numeric_clr: list,
+    feature_selection: list,
+    loc_id_selection: list,
+    n_neighbors: int,
+    col_date: Optional[str] = None,
+    date_range: Optional[Sequence[str]] = None,
+    data_hash: Optional[str] = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+    previous_embedding: Optional[DataFrame] = None,
+    log_composition: Optional[LogComposition] = None,
+    selection_index: Optional[SelectionIndex] = None,
+) -> DataFrame:
+    """
+    `process_pmap`, memoized in Redis. Caching is skipped if `data_hash` is
+    None or a `previous_embedding` to warm start from is given.
+
+    Returns
+    -------
+    df_plot_pmap
+    """
+
+    def compute():
+        return process_pmap(
+            df,
+            col_loc_id,
+            cols_meta,
+            cols_numeric_simple,
+            cols_numeric_clr,
+            feature_selection,
+            loc_id_selection,
+            n_neighbors,
+            col_date=col_date,
+            date_range=date_range,
+            progress=progress,
+            previous_embedding=previous_embedding,
+            log_composition=log_composition,
+            selection_index=selection_index,
+        )
+
+    if data_hash is None or previous_embedding is not None:
+        return compute()
+    key = _cache_key(
+        "pmap", data_hash, feature_selection, loc_id_selection, n_neighbors, date_range
+    )
+    payload = _cache_get(key)
+    if payload is not None:
+        if progress is not None:
+            progress(1.0, "Done")
+        return decode_frame(payload, col_date)
+    result = compute()
+    _cache_put(key, encode_frame(result, col_date))
+    return result
+
+
+def cached_dimension_reduction(
+    df: DataFrame,
+    col_loc_id: str,
+    cols_meta: list,
+    cols_numeric_simple: list,
+    cols_numeric_clr: list,
+    feature_selection: list,
+    loc_id_selection: list,
+    n_neighbors: int,
+    col_date: Optional[str] = None,
+    date_range: Optional[Sequence[str]] = None,
+    data_hash: Optional[str] = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+    previous_embedding: Optional[DataFrame] = None,
+    log_composition: Optional[LogComposition] = None,
+    selection_index: Optional[SelectionIndex] = None,
+) -> Tuple[PCAResult, DataFrame]:
+    """
+    `process_dimension_reduction` (PCA and PaCMAP run concurrently),
+    memoized in Redis under the same entries as `cached_pca`/`cached_pmap`.
+
+    Parameters
+    ----------
+    df, col_loc_id, cols_meta, cols_numeric_simple, cols_numeric_clr,
+    feature_selection, loc_id_selection, n_neighbors, col_date, date_range,
+    progress, previous_embedding, log_composition, selection_index
+        Passed through to `process_dimension_reduction`.
+    data_hash : str, optional
+        Identifies the exact contents of `df` - see
+        `dimension_reduction_data_token`. Caching is skipped if None or a
+        `previous_embedding` is given.
+
+    Returns
+    -------
+    (df_plot_pca, ldg_df, expl_var), df_plot_pmap
+    """
+
+    def compute():
+        return process_dimension_reduction(
+            df,
+            col_loc_id,
+            cols_meta,
+            cols_numeric_simple,
+            cols_numeric_clr,
+            feature_selection,
+            loc_id_selection,
+            n_neighbors,
+            col_date=col_date,
+            date_range=date_range,
+            progress=progress,
+            previous_embedding=previous_embedding,
+            log_composition=log_composition,
+            selection_index=selection_index,
+        )
+
+    if data_hash is None or previous_embedding is not None:
+        return compute()
+
+    pca_key = _cache_key("pca", data_hash, feature_selection, loc_id_selection, None, date_range)
+    pmap_key = _cache_key(
+        "pmap", data_hash, feature_selection, loc_id_selection, n_neighbors, date_range
+    )
+    pca_payload = _cache_get(pca_key)
+    pmap_payload = _cache_get(pmap_key) if pca_payload is not None else None
+    if pca_payload is not None and pmap_payload is not None:
+        pca_result = _decode_pca(pca_payload, col_date)
+        if progress is not None:
+            progress(1.0, "Done")
+        return pca_result, decode_frame(pmap_payload, col_date)
+
+    pca_result, df_plot_pmap = compute()
+    _cache_put(pca_key, _encode_pca(pca_result, col_date))
+    _cache_put(pmap_key, encode_frame(df_plot_pmap, col_date))
+    return pca_result, df_plot_pmap
@@ -0,0 +1,250 @@
+"""Integer-index selection over df_master.
+
+`subset_df_dateRange`, `subset_df_locIds` and `subset_df_numericFeatures`
+each copy the whole frame, and Apply/auto-cluster ran all three back to back
+on every click. `SelectionIndex` precomputes, once per df_master:
+
+- the date column sorted (with its permutation), so a date Filter is two
+  `searchsorted` calls;
+- location ID -> row positions postings;
+- analyte -> column position.
+
+`SelectionIndex.select` resolves a (date range, locations, analytes)
+selection to row and column positions, and `select_frame` materializes just that
+block with a single `iloc` - the only copy made.
+
+The date part is a standalone `DateIndex`, also used on its own for the
+upstream Filter (`subset_df_dateRange`) and the display Mask
+(`DataPlotter.df_between_dates`). Its sort permutation is built once at
+upload and stored in the session (see session_codec.load_date_index), so a
+date window is two binary searches rather than a comparison over every row.
+
+Classes
+-------
+DateIndex
+SelectionIndex
+
+Functions
+---------
+select_frame
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Timestamp
+
+
+class DateIndex:
+    """Sorted view of a naive datetime64 column for range queries.
+
+    Parameters
+    ----------
+    dates : np.ndarray
+        The column's datetime64 values, in frame (row) order.
+    order : np.ndarray, optional
+        A stable argsort of `dates` with NaT dropped, e.g. as persisted by
+        `DataPreprocessor`. Computed if None.
+    """
+
+    def __init__(self, dates: np.ndarray, order: Optional[np.ndarray] = None) -> None:
+        if order is None:
+            # NaT sorts last; it's never inside a date range, so drop it.
+            order = np.argsort(dates, kind="stable")[: int((~np.isnat(dates)).sum())]
+        self.n_rows = len(dates)
+        self.order = np.asarray(order, dtype=np.int64)
+        self.sorted_dates = dates[self.order]
+
+    @classmethod
+    def from_series(cls, dates: pd.Series) -> Optional["DateIndex"]:
+        """Index `dates`, or None if it isn't naive datetime64 (tz-aware and
+        object columns keep the element-wise comparison)."""
+        if not pd.api.types.is_datetime64_dtype(dates):
+            return None
+        return cls(dates.to_numpy())
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.order.nbytes + self.sorted_dates.nbytes)
+
+    def positions(self, start: Timestamp, end: Timestamp) -> np.ndarray:
+        """Positions (in date order) of rows in the inclusive `[start, end]`."""
+        lo = np.searchsorted(self.sorted_dates, start.to_datetime64(), side="left")
+        hi = np.searchsorted(self.sorted_dates, end.to_datetime64(), side="right")
+        return self.order[lo:hi]
+
+    def rows(self, start: Timestamp, end: Timestamp) -> np.ndarray:
+        """Ascending row positions in the inclusive `[start, end]`."""
+        return np.sort(self.positions(start, end))
+
+    def year_rows(self, first_year: int, last_year: int) -> np.ndarray:
+        """Ascending row positions dated within `[first_year, last_year]`,
+        whole years inclusive."""
+        return self.rows(
+            Timestamp(year=int(first_year), month=1, day=1),
+            Timestamp(year=int(last_year) + 1, month=1, day=1) - pd.Timedelta(1, "ns"),
+        )
+
+
+class SelectionIndex:
+    """Row/column position lookups for one df_master (see module docstring).
+
+    Parameters
+    ----------
+    df : pandas DataFrame
+        The frame selections are drawn from.
+    col_loc_id : str
+        Location-ID column.
+    col_date : str, optional
+        Mapped date column; date ranges are ignored without one, as in
+        `subset_df_dateRange`.
+    cols_numeric_simple, cols_numeric_clr : list
+        The analyte columns; every other column is metadata and always kept.
+    date_index : DateIndex, optional
+        A prebuilt index of `df[col_date]` (see session_codec.load_date_index).
+    """
+
+    def __init__(
+        self,
+        df: DataFrame,
+        col_loc_id: str,
+        col_date: Optional[str],
+        cols_numeric_simple: List[str],
+        cols_numeric_clr: List[str],
+        date_index: Optional[DateIndex] = None,
+    ) -> None:
+        self.n_rows = len(df)
+        self.columns = df.columns.to_list()
+        self.cols_numeric_simple = list(cols_numeric_simple)
+        self.cols_numeric_clr = list(cols_numeric_clr)
+        numeric = set(cols_numeric_simple) | set(cols_numeric_clr)
+        self.col_positions: Dict[str, int] = {col: i for i, col in enumerate(self.columns)}
+        self.meta_positions = [i for i, col in enumerate(self.columns) if col not in numeric]
+
+        self.loc_postings: Dict[str, np.ndarray] = {
+            loc_id: np.asarray(positions, dtype=np.int64)
+            for loc_id, positions in df.groupby(col_loc_id, sort=False).indices.items()
+        }
+
+        self.col_date = col_date
+        self.date_index = date_index
+        self._dates: Optional[pd.Series] = None
+        if col_date and date_index is None:
+            self.date_index = DateIndex.from_series(df[col_date])
+            if self.date_index is None:
+                self._dates = df[col_date]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size, for LRUCache's byte budget."""
+        total = sum(positions.nbytes for positions in self.loc_postings.values())
+        if self.date_index is not None:
+            total += self.date_index.nbytes
+        elif self._dates is not None:
+            total += int(self._dates.memory_usage(index=False, deep=True))
+        return total
+
+    def date_rows(self, date_range: Sequence[str]) -> np.ndarray:
+        """Positions (unordered) of rows inside the inclusive `date_range`."""
+        start, end = Timestamp(date_range[0]), Timestamp(date_range[1])
+        if self.date_index is None:
+            # tz-aware/object dates: fall back to comparing every row.
+            dates = self._dates
+            return np.flatnonzero(((dates >= start) & (dates <= end)).to_numpy())
+        return self.date_index.positions(start, end)
+
+    def rows(
+        self,
+        loc_id_selection: Optional[Sequence[str]],
+        date_range: Optional[Sequence[str]] = None,
+    ) -> np.ndarray:
+        """
+        Ascending row positions matching the location selection and date
+        Filter - the rows `subset_df_locIds(subset_df_dateRange(df, ...))`
+        would keep, in the same order.
+
+        Parameters
+        ----------
+        loc_id_selection : list, optional
+            Location IDs to keep; None keeps every row.
+        date_range : list of str, optional
+            `[start_date, end_date]`, inclusive; None (or no date column)
+            applies no Filter.
+        """
+        mask = np.zeros(self.n_rows, dtype=bool)
+        if loc_id_selection is None:
+            mask[:] = True
+        else:
+            for loc_id in set(loc_id_selection):
+                positions = self.loc_postings.get(loc_id)
+                if positions is not None:
+                    mask[positions] = True
+        if self.col_date and date_range:
+            in_range = np.zeros(self.n_rows, dtype=bool)
+            in_range[self.date_rows(date_range)] = True
+            mask &= in_range
+        return np.flatnonzero(mask)
+
+    def select(
+        self,
+        loc_id_selection: Optional[Sequence[str]],
+        feature_selection: Sequence[str],
+        date_range: Optional[Sequence[str]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, List[str], List[str]]:
+        """
+        Resolve a selection to positions.
+
+        Returns
+        -------
+        rows : np.ndarray
+            See `rows`.
+        cols : np.ndarray
+            Metadata columns plus the selected analytes, in frame order.
+        cols_numeric_all : list
+            Selected analytes, simple then CLR (see subset_df_numericFeatures).
+        cols_numeric_clr : list
+            Just the selected CLR analytes.
+        """
+        selected = set(feature_selection)
+        cols_simple = [col for col in self.cols_numeric_simple if col in selected]
+        cols_clr = [col for col in self.cols_numeric_clr if col in selected]
+        cols_numeric_all = cols_simple + cols_clr
+        cols = np.sort(
+            np.array(
+                self.meta_positions + [self.col_positions[col] for col in cols_numeric_all],
+                dtype=np.int64,
+            )
+        )
+        return self.rows(loc_id_selection, date_range), cols, cols_numeric_all, cols_clr
+
+
+def select_frame(
+    df: DataFrame,
+    selection_index: SelectionIndex,
+    loc_id_selection: Optional[Sequence[str]],
+    feature_selection: Sequence[str],
+    date_range: Optional[Sequence[str]] = None,
+) -> Tuple[DataFrame, List[str], List[str]]:
+    """
+    One-copy equivalent of subset_df_dateRange -> subset_df_locIds ->
+    subset_df_numericFeatures, except that unselected analytes are dropped
+    rather than reindexed back in as all-NaN columns (nothing downstream
+    reads them).
+
+    Parameters
+    ----------
+    df : pandas DataFrame
+        The frame `selection_index` was built from.
+    selection_index : SelectionIndex
+    loc_id_selection, feature_selection, date_range
+        See `SelectionIndex.select`.
+
+    Returns
+    -------
+    (df_selected, cols_numeric_all, cols_numeric_clr)
+    """
+    rows, cols, cols_numeric_all, cols_clr = selection_index.select(
+        loc_id_selection, feature_selection, date_range
+    )
+    return df.iloc[rows, cols], cols_numeric_all, cols_clr
@@ -0,0 +1,452 @@
+"""Pluggable (de)serialization of the DataFrames carried in session payloads.
+
+Every callback used to round-trip `df_master`, `df_plot_pca`, `df_plot_pmap`
+and `ldg_df` through `data_process.pandas_to_json` (orient="split", 15-digit
+floats), re-parsing and re-emitting megabytes of JSON text per interaction.
+This module adds a compact columnar codec alongside that JSON one:
+
+- `CODEC_COLUMNAR` (default): one typed little-endian buffer per column,
+  behind a small JSON header, base64'd into a string prefixed with
+  `COLUMNAR_PREFIX` so it can still live inside a JSON dcc.Store/Redis blob.
+  Numeric/bool/datetime columns are raw NumPy buffers (decoding is a memcpy,
+  not a parse); string/object/categorical columns are dictionary-encoded as
+  int32 codes plus a category list in the header.
+- `CODEC_JSON`: the original `pandas_to_json`/`json_to_pandas` format.
+
+Decoding sniffs the payload, so either format is always readable - sessions
+saved to Redis by an older app version (`session["version"] == 1`, every
+frame stored as JSON) keep loading, and `migrate_session` re-encodes them in
+place to the current `SESSION_VERSION`.
+
+Functions
+---------
+encode_frame
+decode_frame
+load_frame
+cache_frame
+load_log_composition
+encode_date_index
+load_date_index
+load_selection_index
+migrate_session
+"""
+
+import base64
+import io
+import json
+import os
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .cache_initialize import (
+    date_index_cache,
+    frame_cache,
+    log_composition_cache,
+    selection_index_cache,
+)
+from .compositional_data_functions import LogComposition, build_log_composition
+from .selection_engine import DateIndex, SelectionIndex
+from .data_process import json_to_pandas, pandas_to_json
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+CODEC_JSON = "json"
+CODEC_COLUMNAR = "columnar"
+CODEC_CHOICES = (CODEC_JSON, CODEC_COLUMNAR)
+
+# Codec used for newly written frames. Overridable per deployment (e.g. to
+# fall back to human-readable JSON while debugging a session blob).
+DEFAULT_CODEC = os.getenv("WQ_SESSION_CODEC", CODEC_COLUMNAR)
+
+# Version 1: every session frame is a pandas_to_json string.
+# Version 2: frames may be columnar (see COLUMNAR_PREFIX).
+SESSION_VERSION = 2
+
+COLUMNAR_PREFIX = "wqcol1:"
+
+# Numpy dtype kinds stored as raw buffers: bool, signed/unsigned int, float,
+# complex, timedelta64, datetime64. Everything else is dictionary-encoded.
+_BUFFER_KINDS = "biufcmM"
+_ALIGNMENT = 8
+
+# Working-data frames, mirroring SessionManager.package_plotting_data. ldg_df
+# was historically written with DataFrame.to_json()'s default "columns"
+# orient rather than pandas_to_json's "split".
+_WORKING_DATA_FRAMES = ("df_plot_pca", "df_plot_pmap", "ldg_df")
+
+
+def _encode_column(values: Any) -> Tuple[Dict[str, Any], np.ndarray]:
+    """Header entry + raw buffer for one column's (or the index's) values,
+    given as a pandas Series/Index."""
+    dtype = values.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in _BUFFER_KINDS:
+        buffer = np.ascontiguousarray(values.to_numpy(copy=False))
+        return {"kind": "buffer", "dtype": buffer.dtype.str}, buffer
+    if isinstance(dtype, pd.CategoricalDtype):
+        entry = {
+            "kind": "dictionary",
+            "dtype": "category",
+            "categories": dtype.categories.tolist(),
+            "ordered": bool(dtype.ordered),
+        }
+        return entry, np.asarray(values.array.codes).astype("<i4")
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    entry = {"kind": "dictionary", "dtype": str(dtype), "categories": uniques.tolist()}
+    return entry, codes.astype("<i4")
+
+
+def _decode_column(entry: Dict[str, Any], raw: bytearray) -> Any:
+    """Inverse of _encode_column, reading from the shared `raw` buffer."""
+    count = entry["length"]
+    if entry["kind"] == "buffer":
+        return np.frombuffer(
+            raw, dtype=np.dtype(entry["dtype"]), count=count, offset=entry["offset"]
+        )
+    codes = np.frombuffer(raw, dtype="<i4", count=count, offset=entry["offset"])
+    if entry["dtype"] == "category":
+        return pd.Categorical.from_codes(
+            codes, categories=entry["categories"], ordered=entry.get("ordered", False)
+        )
+    categories = np.empty(len(entry["categories"]) + 1, dtype=object)
+    categories[:-1] = entry["categories"]
+    categories[-1] = np.nan  # code -1 (missing) indexes the last slot
+    values = categories[codes]
+    if entry["dtype"] != "object":
+        values = pd.array(values, dtype=entry["dtype"])
+    return values
+
+
+def _encode_columnar(df: pd.DataFrame) -> str:
+    """Serialize `df` into a COLUMNAR_PREFIX-tagged base64 string."""
+    entries: List[Dict[str, Any]] = []
+    buffers: List[np.ndarray] = []
+    for position in range(df.shape[1]):
+        entry, buffer = _encode_column(df.iloc[:, position])
+        entry["name"] = df.columns[position]
+        entries.append(entry)
+        buffers.append(buffer)
+
+    if isinstance(df.index, pd.RangeIndex):
+        index_entry = {
+            "kind": "range",
+            "start": df.index.start,
+            "stop": df.index.stop,
+            "step": df.index.step,
+        }
+    else:
+        index_entry, buffer = _encode_column(df.index)
+        entries.append(index_entry)
+        buffers.append(buffer)
+
+    offset = 0
+    for entry, buffer in zip(entries, buffers):
+        entry["offset"] = offset
+        entry["length"] = len(buffer)
+        offset += -(-buffer.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+    header = json.dumps(
+        {"columns": entries[: df.shape[1]], "index": index_entry, "nrows": len(df)},
+        default=str,
+    ).encode("utf-8")
+    header_len = -(-(len(header) + 4) // _ALIGNMENT) * _ALIGNMENT - 4
+
+    out = bytearray(4 + header_len + offset)
+    out[:4] = header_len.to_bytes(4, "little")
+    out[4 : 4 + len(header)] = header
+    out[4 + len(header) : 4 + header_len] = b" " * (header_len - len(header))
+    body_start = 4 + header_len
+    for entry, buffer in zip(entries, buffers):
+        start = body_start + entry["offset"]
+        out[start : start + buffer.nbytes] = buffer.tobytes()
+    return COLUMNAR_PREFIX + base64.b64encode(out).decode("ascii")
+
+
+def _decode_columnar(payload: str) -> pd.DataFrame:
+    """Inverse of _encode_columnar."""
+    raw = bytearray(base64.b64decode(payload[len(COLUMNAR_PREFIX) :]))
+    header_len = int.from_bytes(raw[:4], "little")
+    header = json.loads(raw[4 : 4 + header_len].decode("utf-8"))
+    body = memoryview(raw)[4 + header_len :]
+
+    index_entry = header["index"]
+    if index_entry["kind"] == "range":
+        index = pd.RangeIndex(index_entry["start"], index_entry["stop"], index_entry["step"])
+    else:
+        index = pd.Index(_decode_column(index_entry, body))
+
+    columns = [entry["name"] for entry in header["columns"]]
+    data = {i: _decode_column(entry, body) for i, entry in enumerate(header["columns"])}
+    df = pd.DataFrame(data, index=index)
+    df.columns = columns
+    return df
+
+
+def encode_frame(
+    df: pd.DataFrame, col_datetime: Optional[str] = None, codec: Optional[str] = None
+) -> str:
+    """
+    Serialize `df` for a session/dcc.Store/Redis payload.
+
+    Parameters
+    ----------
+    df : pandas DataFrame
+        Dataframe to serialize. Not mutated.
+    col_datetime : str, optional
+        Name of the mapped date column. Only the JSON codec needs it (to
+        format dates as ISO strings first, see `pandas_to_json`) - the
+        columnar codec stores datetime64 columns natively.
+    codec : str, optional
+        `CODEC_COLUMNAR` or `CODEC_JSON`. Defaults to `DEFAULT_CODEC`.
+
+    Returns
+    -------
+    str
+    """
+    codec = codec or DEFAULT_CODEC
+    if codec == CODEC_JSON:
+        return pandas_to_json(df, col_datetime)
+    if codec != CODEC_COLUMNAR:
+        raise ValueError(f"Unknown session codec {codec!r} (expected one of {CODEC_CHOICES})")
+    return _encode_columnar(df)
+
+
+def decode_frame(payload: str, col_datetime: Optional[str] = None) -> pd.DataFrame:
+    """
+    Deserialize a payload written by `encode_frame` under either codec, or a
+    legacy (version 1) `pandas_to_json`/`DataFrame.to_json()` string.
+
+    Parameters
+    ----------
+    payload : str
+        Encoded frame.
+    col_datetime : str, optional
+        Name of a column to make sure is datetime64 - JSON payloads store it
+        as ISO strings.
+
+    Returns
+    -------
+    pandas DataFrame
+    """
+    if payload.startswith(COLUMNAR_PREFIX):
+        df = _decode_columnar(payload)
+        if col_datetime and col_datetime in df.columns:
+            if not pd.api.types.is_datetime64_any_dtype(df[col_datetime]):
+                df[col_datetime] = pd.to_datetime(df[col_datetime])
+        return df
+    if payload.startswith('{"columns":'):
+        return json_to_pandas({"payload": payload}, "payload", col_datetime)
+    # ldg_df used to be written with DataFrame.to_json()'s default orient.
+    return pd.read_json(io.StringIO(payload))
+
+
+def _frame_cache_key(
+    store_dict: Dict[str, Any], key: str, col_datetime: Optional[str]
+) -> Optional[Tuple[Any, ...]]:
+    """frame_cache key for `store_dict[key]`, or None if `store_dict` isn't a
+    workspace-bound session (working_data, or a session built directly from
+    DataPreprocessor). data_hash alone isn't enough: the same upload mapped
+    two different ways shares it, so the workspace (one per confirmed
+    mapping/loaded session) and the mutation counter bumped by
+    SessionManager.add_custom_group are part of the key."""
+    workspace_id = store_dict.get("workspace_id")
+    data_hash = store_dict.get("data_hash")
+    if not workspace_id or not isinstance(data_hash, dict) or not data_hash.get("data_hash"):
+        return None
+    return (workspace_id, data_hash["data_hash"], data_hash.get("mutation", 0), key, col_datetime)
+
+
+def load_frame(
+    store_dict: Dict[str, Any], key: str, col_datetime: Optional[str] = None
+) -> pd.DataFrame:
+    """`decode_frame(store_dict[key])` - drop-in for the
+    `json_to_pandas(session, key, col_datetime)` call pattern, accepting
+    either codec.
+
+    For workspace-bound sessions the decoded frame is memoized in the
+    per-process `cache_initialize.frame_cache`, so repeated callbacks on an
+    unchanged upload skip decoding entirely. Always returns a fresh copy the
+    caller is free to mutate."""
+    cache_key = _frame_cache_key(store_dict, key, col_datetime)
+    if cache_key is None:
+        return decode_frame(store_dict[key], col_datetime)
+    df = frame_cache.get(cache_key)
+    if df is None:
+        df = decode_frame(store_dict[key], col_datetime)
+        frame_cache.put(cache_key, df)
+        logger.debug("Frame cache miss for %s (%s)", key, frame_cache.stats())
+    return df.copy()
+
+
+def cache_frame(
+    store_dict: Dict[str, Any], key: str, df: pd.DataFrame, col_datetime: Optional[str] = None
+) -> None:
+    """Seed frame_cache with an already-decoded `df` for `store_dict[key]`
+    (e.g. right after re-encoding it), so the next load_frame is a hit."""
+    cache_key = _frame_cache_key(store_dict, key, col_datetime)
+    if cache_key is not None:
+        frame_cache.put(cache_key, df.copy())
+
+
+def load_log_composition(
+    session: Dict[str, Any], df_master: pd.DataFrame, cols_numeric_clr: List[str]
+) -> Optional[LogComposition]:
+    """
+    The logged compositional columns of `df_master`, computed at most once
+    per upload (workspace/data_hash/mutation) and process, for
+    `clr_transform_scale(..., log_composition=...)`. The logs are taken on
+    first use (see compositional_data_functions.LogComposition), so callers
+    whose results come from the result memo never compute them.
+
+    Returns
+    -------
+    LogComposition or None
+        None for sessions that aren't workspace-bound - nothing to key the
+        cache on, so callers just log their own selection.
+    """
+    frame_key = _frame_cache_key(session, "df_master", None)
+    if frame_key is None or not cols_numeric_clr:
+        return None
+    cache_key = frame_key[:3] + (tuple(cols_numeric_clr),)
+    logs = log_composition_cache.get(cache_key)
+    if logs is None:
+        logs = build_log_composition(df_master, cols_numeric_clr)
+        log_composition_cache.put(cache_key, logs)
+    return logs
+
+
+def encode_date_index(df: pd.DataFrame, col_date: Optional[str]) -> Optional[str]:
+    """
+    The sort permutation of `df[col_date]` (see selection_engine.DateIndex),
+    encoded for storing next to `df` in a session payload. None when there
+    is no naive datetime64 date column to index.
+    """
+    if not col_date:
+        return None
+    date_index = DateIndex.from_series(df[col_date])
+    if date_index is None:
+        return None
+    order = date_index.order
+    if len(df) < np.iinfo(np.int32).max:
+        order = order.astype(np.int32)
+    return encode_frame(pd.DataFrame({"order": order}))
+
+
+def load_date_index(
+    store_dict: Dict[str, Any],
+    df: pd.DataFrame,
+    col_date: Optional[str],
+    key: str = "date_index",
+    cache_key: Optional[Hashable] = None,
+) -> Optional[DateIndex]:
+    """
+    The `DateIndex` of `df[col_date]`, using the permutation stored under
+    `store_dict[key]` by `encode_date_index` when there is one (payloads
+    written before it existed are sorted here instead).
+
+    Payloads that don't store a permutation (working_data, whose frames are
+    only ever sorted here) can pass `cache_key`, any value naming `df`'s
+    content (e.g. its snapshot handle's digest): the index is then sorted
+    once per key and process, and kept in `cache_initialize.date_index_cache`.
+
+    Returns
+    -------
+    DateIndex or None
+        None when `col_date` is unset or not naive datetime64; callers then
+        compare every row as before.
+    """
+    if not col_date or not pd.api.types.is_datetime64_dtype(df[col_date]):
+        return None
+    payload = store_dict.get(key)
+    if payload:
+        order = load_frame(store_dict, key)["order"].to_numpy()
+        dates = df[col_date].to_numpy()
+        if len(order) == int((~np.isnat(dates)).sum()) and (
+            not len(order) or order.max() < len(dates)
+        ):
+            return DateIndex(dates, order)
+        logger.warning("Stored %s does not match its frame; rebuilding it", key)
+    if cache_key is None:
+        return DateIndex.from_series(df[col_date])
+    date_index = date_index_cache.get((cache_key, col_date))
+    if date_index is None:
+        date_index = DateIndex.from_series(df[col_date])
+        if date_index is not None:
+            date_index_cache.put((cache_key, col_date), date_index)
+    return date_index
+
+
+def load_selection_index(
+    session: Dict[str, Any],
+    df_master: pd.DataFrame,
+    col_loc_id: str,
+    col_date: Optional[str],
+    cols_numeric_simple: List[str],
+    cols_numeric_clr: List[str],
+) -> Optional[SelectionIndex]:
+    """
+    The `SelectionIndex` of `df_master`, built once per upload
+    (workspace/data_hash/mutation), column mapping and process.
+
+    Returns
+    -------
+    SelectionIndex or None
+        None for sessions that aren't workspace-bound; callers then build a
+        throwaway index per selection.
+    """
+    frame_key = _frame_cache_key(session, "df_master", col_date)
+    if frame_key is None:
+        return None
+    cache_key = frame_key[:3] + (
+        col_loc_id,
+        col_date,
+        tuple(cols_numeric_simple),
+        tuple(cols_numeric_clr),
+    )
+    index = selection_index_cache.get(cache_key)
+    if index is None:
+        index = SelectionIndex(
+            df_master,
+            col_loc_id,
+            col_date,
+            cols_numeric_simple,
+            cols_numeric_clr,
+            date_index=load_date_index(session, df_master, col_date),
+        )
+        selection_index_cache.put(cache_key, index)
+    return index
+
+
+def migrate_session(session: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Upgrade a loaded session dict to `SESSION_VERSION` in place, re-encoding
+    every JSON frame (df_master and the working_data frames) with the current
+    default codec. A no-op for sessions already at the current version.
+
+    Parameters
+    ----------
+    session : dict
+        The *loaded* (not JSON-string) session dict.
+
+    Returns
+    -------
+    dict
+        The same session dict, for convenience.
+    """
+    version = session.get("version", 1)
+    if version >= SESSION_VERSION:
+        return session
+
+    date_col = session.get("meta_data", {}).get("cols_key_meta", {}).get("date")
+    if session.get("df_master"):
+        session["df_master"] = encode_frame(decode_frame(session["df_master"], date_col), date_col)
+    working_data = session.get("working_data")
+    if working_data:
+        for key in _WORKING_DATA_FRAMES:
+            if working_data.get(key):
+                working_data[key] = encode_frame(decode_frame(working_data[key], date_col), date_col)
+    session["version"] = SESSION_VERSION
+    logger.info("Migrated session from version %s to %s", version, SESSION_VERSION)
+    return session
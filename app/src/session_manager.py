@@ -2,6 +2,8 @@
 # for now keeping as functions, but could be refactored into a class later if needed.
 import redis
 import os
+import time
+from typing import Optional
 
 # Configure Redis connection pool (use service name 'redis' from Docker Compose)
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
@@ -49,3 +51,136 @@ def session_exists(session_id: str) -> bool:
 def key_exists(session_id: str, key: str) -> bool:
     """Check if a specific key exists in a session."""
     return r.hexists(f"session:{session_id}", key)
+
+
+# Server-side workspace snapshots. The browser's session/meta-data/
+# working-data dcc.Stores only hold a small {"workspace", "digest"} handle;
+# the payload itself lives here, keyed by its content hash so rewriting an
+# unchanged payload is a no-op. Snapshots expire after WORKSPACE_TTL seconds
+# of not being read (default 1 day) - named saves (save_to_redis above) are
+# the long-lived copy. Every write makes a new snapshot, so each workspace
+# also keeps `workspace_index:{id}`, its digests scored by last write/read,
+# and only its WORKSPACE_MAX_SNAPSHOTS most recently used snapshots survive
+# a write - superseded ones are deleted rather than left to expire.
+WORKSPACE_TTL = int(os.getenv("WORKSPACE_TTL", 86400))
+WORKSPACE_MAX_SNAPSHOTS = int(os.getenv("WORKSPACE_MAX_SNAPSHOTS", 8))
+
+
+def _touch_workspace(workspace_id: str, digest: str) -> None:
+    """Mark a snapshot as just used in its workspace's index."""
+    index = f"workspace_index:{workspace_id}"
+    r.zadd(index, {digest: time.time()})
+    r.expire(index, WORKSPACE_TTL)
+
+
+def _trim_workspace(workspace_id: str) -> None:
+    """Delete a workspace's least recently used snapshots beyond
+    WORKSPACE_MAX_SNAPSHOTS."""
+    index = f"workspace_index:{workspace_id}"
+    excess = r.zcard(index) - WORKSPACE_MAX_SNAPSHOTS
+    if excess > 0:
+        stale = [digest for digest, _ in r.zpopmin(index, excess)]
+        r.delete(*(f"workspace:{workspace_id}:{digest}" for digest in stale))
+
+
+def save_workspace(workspace_id: str, digest: str, value: str) -> None:
+    """Save a content-addressed session snapshot for a workspace, dropping
+    its least recently used snapshots past WORKSPACE_MAX_SNAPSHOTS."""
+    key = f"workspace:{workspace_id}:{digest}"
+    if not r.set(key, value, ex=WORKSPACE_TTL, nx=True):
+        # Identical payload already stored - just refresh its TTL.
+        r.expire(key, WORKSPACE_TTL)
+    _touch_workspace(workspace_id, digest)
+    _trim_workspace(workspace_id)
+
+
+def load_workspace(workspace_id: str, digest: str) -> Optional[str]:
+    """Load a session snapshot, refreshing its TTL. None if it has expired
+    or been superseded."""
+    key = f"workspace:{workspace_id}:{digest}"
+    value = r.get(key)
+    if value is not None:
+        r.expire(key, WORKSPACE_TTL)
+        _touch_workspace(workspace_id, digest)
+    return value
+
+
+# Memoized computation results (see result_cache.py), shared across gunicorn
+# workers. Unlike sessions these are disposable - a missing key is a miss.
+# Besides each entry's TTL, the namespace as a whole is held to
+# RESULT_CACHE_BUDGET_BYTES: `result_index` scores every key by its expiry
+# time and `result_sizes` holds its size, and saving past the budget evicts
+# the entries closest to expiring (least recently saved or read) first.
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 86400))
+RESULT_CACHE_BUDGET_BYTES = int(os.getenv("RESULT_CACHE_BUDGET_BYTES", 512 * 1024 * 1024))
+_RESULT_INDEX = "result_index"
+_RESULT_SIZES = "result_sizes"
+
+
+def _drop_results(keys: list) -> None:
+    """Forget `keys` - their values, index entries and sizes."""
+    if keys:
+        r.delete(*(f"result:{key}" for key in keys))
+        r.zrem(_RESULT_INDEX, *keys)
+        r.hdel(_RESULT_SIZES, *keys)
+
+
+def _trim_results() -> None:
+    """Drop expired entries from the accounting, then evict until the
+    namespace fits in RESULT_CACHE_BUDGET_BYTES."""
+    _drop_results(r.zrangebyscore(_RESULT_INDEX, "-inf", time.time()))
+    total = sum(int(size) for size in r.hvals(_RESULT_SIZES))
+    while total > RESULT_CACHE_BUDGET_BYTES:
+        popped = r.zpopmin(_RESULT_INDEX)
+        if not popped:
+            break
+        key = popped[0][0]
+        total -= int(r.hget(_RESULT_SIZES, key) or 0)
+        _drop_results([key])
+
+
+def save_result(key: str, value: str, ttl: int = RESULT_CACHE_TTL) -> None:
+    """Save a cached result under `result:{key}` with a TTL, evicting older
+    results if the namespace is over its byte budget."""
+    r.set(f"result:{key}", value, ex=ttl)
+    r.zadd(_RESULT_INDEX, {key: time.time() + ttl})
+    r.hset(_RESULT_SIZES, key, len(value))
+    _trim_results()
+
+
+def load_result(key: str, ttl: int = RESULT_CACHE_TTL) -> Optional[str]:
+    """Load a cached result, refreshing its TTL, or None if absent/expired."""
+    value = r.get(f"result:{key}")
+    if value is not None:
+        r.expire(f"result:{key}", ttl)
+        r.zadd(_RESULT_INDEX, {key: time.time() + ttl})
+    return value
+
+
+# Background job state (see job_runner.py): one hash per job, plus a pointer
+# from each workspace to its most recent job so a new Apply can supersede it.
+JOB_TTL = int(os.getenv("JOB_TTL", 3600))
+
+
+def save_job_state(job_id: str, **fields: str) -> None:
+    """Set fields on a job's state hash and refresh its TTL."""
+    r.hset(f"job:{job_id}", mapping=fields)
+    r.expire(f"job:{job_id}", JOB_TTL)
+
+
+def load_job_state(job_id: str) -> dict:
+    """All fields of a job's state hash ({} if unknown/expired)."""
+    return r.hgetall(f"job:{job_id}")
+
+
+def swap_workspace_job(workspace_id: str, job_id: str) -> Optional[str]:
+    """Record `job_id` as the workspace's current job, returning the previous one."""
+    return r.set(f"workspace_job:{workspace_id}", job_id, ex=JOB_TTL, get=True)
+
+
+def ping() -> bool:
+    """True if Redis is reachable."""
+    try:
+        return bool(r.ping())
+    except redis.RedisError:
+        return False
@@ -3,11 +3,41 @@
 Kept separate from data_process.py, which is about reshaping dataframes, not
 about the Store-payload-as-JSON-string convention every callback in app.py
 round-trips through.
+
+The `session`, `meta-data` and `working-data` Stores go through
+`dump_session`/`load_session` instead: the payload is written server-side
+(see session_manager.save_workspace) and the browser only holds a
+`{"workspace": ..., "digest": ...}` handle, so multi-MB session blobs are no
+longer posted back and forth on every callback. If Redis is unreachable the
+payload is inlined into the Store exactly as before, and `load_session`
+accepts either form. A handle whose snapshot has expired (or been dropped
+as superseded, see session_manager.WORKSPACE_MAX_SNAPSHOTS) raises
+`SessionExpiredError`, which error_handling turns into a cleared,
+"session expired" UI state.
 """
 
+import hashlib
 import json
+import os
+import uuid
 from typing import Any, Optional
 
+import redis
+
+from .logging_config import get_logger
+from .session_manager import load_workspace, save_workspace
+
+logger = get_logger(__name__)
+
+# Set to "0" to always inline session payloads into the browser Stores.
+SERVER_SIDE_SESSIONS = os.getenv("SERVER_SIDE_SESSIONS", "1") != "0"
+
+_HANDLE_KEYS = {"workspace", "digest"}
+
+
+class SessionExpiredError(KeyError):
+    """A session handle's server-side snapshot no longer exists."""
+
 
 def load_store(raw: Optional[str]) -> Optional[dict]:
     """json.loads a dcc.Store string payload, returning None if raw is falsy.
@@ -22,3 +52,61 @@ def load_store(raw: Optional[str]) -> Optional[dict]:
 def dump_store(data: Any) -> str:
     """json.dumps wrapper for symmetry with load_store at call sites."""
     return json.dumps(data)
+
+
+def store_digest(raw: Optional[str]) -> Optional[str]:
+    """Short content digest of a raw dcc.Store payload (a snapshot handle or
+    an inlined one), for cache keys. None passes through."""
+    if raw is None:
+        return None
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def new_workspace_id() -> str:
+    """Opaque ID grouping one browser session's server-side snapshots."""
+    return uuid.uuid4().hex
+
+
+def is_session_handle(data: Any) -> bool:
+    """True if a loaded Store payload is a server-side snapshot handle."""
+    return isinstance(data, dict) and data.keys() == _HANDLE_KEYS
+
+
+def dump_session(data: Any, workspace_id: Optional[str]) -> Optional[str]:
+    """Store `data` server-side under `workspace_id` and return the handle
+    to put in the dcc.Store, or `dump_store(data)` itself if server-side
+    sessions are disabled, no workspace_id is given, or Redis is down.
+    None passes through (a cleared Store)."""
+    if data is None:
+        return None
+    payload = dump_store(data)
+    if not SERVER_SIDE_SESSIONS or not workspace_id:
+        return payload
+    digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+    try:
+        save_workspace(workspace_id, digest, payload)
+    except redis.RedisError:
+        logger.warning(
+            "Could not store session snapshot server-side; inlining %d bytes", len(payload)
+        )
+        return payload
+    return dump_store({"workspace": workspace_id, "digest": digest})
+
+
+def load_session(raw: Optional[str]) -> Optional[dict]:
+    """load_store counterpart to dump_session: resolves a snapshot handle
+    from Redis, or returns an inlined payload as-is.
+
+    Raises SessionExpiredError (a KeyError) if the handle's snapshot has
+    expired server-side.
+    """
+    data = load_store(raw)
+    if not is_session_handle(data):
+        return data
+    payload = load_workspace(data["workspace"], data["digest"])
+    if payload is None:
+        logger.warning("Session snapshot %s/%s not found", data["workspace"], data["digest"])
+        raise SessionExpiredError(
+            "Session snapshot has expired on the server - reload the data or a saved session."
+        )
+    return json.loads(payload)
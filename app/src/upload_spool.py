@@ -0,0 +1,201 @@
+"""Resumable chunked uploads spooled to local disk.
+
+`dcc.Upload` hands the whole file to a callback as a base64 data URL (~33%
+larger than the file), which `stage_raw_upload` then parked in
+`raw-upload-store` so `confirm_mapping` could post it back again. Instead,
+`assets/chunked_upload.js` PUTs the raw bytes to the routes below in
+`UPLOAD_CHUNK_BYTES` pieces, and the mapping modal only ever sees the
+returned upload ID.
+
+Protocol (all JSON responses):
+
+- `POST /upload` -> `{"upload_id", "chunk_bytes"}`: start an upload.
+- `PUT /upload/<id>?offset=N` with the raw chunk as the body ->
+  `{"received"}`. `N` must not be past the bytes already received; a
+  retried chunk (`N` below it) overwrites from `N`, so the client can
+  resume from `received` after a dropped request.
+- `GET /upload/<id>` -> `{"received", "complete"}`: where to resume.
+- `POST /upload/<id>/complete` -> `{"upload_id", "size"}`.
+
+Spool files live in `UPLOAD_SPOOL_DIR`, shared by every gunicorn worker on
+the host, and are removed once a mapping is confirmed (`discard_upload`) or
+after `UPLOAD_SPOOL_MAX_AGE_S`.
+
+Functions
+---------
+new_upload
+append_chunk
+received_bytes
+complete_upload
+spool_path
+discard_upload
+purge_stale_uploads
+register_upload_routes
+"""
+
+import os
+import re
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Tuple
+
+from flask import Flask, Response, jsonify, request
+
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+UPLOAD_SPOOL_DIR = Path(
+    os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "wq_uploads"))
+)
+# Largest file accepted, in bytes.
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 1024 * 1024 * 1024))
+# Chunk size the browser is told to use; must fit nginx's client_max_body_size.
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", 4 * 1024 * 1024))
+# Unconfirmed uploads older than this are deleted by purge_stale_uploads.
+UPLOAD_SPOOL_MAX_AGE_S = int(os.getenv("UPLOAD_SPOOL_MAX_AGE_S", 24 * 60 * 60))
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+_PART_SUFFIX = ".part"
+_DONE_SUFFIX = ".csv"
+
+
+class UploadError(ValueError):
+    """A chunk/upload request that can't be applied (bad ID, gap, too big).
+    `status` is the HTTP status the route answers with."""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _checked_id(upload_id: str) -> str:
+    # IDs become file names - never let anything but our own hex IDs through.
+    if not isinstance(upload_id, str) or not _UPLOAD_ID.match(upload_id):
+        raise UploadError(f"Invalid upload ID {upload_id!r}", status=404)
+    return upload_id
+
+
+def _part_path(upload_id: str) -> Path:
+    return UPLOAD_SPOOL_DIR / f"{_checked_id(upload_id)}{_PART_SUFFIX}"
+
+
+def spool_path(upload_id: str) -> Path:
+    """Path of the completed upload `upload_id`."""
+    return UPLOAD_SPOOL_DIR / f"{_checked_id(upload_id)}{_DONE_SUFFIX}"
+
+
+def new_upload() -> str:
+    """Create an empty spool file and return its upload ID."""
+    UPLOAD_SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    _part_path(upload_id).touch()
+    return upload_id
+
+
+def received_bytes(upload_id: str) -> Tuple[int, bool]:
+    """`(bytes received, complete?)` for `upload_id`.
+
+    Raises
+    ------
+    UploadError
+        404 if there is no such upload.
+    """
+    if spool_path(upload_id).exists():
+        return spool_path(upload_id).stat().st_size, True
+    part = _part_path(upload_id)
+    if not part.exists():
+        raise UploadError(f"Unknown upload {upload_id}", status=404)
+    return part.stat().st_size, False
+
+
+def append_chunk(upload_id: str, offset: int, data: bytes) -> int:
+    """
+    Write `data` at `offset` of an in-progress upload and return the bytes
+    received so far.
+
+    Writing below the current size truncates there first, so re-sending a
+    chunk whose response was lost is harmless.
+
+    Raises
+    ------
+    UploadError
+        Unknown/completed upload (404), an `offset` past the received bytes
+        (409 - the client should resume from `received_bytes`), or a file
+        that would exceed UPLOAD_MAX_BYTES (413).
+    """
+    received, complete = received_bytes(upload_id)
+    if complete:
+        raise UploadError(f"Upload {upload_id} is already complete", status=409)
+    if offset < 0 or offset > received:
+        raise UploadError(
+            f"Chunk offset {offset} does not follow the {received} bytes received", status=409
+        )
+    if offset + len(data) > UPLOAD_MAX_BYTES:
+        raise UploadError(f"Upload exceeds {UPLOAD_MAX_BYTES} bytes", status=413)
+    with open(_part_path(upload_id), "r+b") as handle:
+        handle.truncate(offset)
+        handle.seek(offset)
+        handle.write(data)
+    return offset + len(data)
+
+
+def complete_upload(upload_id: str) -> int:
+    """Mark `upload_id` complete and return its size; idempotent."""
+    size, complete = received_bytes(upload_id)
+    if not complete:
+        os.replace(_part_path(upload_id), spool_path(upload_id))
+        logger.info("Upload %s complete (%d bytes)", upload_id, size)
+    return size
+
+
+def discard_upload(upload_id: str) -> None:
+    """Delete `upload_id`'s spool file, complete or not."""
+    for path in (spool_path(upload_id), _part_path(upload_id)):
+        path.unlink(missing_ok=True)
+
+
+def purge_stale_uploads(max_age_s: int = UPLOAD_SPOOL_MAX_AGE_S) -> int:
+    """Delete spool files untouched for `max_age_s` seconds; returns how many."""
+    if not UPLOAD_SPOOL_DIR.exists():
+        return 0
+    cutoff = time.time() - max_age_s
+    removed = 0
+    for path in UPLOAD_SPOOL_DIR.iterdir():
+        if path.suffix in (_PART_SUFFIX, _DONE_SUFFIX) and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+            removed += 1
+    if removed:
+        logger.info("Purged %d stale upload(s) from %s", removed, UPLOAD_SPOOL_DIR)
+    return removed
+
+
+def register_upload_routes(server: Flask) -> None:
+    """Add the chunked-upload routes (see module docstring) to `server`."""
+
+    @server.errorhandler(UploadError)
+    def _upload_error(error: UploadError) -> Tuple[Response, int]:
+        return jsonify(error=str(error)), error.status
+
+    @server.post("/upload")
+    def start_upload() -> Response:
+        purge_stale_uploads()
+        return jsonify(upload_id=new_upload(), chunk_bytes=UPLOAD_CHUNK_BYTES)
+
+    @server.get("/upload/<upload_id>")
+    def upload_status(upload_id: str) -> Response:
+        received, complete = received_bytes(upload_id)
+        return jsonify(received=received, complete=complete)
+
+    @server.put("/upload/<upload_id>")
+    def upload_chunk(upload_id: str) -> Response:
+        offset = request.args.get("offset", type=int)
+        if offset is None:
+            raise UploadError("Missing integer 'offset' query parameter")
+        return jsonify(received=append_chunk(upload_id, offset, request.get_data()))
+
+    @server.post("/upload/<upload_id>/complete")
+    def finish_upload(upload_id: str) -> Response:
+        return jsonify(upload_id=upload_id, size=complete_upload(upload_id))
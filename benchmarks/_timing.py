@@ -0,0 +1,14 @@
+"""Timing helper shared by the benchmark scripts."""
+
+import time
+from typing import Callable
+
+
+def best_of(fn: Callable[[], object], repeat: int = 3) -> float:
+    """Fastest of `repeat` wall-clock runs of `fn()`, in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
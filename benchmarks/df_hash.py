@@ -0,0 +1,36 @@
+"""Benchmark the sort-free upload fingerprint against the version 1 hash.
+
+    PYTHONPATH=. python benchmarks/df_hash.py [n_rows] [n_cols]
+
+Defaults to 500k rows x 40 float analytes plus a location, date and group
+column, roughly a large multi-site export.
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from app.src.cache_initialize import generate_df_hash_version, generate_df_hash_version_legacy
+from benchmarks._timing import best_of
+
+
+def main() -> None:
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    n_cols = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.lognormal(size=(n_rows, n_cols)), columns=[f"a{i}" for i in range(n_cols)])
+    df.insert(0, "site", rng.choice([f"S{i:03d}" for i in range(300)], size=n_rows))
+    df.insert(1, "date", pd.Timestamp("2000-01-01") + pd.to_timedelta(rng.integers(0, 9000, n_rows), "D"))
+    df.insert(2, "group", rng.choice(["A", "B", "C"], size=n_rows))
+
+    shuffled = df.sample(frac=1, random_state=1)[df.columns[::-1]]
+    assert generate_df_hash_version(df) == generate_df_hash_version(shuffled)
+
+    print(f"{n_rows} x {df.shape[1]}")
+    print(f"  v1 sort + md5          {best_of(lambda: generate_df_hash_version_legacy(df)):.3f}s")
+    print(f"  v2 commutative rows    {best_of(lambda: generate_df_hash_version(df)):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
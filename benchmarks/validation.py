@@ -0,0 +1,54 @@
+"""Benchmark build_mapped_dataset on a large upload.
+
+    PYTHONPATH=. python benchmarks/validation.py [n_rows]
+
+Defaults to 1M rows: 20 analytes (half CLR), a location, date, group and
+group-color column, typed the way read_mapped_csv parses them.
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from app.src.data_mapping import build_mapped_dataset
+from app.src.data_model import ColumnMapping
+from benchmarks._timing import best_of
+
+
+def main() -> None:
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(0)
+    days = pd.date_range("2000-01-01", periods=9000, freq="D").strftime("%Y-%m-%d")
+    df = pd.DataFrame(
+        {
+            "site": pd.Categorical(rng.choice([f"S{i:04d}" for i in range(2000)], size=n_rows)),
+            "date": rng.choice(np.asarray(days, dtype=object), size=n_rows),
+            "group": pd.Categorical(rng.choice(["North", "South", "East"], size=n_rows)),
+            "color": pd.Categorical(rng.choice(["#ff0000", "#00ff00", "#0000ff"], size=n_rows)),
+            "lat": rng.uniform(40, 50, n_rows),
+            "lon": rng.uniform(-10, 10, n_rows),
+        }
+    )
+    for i in range(10):
+        df[f"clr{i}"] = rng.lognormal(size=n_rows)
+        df[f"simple{i}"] = rng.normal(size=n_rows)
+    mapping = ColumnMapping(
+        location_id="site",
+        latitude="lat",
+        longitude="lon",
+        plotting_groups=["group"],
+        numeric_simple=[f"simple{i}" for i in range(10)],
+        numeric_clr=[f"clr{i}" for i in range(10)],
+        date="date",
+        group_colors={"group": "color"},
+    )
+
+    result = build_mapped_dataset(df, mapping)
+    assert not result.validation.has_errors, result.validation.errors
+    print(f"{n_rows} x {df.shape[1]}")
+    print(f"  build_mapped_dataset   {best_of(lambda: build_mapped_dataset(df, mapping)):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
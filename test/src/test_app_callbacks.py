@@ -200,5 +200,176 @@ class TestMapColorPatchPreservesRelayout(unittest.TestCase):
         self.assertEqual(trace_a.marker.color, "#123456")
 
 
+class TestPlotDataPatches(unittest.TestCase):
+    """plot_data sends a dash.Patch, not a rebuilt figure, when only the
+    color overrides or the PCA components changed."""
+
+    def setUp(self):
+        self.app_module = _import_app_entrypoint()
+        import pandas as pd
+
+        df_pca = pd.DataFrame(
+            {
+                "Site_Name": ["1A", "2B", "3C"],
+                "Group1": ["A", "B", "A"],
+                "PC1": [0.1, 0.2, 0.3],
+                "PC2": [0.4, 0.5, 0.6],
+                "date": ["2023-01-01", "2023-01-02", "2023-01-03"],
+            }
+        )
+        self.working_data = self.app_module.dump_store(
+            {
+                "df_plot_pca": df_pca.to_json(orient="split"),
+                "df_plot_pmap": None,
+                "ldg_df": pd.DataFrame(
+                    {"PC1": [0.1, 0.2], "PC2": [0.3, 0.4], "metals": ["Cu", "Zn"]}
+                ).to_json(),
+                "expl_var": [0.6, 0.4],
+            }
+        )
+        self.meta_data = self.app_module.dump_store(
+            {
+                "cols_key_plot": {},
+                "cols_key_meta": {"loc_id": "Site_Name", "date": "date"},
+                "dict_marker_map": {"1A": 1, "2B": 2, "3C": 3},
+                "dict_generic_colors": {"Group1": {"A": "red", "B": "blue"}},
+                "loc_id_all": ["1A", "2B", "3C"],
+            }
+        )
+
+    def _plot_data(self, trigger, overrides=None, pca_x="PC1", pca_y="PC2", layouts=None):
+        with _fake_callback_context(trigger):
+            return self.app_module.plot_data(
+                self.working_data,
+                None,
+                "Group1",
+                "Group1",
+                [2023, 2023],
+                self.app_module.dump_store(overrides) if overrides else None,
+                pca_x,
+                pca_y,
+                self.meta_data,
+                10,
+                layouts,
+            )
+
+    def _shown_layouts(self):
+        """scatter-layouts as left by a full render of the fixture."""
+        _, _, layouts = self._plot_data("date-range-slider.value")
+        return layouts
+
+    def test_color_override_sends_color_patch(self):
+        import dash
+
+        fig_pca, fig_pmap, layouts = self._plot_data(
+            "custom-color-overrides.data",
+            overrides={"Group1": {"A": "#123456"}},
+            layouts=self._shown_layouts(),
+        )
+        self.assertIsInstance(fig_pca, dash.Patch)
+        self.assertIs(fig_pmap, dash.no_update)
+        self.assertIs(layouts, dash.no_update)
+        colors = [op["params"]["value"] for op in fig_pca.to_plotly_json()["operations"]]
+        self.assertIn("#123456", colors)
+
+    def test_component_change_sends_axes_patch(self):
+        import dash
+
+        fig_pca, fig_pmap, _ = self._plot_data(
+            "pca-x-component.value", pca_x="PC2", pca_y="PC1", layouts=self._shown_layouts()
+        )
+        self.assertIsInstance(fig_pca, dash.Patch)
+        self.assertIs(fig_pmap, dash.no_update)
+
+    def test_changed_trace_layout_rebuilds_instead_of_patching(self):
+        # E.g. the figure shown was drawn per location and this frame is now
+        # batched: the patch's trace indices would land on the wrong traces.
+        shown = self._shown_layouts()
+        for layouts in ({"pca": "0" * 32, "pmap": None}, None):
+            for trigger in ("custom-color-overrides.data", "pca-x-component.value"):
+                fig_pca, _, new_layouts = self._plot_data(
+                    trigger,
+                    overrides={"Group1": {"A": "#123456"}},
+                    pca_x="PC2",
+                    pca_y="PC1",
+                    layouts=layouts,
+                )
+                self.assertTrue(fig_pca["data"])
+                self.assertEqual(new_layouts["pca"], shown["pca"])
+
+    def test_other_triggers_rebuild(self):
+        fig_pca, _, layouts = self._plot_data("date-range-slider.value")
+        self.assertTrue(fig_pca["data"])
+        self.assertEqual(layouts["pca"], fig_pca["layout"]["meta"]["scatter_layout"])
+        self.assertIsNone(layouts["pmap"])  # the PaCMAP placeholder
+
+    def test_revisited_view_is_served_from_figure_cache(self):
+        # app.py's own copy (imported as src.*, see _import_app_entrypoint).
+        figure_cache = sys.modules[self.app_module.get_figure.__module__].figure_cache
+        figure_cache.clear()
+        first = self._plot_data("plot-group-dropdown-1.value")
+        hits = figure_cache.stats()["hits"]
+        self.assertEqual(self._plot_data("plot-group-dropdown-1.value")[:2], first[:2])
+        self.assertEqual(figure_cache.stats()["hits"], hits + 2)
+
+
+
+class TestPollDimredJobFinished(unittest.TestCase):
+    """A cancelled/failed PaCMAP job must replace the "computing" placeholder,
+    not leave working-data waiting on an embedding that never arrives; a
+    done one must not roll the session back to its submit-time snapshot."""
+
+    def setUp(self):
+        self.app_module = _import_app_entrypoint()
+        self.working_data = self.app_module.dump_store(
+            {"df_plot_pca": None, "df_plot_pmap": None, "ldg_df": None, "expl_var": []}
+        )
+        self.session = self.app_module.dump_store(
+            {"working_data": None, "plotting_data": {"plot_group_dropdown_1_options": ["G"]}}
+        )
+
+    def _poll(self, job):
+        from unittest import mock
+
+        with mock.patch.object(self.app_module, "get_job", return_value=job):
+            return self.app_module.poll_dimred_job(1, "job-1", self.working_data, self.session)
+
+    def test_cancelled_job_publishes_status(self):
+        outputs = self._poll(
+            {"status": self.app_module.JOB_CANCELLED, "progress": 40, "message": "Cancelled"}
+        )
+        working_data = self.app_module.load_store(outputs[0])
+        self.assertIn("cancelled", working_data["pmap_status"])
+        self.assertIsNone(working_data["df_plot_pmap"])
+        self.assertTrue(outputs[3])
+
+    def test_failed_job_publishes_status_and_alert(self):
+        outputs = self._poll(
+            {"status": "failed", "progress": 20, "message": "Failed", "error": "boom"}
+        )
+        self.assertIn("failed", self.app_module.load_store(outputs[0])["pmap_status"])
+        self.assertIn("boom", str(outputs[-1].children))
+
+    def test_done_job_merges_into_current_session(self):
+        job_session = self.app_module.dump_store(
+            {
+                "working_data": {"df_plot_pmap": "pmap"},
+                "plotting_data": {"pmap_neighbors": 15, "plot_group_dropdown_1_options": []},
+            }
+        )
+        outputs = self._poll(
+            {
+                "status": self.app_module.JOB_DONE,
+                "progress": 100,
+                "working_data": "working-data-handle",
+                "session": job_session,
+            }
+        )
+        session = self.app_module.load_store(outputs[1])
+        self.assertEqual(outputs[0], "working-data-handle")
+        self.assertEqual(session["working_data"], {"df_plot_pmap": "pmap"})
+        self.assertEqual(session["plotting_data"]["pmap_neighbors"], 15)
+        self.assertEqual(session["plotting_data"]["plot_group_dropdown_1_options"], ["G"])
+
 if __name__ == "__main__":
     unittest.main()
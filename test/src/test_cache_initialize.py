@@ -1,8 +1,13 @@
 import unittest
 import pandas as pd
 from app.src.cache_initialize import (
+    LRUCache,
+    dataframe_nbytes,
     make_custom_cache_key_dimensionReduction,
+    data_hash_matches,
+    data_hash_version,
     generate_df_hash_version,
+    generate_df_hash_version_legacy,
 )
 
 
@@ -30,6 +35,16 @@ class TestCacheInitialize(unittest.TestCase):
         result = make_custom_cache_key_dimensionReduction(**kwargs)
         self.assertEqual(result, expected_key)
 
+    def test_make_custom_cache_key_dimensionReduction_appends_date_range(self):
+        result = make_custom_cache_key_dimensionReduction(
+            feature_selection=["Cu"],
+            loc_id_selection=["A"],
+            n_neighbors=15,
+            data_hash="abc123",
+            date_range=["2020-01-01", "2020-12-31"],
+        )
+        self.assertEqual(result, "['Cu']_['A']_15_abc123_['2020-01-01', '2020-12-31']")
+
     def test_generate_df_hash_version(self):
         # Create a sample DataFrame
         data = {
@@ -56,6 +71,69 @@ class TestCacheInitialize(unittest.TestCase):
         hash4 = generate_df_hash_version(df_reordered)
         self.assertEqual(hash1, hash4)
 
+    def test_hash_ignores_column_order_but_not_contents(self):
+        df = pd.DataFrame({"A": [1.0, 2.0, 3.0], "B": ["x", "y", None]})
+        base = generate_df_hash_version(df)
+        self.assertEqual(generate_df_hash_version(df[["B", "A"]]), base)
+        # Same values, differently paired across rows.
+        swapped = df.assign(A=[2.0, 1.0, 3.0])
+        self.assertNotEqual(generate_df_hash_version(swapped), base)
+        # Row multiplicity counts.
+        doubled = pd.concat([df, df.iloc[[0]]])
+        self.assertNotEqual(generate_df_hash_version(doubled), base)
+        self.assertNotEqual(generate_df_hash_version(df.rename(columns={"A": "C"})), base)
+
+    def test_stored_hashes_of_either_version_are_recognized(self):
+        df = pd.DataFrame({"A": [3, 1, 2], "B": [6, 4, 5]})
+        legacy = generate_df_hash_version_legacy(df)
+        current = generate_df_hash_version(df)
+        self.assertEqual((data_hash_version(legacy), data_hash_version(current)), (1, 2))
+        self.assertTrue(data_hash_matches(df.iloc[::-1], legacy))
+        self.assertTrue(data_hash_matches(df.iloc[::-1], current))
+        self.assertFalse(data_hash_matches(df.iloc[:2], legacy))
+        self.assertFalse(data_hash_matches(df.iloc[:2], current))
+
+
+class TestLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = LRUCache(max_bytes=10, sizeof=len)
+
+    def test_get_put_counts_hits_and_misses(self):
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.put("a", "xyz")
+        self.assertEqual(self.cache.get("a"), "xyz")
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["bytes"]), (1, 1, 3))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_evicts_least_recently_used_past_byte_budget(self):
+        self.cache.put("a", "aaaa")
+        self.cache.put("b", "bbbb")
+        self.cache.get("a")  # "b" is now least recently used
+        self.cache.put("c", "cccc")
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), "aaaa")
+        self.assertEqual(self.cache.get("c"), "cccc")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertEqual(self.cache.stats()["bytes"], 8)
+
+    def test_replacing_a_key_updates_size(self):
+        self.cache.put("a", "aaaa")
+        self.cache.put("a", "aa")
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.stats()["bytes"], 2)
+
+    def test_oversized_value_is_not_stored(self):
+        self.cache.put("a", "aa")
+        self.cache.put("a", "x" * 11)
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.stats()["bytes"], 0)
+
+    def test_dataframe_nbytes_counts_string_payloads(self):
+        short = pd.DataFrame({"s": ["a"] * 10})
+        long = pd.DataFrame({"s": ["a" * 100] * 10})
+        self.assertGreater(dataframe_nbytes(long), dataframe_nbytes(short))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -2,8 +2,12 @@ import unittest
 import numpy as np
 import pandas as pd
 from pandas.testing import assert_frame_equal
+from sklearn.preprocessing import StandardScaler
+
 from app.src.compositional_data_functions import (
     array_anynull,
+    build_log_composition,
+    clr_standardize,
     clr_transform,
     clr_transform_scale,
 )
@@ -67,5 +71,103 @@ class TestCompositionalDataFunctions(unittest.TestCase):
             clr_transform_scale(df_with_zeros, cols_numeric_all, cols_numeric_clr)
 
 
+class TestClrStandardize(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.X = np.hstack([rng.normal(size=(200, 2)), rng.lognormal(size=(200, 4))])
+
+    def _reference(self, X, n_clr):
+        ref = X.copy()
+        ref[:, -n_clr:] = clr_transform(X[:, -n_clr:])
+        return StandardScaler().fit_transform(ref)
+
+    def test_matches_clr_transform_then_standard_scaler(self):
+        np.testing.assert_allclose(clr_standardize(self.X, 4), self._reference(self.X, 4))
+        np.testing.assert_allclose(
+            clr_standardize(self.X, 0), StandardScaler().fit_transform(self.X)
+        )
+
+    def test_in_place_and_caller_buffers(self):
+        expected = self._reference(self.X, 4)
+        out = np.empty_like(self.X)
+        self.assertIs(clr_standardize(self.X, 4, out=out), out)
+        np.testing.assert_allclose(out, expected)
+
+        X = self.X.copy()
+        self.assertIs(clr_standardize(X, 4, out=X), X)
+        np.testing.assert_allclose(X, expected)
+
+        with self.assertRaises(ValueError):
+            clr_standardize(self.X, 4, out=np.empty((3, 3)))
+
+    def test_float32(self):
+        result = clr_standardize(self.X, 4, dtype=np.float32)
+        self.assertEqual(result.dtype, np.float32)
+        np.testing.assert_allclose(result, self._reference(self.X, 4), atol=1e-4)
+
+    def test_constant_column_is_left_unscaled(self):
+        X = self.X.copy()
+        X[:, 0] = 3.0
+        np.testing.assert_allclose(clr_standardize(X, 4)[:, 0], 0.0)
+
+    def test_zero_or_missing_compositional_values_raise(self):
+        for bad in (0.0, np.nan, -1.0):
+            X = self.X.copy()
+            X[5, 3] = bad
+            with self.assertRaises(ValueError):
+                clr_standardize(X, 4)
+
+
+class TestLogComposition(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.df = pd.DataFrame(
+            {
+                "pH": rng.normal(7, 1, size=50),
+                "Cu": rng.lognormal(size=50),
+                "Zn": rng.lognormal(size=50),
+                "Fe": rng.lognormal(size=50),
+            }
+        )
+        self.logs = build_log_composition(self.df, ["Cu", "Zn", "Fe"])
+
+    def test_selection_slices_match_direct_transform(self):
+        subset = self.df.iloc[5:40:2]
+        for cols_all, cols_clr in (
+            (["pH", "Cu", "Zn", "Fe"], ["Cu", "Zn", "Fe"]),
+            (["Zn", "pH", "Cu"], ["Zn", "Cu"]),
+        ):
+            expected = clr_transform_scale(subset.copy(), cols_all, cols_clr)
+            result = clr_transform_scale(subset.copy(), cols_all, cols_clr, self.logs)
+            assert_frame_equal(result, expected)
+
+    def test_unknown_rows_fall_back_to_direct_transform(self):
+        extra = pd.DataFrame({"pH": [7.0], "Cu": [1.0], "Zn": [2.0], "Fe": [3.0]}, index=[99])
+        df = pd.concat([self.df.iloc[:10], extra])
+        cols_all, cols_clr = ["pH", "Cu", "Zn", "Fe"], ["Cu", "Zn", "Fe"]
+        assert_frame_equal(
+            clr_transform_scale(df.copy(), cols_all, cols_clr, self.logs),
+            clr_transform_scale(df.copy(), cols_all, cols_clr),
+        )
+        # The fallback never needed the logs, so they were never taken.
+        self.assertFalse(self.logs._logged)
+
+    def test_holds_only_the_compositional_columns(self):
+        # The source frame isn't kept alive, and nbytes counts what is held.
+        self.assertEqual(self.logs.nbytes, 50 * 3 * 8)
+        self.assertFalse(np.shares_memory(self.logs._values, self.df.to_numpy()))
+        self.df.loc[0, "Cu"] = 1000.0
+        self.assertNotEqual(self.logs.values[0, 0], np.log(1000.0))
+
+    def test_zeros_only_raise_when_selected(self):
+        df = self.df.copy()
+        df.loc[3, "Fe"] = 0.0
+        logs = build_log_composition(df, ["Cu", "Zn", "Fe"])
+        clr_transform_scale(df.drop(index=3), ["Cu", "Zn", "Fe"], ["Cu", "Zn", "Fe"], logs)
+        clr_transform_scale(df.copy(), ["Cu", "Zn"], ["Cu", "Zn"], logs)
+        with self.assertRaises(ValueError):
+            clr_transform_scale(df.copy(), ["Cu", "Zn", "Fe"], ["Cu", "Zn", "Fe"], logs)
+
+
 if __name__ == "__main__":
     unittest.main()
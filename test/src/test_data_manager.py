@@ -2,10 +2,17 @@ import unittest
 import base64
 import io
 import json
+import os
+import tempfile
+from unittest import mock
+import numpy as np
 import pandas as pd
+from pandas.testing import assert_frame_equal
+from app.src import data_manager
+from app.src.cache_initialize import date_index_cache
 from app.src.data_manager import DataPreprocessor, DataPlotter, SessionManager
 from app.src.data_model import ColumnMapping
-from app.src.data_process import json_to_pandas
+from app.src.session_codec import SESSION_VERSION, encode_frame, load_frame
 
 
 def encode_csv(csv_content: str) -> str:
@@ -57,6 +64,40 @@ class TestDataPreprocessor(unittest.TestCase):
         # keys after a JSON round-trip (see the comment in data_manager.py).
         self.assertEqual(sorted(preprocessor.loc_id_all), ["1", "2", "3"])
 
+    def test_reads_spooled_csv_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "upload.csv")
+            with open(path, "wb") as handle:
+                handle.write(base64.b64decode(self.content_string))
+            from_path = DataPreprocessor(None, self.mapping, csv_path=path)
+        from_base64 = DataPreprocessor(self.content_string, self.mapping)
+        pd.testing.assert_frame_equal(from_path.df_master, from_base64.df_master)
+        self.assertEqual(from_path.content_hash, from_base64.content_hash)
+
+    def test_numeric_plotting_group_with_blanks(self):
+        # A numeric group column with a blank cell used to come back as a mix
+        # of '0'/'1' strings and NaN, which make_color_dict could not sort.
+        csv_content = (
+            "Site_Name,Latitude,Longitude,Group,Zinc,Copper\n"
+            "1,50.0,10.5,0,0.1,1\n"
+            "2,60.0,-20.0,1,0.2,2\n"
+            "3,70.1,30.0,,0.3,3\n"
+        )
+        mapping = ColumnMapping(
+            location_id="Site_Name",
+            latitude="Latitude",
+            longitude="Longitude",
+            plotting_groups=["Group"],
+            numeric_simple=["Copper"],
+            numeric_clr=["Zinc"],
+        )
+        preprocessor = DataPreprocessor(encode_csv(csv_content), mapping)
+        self.assertFalse(preprocessor.validation.has_errors)
+        colors = preprocessor.dict_generic_colors["Group"]
+        self.assertEqual(len(colors), 3)
+        self.assertEqual(list(colors)[:2], [0.0, 1.0])
+        self.assertIsNotNone(preprocessor.get_session_dict())
+
     def test_get_session_dict(self):
         preprocessor = DataPreprocessor(self.content_string, self.mapping)
         session_dict = preprocessor.get_session_dict()
@@ -72,11 +113,12 @@ class TestDataPreprocessor(unittest.TestCase):
         self.assertTrue(expected_keys.issubset(session_dict.keys()))
 
         self.assertIsInstance(session_dict["df_master"], str)  # JSON string
+        self.assertIsInstance(session_dict["date_index"], str)
         self.assertIsInstance(session_dict["meta_data"], dict)
         self.assertIsInstance(session_dict["data_hash"], dict)
         self.assertIsNone(session_dict["working_data"])
         self.assertIsInstance(session_dict["plotting_data"], dict)
-        self.assertEqual(session_dict["version"], 1)
+        self.assertEqual(session_dict["version"], SESSION_VERSION)
 
         plotting_data = session_dict["plotting_data"]
         self.assertEqual(
@@ -159,7 +201,7 @@ class TestSessionManagerAddCustomGroup(unittest.TestCase):
         )
         preprocessor = DataPreprocessor(encode_csv(csv_content), mapping)
         self.session = preprocessor.get_session_dict()
-        self.entity_ids = json_to_pandas(self.session, "df_master", "Sample_Date")[
+        self.entity_ids = load_frame(self.session, "df_master", "Sample_Date")[
             "ENTITY_ID"
         ].tolist()
 
@@ -167,7 +209,7 @@ class TestSessionManagerAddCustomGroup(unittest.TestCase):
         assignments = {"MyCat": [self.entity_ids[0]]}
         session = SessionManager.add_custom_group(self.session, "CustomGroup", assignments)
 
-        df_master = json_to_pandas(session, "df_master", "Sample_Date")
+        df_master = load_frame(session, "df_master", "Sample_Date")
         self.assertIn("CustomGroup", df_master.columns)
 
         meta_data = session["meta_data"]
@@ -203,6 +245,32 @@ class TestSessionManagerAddCustomGroup(unittest.TestCase):
         self.assertIn("MyCat", color_dict)
         self.assertIn("Unassigned", color_dict)
 
+    def test_add_custom_group_bumps_mutation_and_invalidates_frame_cache(self):
+        self.session["workspace_id"] = "ws-custom-group"
+        before = load_frame(self.session, "df_master", "Sample_Date")
+        self.assertEqual(self.session["data_hash"]["mutation"], 0)
+
+        session = SessionManager.add_custom_group(
+            self.session, "CustomGroup", {"MyCat": [self.entity_ids[0]]}
+        )
+        self.assertEqual(session["data_hash"]["mutation"], 1)
+        self.assertNotIn("CustomGroup", before.columns)
+        self.assertIn("CustomGroup", load_frame(session, "df_master", "Sample_Date").columns)
+
+
+    def test_add_custom_group_chains_content_digest(self):
+        assignments = {"MyCat": [self.entity_ids[0]]}
+        twin = json.loads(json.dumps(self.session))
+        first = SessionManager.add_custom_group(self.session, "CustomGroup", assignments)
+        second = SessionManager.add_custom_group(twin, "CustomGroup", assignments)
+        content = first["data_hash"]["content"]
+        self.assertEqual(content, second["data_hash"]["content"])
+        self.assertNotEqual(content, first["data_hash"]["data_hash"])
+
+        other = SessionManager.add_custom_group(
+            json.loads(json.dumps(self.session)), "Other", {"MyCat": [self.entity_ids[1]]}
+        )
+        self.assertNotEqual(other["data_hash"]["content"], content)
 
 class TestDataPlotter(unittest.TestCase):
     def setUp(self):
@@ -289,6 +357,36 @@ class TestDataPlotter(unittest.TestCase):
         fig_none = plotter_none.plot_pmap(n_neighbors=5)
         self.assertIsNotNone(fig_none)
 
+    def test_plot_pmap_placeholder_while_pacmap_pending(self):
+        working_data = json.loads(self.working_data)
+        working_data["df_plot_pmap"] = None
+        plotter = DataPlotter(
+            working_data,
+            self.meta_data,
+            self.selected_loc_ids,
+            self.plot_groups,
+            self.date_range,
+        )
+        self.assertIsNone(plotter.df_plot_pmap)
+        fig = plotter.plot_pmap(n_neighbors=5)
+        self.assertEqual(len(fig.data), 0)
+        self.assertIn("PaCMAP", fig.layout.annotations[0].text)
+        self.assertIsNotNone(plotter.plot_pca())
+
+    def test_plot_pmap_placeholder_shows_job_status(self):
+        working_data = json.loads(self.working_data)
+        working_data["df_plot_pmap"] = None
+        working_data["pmap_status"] = "PaCMAP cancelled - click Apply to rerun."
+        plotter = DataPlotter(
+            working_data,
+            self.meta_data,
+            self.selected_loc_ids,
+            self.plot_groups,
+            self.date_range,
+        )
+        fig = plotter.plot_pmap(n_neighbors=5)
+        self.assertEqual(fig.layout.annotations[0].text, working_data["pmap_status"])
+
     def test_plot_pca(self):
         plotter = DataPlotter(
             self.working_data,
@@ -335,6 +433,36 @@ class TestDataPlotter(unittest.TestCase):
         self.assertIn("PC2", fig.layout.xaxis.title.text)
         self.assertIn("PC1", fig.layout.yaxis.title.text)
 
+    def test_patches_address_the_plotted_traces(self):
+        plotter = DataPlotter(
+            self.working_data,
+            self.meta_data,
+            self.selected_loc_ids_none,
+            self.plot_groups,
+            self.date_range,
+        )
+        # Scatter traces only; the PCA loading-vector traces come after them.
+        n_traces = sum(t.customdata is not None for t in plotter.plot_pca().data)
+        patch_pca, patch_pmap = plotter.patch_colors()
+        for patch in (patch_pca, patch_pmap):
+            traces = {op["location"][1] for op in patch.to_plotly_json()["operations"]}
+            self.assertEqual(traces, set(range(n_traces)))
+        operations = plotter.patch_pca(x_col="PC2", y_col="PC1").to_plotly_json()["operations"]
+        locations = [op["location"] for op in operations]
+        self.assertIn(["layout", "xaxis", "title", "text"], locations)
+        self.assertIn(["data", n_traces - 1, "x"], locations)
+
+        working_data = json.loads(self.working_data)
+        working_data["df_plot_pmap"] = None
+        plotter = DataPlotter(
+            working_data,
+            self.meta_data,
+            self.selected_loc_ids_none,
+            self.plot_groups,
+            self.date_range,
+        )
+        self.assertIsNone(plotter.patch_colors()[1])
+
     def test_plot_pca_with_entity_id_and_repeat_visits_collapses_legend(self):
         # Same Site_Name ("1A") twice with different dates - should collapse
         # into one legend entry, not explode into two.
@@ -388,7 +516,7 @@ class TestDataPlotter(unittest.TestCase):
         )
         fig = plotter.plot_pca()
         # One trace per location (1A, 2B) - legend does not explode per date.
-        self.assertEqual(len(fig.data), 2)
+        self.assertEqual(len([t for t in fig.data if t.showlegend]), 2)
         trace_1a = next(t for t in fig.data if t.name == "1A")
         self.assertEqual(len(trace_1a.x), 2)
         self.assertEqual(
@@ -517,5 +645,93 @@ class TestDataPlotter(unittest.TestCase):
         self.assertEqual(len(plotter.df_plot_pca), 3)
 
 
+class TestDataPlotterDateIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 200
+        dates = pd.Series(
+            pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3000, n), "D")
+        )
+        dates.iloc[::11] = pd.NaT
+        df_pca = pd.DataFrame(
+            {
+                "Site_Name": rng.choice(["1A", "2B", "3C"], size=n),
+                "Group1": "A",
+                "PC1": rng.normal(size=n),
+                "PC2": rng.normal(size=n),
+                "date": dates,
+            }
+        )
+        self.working_data = {
+            "df_plot_pca": encode_frame(df_pca, "date"),
+            "df_plot_pmap": encode_frame(
+                df_pca.rename(columns={"PC1": "PMAP1", "PC2": "PMAP2"}), "date"
+            ),
+            "ldg_df": encode_frame(pd.DataFrame({"PC1": [0.1], "PC2": [0.2]})),
+            "expl_var": [0.1, 0.2],
+        }
+        self.meta_data = {
+            "cols_key_plot": {"numeric_all": []},
+            "cols_key_meta": {"loc_id": "Site_Name", "date": "date"},
+            "dict_marker_map": {},
+            "loc_id_all": ["1A", "2B", "3C"],
+        }
+
+    def _plotter(self, working_data, selected, date_range, working_data_key=None):
+        return DataPlotter(
+            working_data,
+            self.meta_data,
+            selected,
+            ["Group1", "Group1"],
+            date_range,
+            working_data_key=working_data_key,
+        )
+
+    def test_mask_matches_year_comparison(self):
+        selection = {"points": [{"customdata": ["1A"]}, {"customdata": ["3C"]}]}
+        for selected in (None, selection):
+            for date_range in ([2016, 2018], [2015, 2015], [2030, 2031]):
+                with self.subTest(selected=selected is not None, date_range=date_range):
+                    indexed = self._plotter(self.working_data, selected, date_range)
+                    with mock.patch.object(data_manager, "load_date_index", return_value=None):
+                        scanned = self._plotter(self.working_data, selected, date_range)
+                    assert_frame_equal(indexed.df_plot_pca, scanned.df_plot_pca, check_index_type=False)
+                    assert_frame_equal(indexed.df_plot_pmap, scanned.df_plot_pmap, check_index_type=False)
+
+    def test_date_index_sorted_once_per_working_data_key(self):
+        date_index_cache.clear()
+        before = date_index_cache.stats()
+        self._plotter(self.working_data, None, [2016, 2018], working_data_key="abc")
+        self._plotter(self.working_data, None, [2017, 2019], working_data_key="abc")
+        after = date_index_cache.stats()
+        self.assertEqual(after["entries"], 1)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+
+    def test_no_working_data_key_skips_the_cache(self):
+        date_index_cache.clear()
+        self._plotter(self.working_data, None, [2016, 2018])
+        self.assertEqual(date_index_cache.stats()["entries"], 0)
+
+    def test_working_data_does_not_store_date_index(self):
+        # The session's df_master carries the stored permutation; working_data's
+        # is derived from df_plot_pca when plotting.
+        df_pca = load_frame(self.working_data, "df_plot_pca", "date")
+        working_data = SessionManager.package_plotting_data(
+            (df_pca, pd.DataFrame({"PC1": [0.1]}), [0.1]),
+            None,
+            self.meta_data,
+        )
+        self.assertNotIn("date_index", working_data)
+
+    def test_map_selection_keeps_positions_within_selection_as_labels(self):
+        # As the old subset_df_locIds(...).reset_index(drop=True) followed by
+        # the year Mask labelled them.
+        plotter = self._plotter(self.working_data, {"points": [{"customdata": ["2B"]}]}, [2016, 2018])
+        df = load_frame(self.working_data, "df_plot_pca", "date")
+        df = df[df["Site_Name"] == "2B"].reset_index(drop=True)
+        expected = df[(df["date"].dt.year >= 2016) & (df["date"].dt.year <= 2018)]
+        assert_frame_equal(plotter.df_plot_pca, expected, check_index_type=False)
+
 if __name__ == "__main__":
     unittest.main()
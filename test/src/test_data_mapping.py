@@ -1,9 +1,18 @@
+import io
 import unittest
 
 import pandas as pd
 
-from app.src.data_mapping import build_mapped_dataset
-from app.src.data_model import ColumnMapping
+from app.src.data_mapping import (
+    build_mapped_dataset,
+    build_parse_plan,
+    infer_dtype_hints,
+    read_mapped_csv,
+    role_column_options,
+    sniff_csv,
+    suggest_role_mapping,
+)
+from app.src.data_model import ROLE_REGISTRY, ColumnMapping, ColumnRole
 
 
 def make_raw_df():
@@ -198,6 +207,14 @@ class TestBuildMappedDatasetEntityId(unittest.TestCase):
         result = build_mapped_dataset(make_raw_df(), make_full_mapping())
         self.assertFalse(any(w.field == "entity_id" for w in result.validation.warnings))
 
+    def test_undated_id_spelling_a_dated_one_is_a_duplicate(self):
+        df = make_raw_df()
+        df.loc[1, "Site_Name"] = "1A_2023-01-01"
+        df.loc[1, "Sample_Date"] = "not-a-date"
+        result = build_mapped_dataset(df, make_full_mapping())
+        self.assertEqual(result.df_master["ENTITY_ID"].tolist()[:2], ["1A_2023-01-01"] * 2)
+        self.assertTrue(any(w.field == "entity_id" for w in result.validation.warnings))
+
 
 class TestBuildMappedDatasetOptionalRolesAbsent(unittest.TestCase):
     def test_all_optional_roles_absent_still_builds(self):
@@ -217,5 +234,142 @@ class TestBuildMappedDatasetOptionalRolesAbsent(unittest.TestCase):
         self.assertIn("LONGITUDE", result.df_master.columns)
 
 
+class TestValidationBudget(unittest.TestCase):
+    def make_bad_df(self):
+        df = make_raw_df()
+        df["lat_dd"] = [95.0, 60.0, 70.1]
+        df["lon_dd"] = [10.5, 200.0, 30.0]
+        df["Zinc"] = [0.0, 0.2, 0.3]
+        return df
+
+    def test_stops_checking_once_error_budget_is_spent(self):
+        result = build_mapped_dataset(self.make_bad_df(), make_full_mapping(), error_budget=1)
+        self.assertIsNone(result.df_master)
+        self.assertEqual(
+            [e.field for e in result.validation.errors], ["latitude", "longitude", "general"]
+        )
+
+    def test_zero_budget_reports_every_column(self):
+        result = build_mapped_dataset(self.make_bad_df(), make_full_mapping(), error_budget=0)
+        self.assertEqual(
+            [e.field for e in result.validation.errors], ["latitude", "longitude", "numeric_clr"]
+        )
+
+    def test_offending_values_are_capped_samples(self):
+        df = pd.concat([make_raw_df()] * 10, ignore_index=True)
+        df["lat_dd"] = 99.0
+        result = build_mapped_dataset(df, make_full_mapping())
+        (error,) = result.validation.errors
+        self.assertIn("30 row(s)", error.message)
+        self.assertEqual(error.offending_values, ["99.0"] * 10)
+
+    def test_missing_group_color_is_an_invalid_hex_value(self):
+        df = make_raw_df()
+        df["Group_Color"] = ["#FF0000", None, "red"]
+        result = build_mapped_dataset(df, make_full_mapping())
+        (warning,) = [w for w in result.validation.warnings if w.field == "group_color"]
+        self.assertEqual(warning.offending_values, ["nan", "red"])
+
+
+class TestSniffing(unittest.TestCase):
+    def setUp(self):
+        csv = (
+            "Well,Sampled On,Region,Lat,Lon,Cu,Zn,Note,Colour\n"
+            "W1,2023-01-01,North,50.1,-120.5,1.5,2.0,ok,#ff0000\n"
+            "W2,2023-02-01,South,51.0,-121.0,<0.1,3.0,,#00ff00\n"
+            "W3,2023-03-01,North,52.2,-119.9,2.5,4.0,dup,#0000ff\n"
+        )
+        for i in range(20):
+            csv += f"W{i + 4},2023-04-{i + 1:02d},South,49.0,-118.0,{i + 1}.0,5.0,,#123456\n"
+        self.source = io.StringIO(csv)
+
+    def test_only_sample_rows_are_read(self):
+        self.assertEqual(len(sniff_csv(self.source, n_rows=5)), 5)
+
+    def test_dtype_hints(self):
+        hints = infer_dtype_hints(sniff_csv(self.source))
+        self.assertEqual(
+            hints,
+            {
+                "Well": "string",
+                "Sampled On": "date",
+                "Region": "string",
+                "Lat": "numeric",
+                "Lon": "numeric",
+                "Cu": "numeric",  # one "<0.1" in 23 rows is within tolerance
+                "Zn": "numeric",
+                "Note": "string",
+                "Colour": "hex_color",
+            },
+        )
+
+    def test_suggested_roles_and_option_order(self):
+        df_sample = sniff_csv(self.source)
+        hints = infer_dtype_hints(df_sample)
+        self.assertEqual(
+            suggest_role_mapping(df_sample, hints),
+            {
+                "latitude": "Lat",
+                "longitude": "Lon",
+                "date": "Sampled On",
+                "location_id": "Well",
+                "numeric_simple": ["Cu", "Zn"],
+            },
+        )
+        date_spec = next(spec for spec in ROLE_REGISTRY if spec.role == ColumnRole.DATE)
+        options = role_column_options(date_spec, hints)
+        self.assertEqual(options[0], {"label": "Sampled On (date)", "value": "Sampled On"})
+        self.assertEqual(len(options), len(hints))
+
+    def test_out_of_range_coordinates_are_not_suggested(self):
+        df_sample = pd.DataFrame({"lat": [95.0, 10.0], "lon": [10.0, 20.0]})
+        suggestions = suggest_role_mapping(df_sample, infer_dtype_hints(df_sample))
+        self.assertNotIn("latitude", suggestions)
+        self.assertEqual(suggestions["longitude"], "lon")
+
+
+class TestParsePlan(unittest.TestCase):
+    def setUp(self):
+        raw = make_raw_df()
+        raw["Unmapped_Note"] = "lab comment"
+        raw["Unmapped_Qualifier"] = ["<", "", "J"]
+        self.csv = raw.to_csv(index=False)
+        self.mapping = make_full_mapping()
+
+    def test_only_mapped_columns_are_read_with_declared_dtypes(self):
+        df_raw = read_mapped_csv(io.StringIO(self.csv), self.mapping)
+        self.assertEqual(set(df_raw.columns), set(self.mapping.all_mapped_columns()))
+        # Plotting groups keep read_csv's inference (see _INFERRED_ROLES).
+        self.assertNotIsInstance(df_raw["Group"].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(df_raw["Site_Name"].dtype, pd.CategoricalDtype)
+        self.assertEqual(df_raw["MarkerSize"].dtype, "float64")
+        self.assertEqual(df_raw["lat_dd"].dtype, "float64")
+        self.assertFalse(build_mapped_dataset(df_raw, self.mapping).validation.has_errors)
+
+    def test_missing_mapped_column_is_still_reported(self):
+        mapping = make_full_mapping()
+        mapping.numeric_simple = ["Copper", "Lead"]
+        plan = build_parse_plan(mapping, pd.read_csv(io.StringIO(self.csv), nrows=0).columns)
+        self.assertNotIn("Lead", plan.usecols)
+        result = build_mapped_dataset(read_mapped_csv(io.StringIO(self.csv), mapping), mapping)
+        self.assertTrue(any("'Lead'" in issue.message for issue in result.validation.errors))
+
+    def test_text_in_numeric_column_falls_back_to_row_coercion(self):
+        csv = self.csv.replace(",2.0,", ",<0.1,", 1)
+        df_raw = read_mapped_csv(io.StringIO(csv), self.mapping)
+        result = build_mapped_dataset(df_raw, self.mapping)
+        self.assertTrue(
+            any("could not be parsed" in issue.message for issue in result.validation.warnings)
+        )
+
+    def test_conflicting_roles_get_no_declared_dtype(self):
+        mapping = make_full_mapping()
+        mapping.plotting_groups = ["Group", "MarkerSize"]
+        plan = build_parse_plan(mapping, ["Group", "MarkerSize", "Copper"], engine="c")
+        self.assertNotIn("MarkerSize", plan.dtype)
+        self.assertEqual(plan.usecols, ["Group", "MarkerSize", "Copper"])
+        self.assertEqual(plan.read_csv_kwargs()["float_precision"], "high")
+
+
 if __name__ == "__main__":
     unittest.main()
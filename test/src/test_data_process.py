@@ -23,6 +23,7 @@ from app.src.data_process import (
     DEFAULT_UNASSIGNED_CATEGORY,
     LIGHT_GREY_COLOR,
 )
+from app.src.selection_engine import DateIndex
 
 
 class TestDataProcess(unittest.TestCase):
@@ -56,6 +57,13 @@ class TestDataProcess(unittest.TestCase):
         self.assertIn("A", result)
         self.assertIn("B", result)
 
+    def test_make_color_dict_text_groups_with_blanks(self):
+        df = self.df.copy()
+        df["Group"] = ["1", None, "0"]
+        result = make_color_dict(df, "Group")
+        self.assertEqual(list(result)[:2], ["0", "1"])
+        self.assertEqual(len(result), 3)
+
     def test_make_color_dict_unassigned_always_light_grey(self):
         # "Unassigned" sorts late alphabetically among these values, so
         # without special-casing it would land on whatever palette color
@@ -266,6 +274,14 @@ class TestDataProcess(unittest.TestCase):
         result = subset_df_dateRange(self.df, "Sample_Date", None)
         self.assertEqual(result.shape[0], self.df.shape[0])
 
+    def test_subset_df_dateRange_with_date_index(self):
+        date_index = DateIndex.from_series(self.df["Sample_Date"])
+        for date_range in (["2023-01-01", "2023-01-02"], ["2023-01-03", "2023-01-03"]):
+            assert_frame_equal(
+                subset_df_dateRange(self.df, "Sample_Date", date_range, date_index),
+                subset_df_dateRange(self.df, "Sample_Date", date_range),
+            )
+
     def test_subset_df_dateRange_does_not_mutate_input(self):
         subset_df_dateRange(self.df, "Sample_Date", ["2023-01-01", "2023-01-01"])
         self.assertEqual(self.df.shape[0], 3)
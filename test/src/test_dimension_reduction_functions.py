@@ -1,14 +1,25 @@
+import threading
 import unittest
 from unittest.mock import patch
+import numpy as np
 import pandas as pd
+from app.src import dimension_reduction_functions
+from app.src.compositional_data_functions import clr_transform_scale
 from app.src.dimension_reduction_functions import (
     process_dimension_reduction,
+    process_pca,
+    process_pmap,
+    choose_pca_solver,
+    pca_loading_matrix,
     run_pca,
+    run_pca_chunked,
+    run_pmap,
+    warm_start_init,
     MAX_PCA_COMPONENTS,
 )
 
 
-def _fake_run_pmap(df, cat_cols, analytes, n_neighbors):
+def _fake_run_pmap(df, cat_cols, analytes, n_neighbors, init=None):
     """Stand-in for run_pmap in orchestration tests - PaCMAP itself (numba JIT,
     heavy C/C++ parallel libs) is not what these tests exercise, and actually
     invoking it is slow/flaky under test. Mirrors row count only."""
@@ -108,6 +119,230 @@ class TestProcessDimensionReductionDateFilter(unittest.TestCase):
         self.assertEqual(df_plot_pca.shape[0], 6)
         self.assertEqual(df_plot_pmap.shape[0], 6)
 
+    @patch(
+        "app.src.dimension_reduction_functions.run_pmap",
+        side_effect=_fake_run_pmap,
+    )
+    def test_progress_callback_reports_stages_and_can_abort(self, mock_run_pmap):
+        reported = []
+        process_dimension_reduction(
+            self.df,
+            "Site_Name",
+            ["Group"],
+            ["Copper", "Zinc"],
+            [],
+            feature_selection=["Copper", "Zinc"],
+            loc_id_selection=["1", "2", "3", "4", "5", "6"],
+            n_neighbors=2,
+            progress=lambda fraction, message: reported.append(fraction),
+        )
+        self.assertEqual(reported, sorted(reported))
+        self.assertEqual(reported[-1], 1.0)
+
+        def abort(fraction, message):
+            if message == "Transforming data":
+                raise RuntimeError("cancelled")
+
+        mock_run_pmap.reset_mock()
+        with self.assertRaises(RuntimeError):
+            process_dimension_reduction(
+                self.df,
+                "Site_Name",
+                ["Group"],
+                ["Copper", "Zinc"],
+                [],
+                feature_selection=["Copper", "Zinc"],
+                loc_id_selection=["1", "2", "3", "4", "5", "6"],
+                n_neighbors=2,
+                progress=abort,
+            )
+        mock_run_pmap.assert_not_called()
+
+
+class TestProcessDimensionReductionConcurrency(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "Site_Name": ["1", "2", "3", "4"],
+                "Group": ["A", "B", "A", "B"],
+                "Copper": [1.0, 2.0, 3.0, 5.0],
+                "Zinc": [4.0, 5.0, 6.0, 2.0],
+            }
+        )
+        self.kwargs = dict(
+            feature_selection=["Copper", "Zinc"],
+            loc_id_selection=["1", "2", "3", "4"],
+            n_neighbors=2,
+        )
+
+    def _run(self, **kwargs):
+        return process_dimension_reduction(
+            self.df, "Site_Name", ["Group"], ["Copper", "Zinc"], [], **self.kwargs, **kwargs
+        )
+
+    def test_pca_finishes_while_pmap_is_still_running(self):
+        pca_done = threading.Event()
+
+        def slow_pmap(df, cat_cols, analytes, n_neighbors, init=None):
+            # Only returns once PCA has finished - would time out if PCA
+            # waited for PaCMAP.
+            self.assertTrue(pca_done.wait(timeout=10))
+            return _fake_run_pmap(df, cat_cols, analytes, n_neighbors)
+
+        def progress(fraction, message):
+            if message == "Running PaCMAP":
+                pca_done.set()
+
+        with patch("app.src.dimension_reduction_functions.run_pmap", side_effect=slow_pmap):
+            (df_plot_pca, _, _), df_plot_pmap = self._run(progress=progress, overlap=True)
+        self.assertEqual(len(df_plot_pca), 4)
+        self.assertEqual(len(df_plot_pmap), 4)
+
+    def test_abort_returns_without_waiting_for_pmap(self):
+        release = threading.Event()
+        finished = threading.Event()
+
+        def blocked_pmap(df, cat_cols, analytes, n_neighbors, init=None):
+            release.wait(timeout=10)
+            finished.set()
+            return _fake_run_pmap(df, cat_cols, analytes, n_neighbors)
+
+        def abort(fraction, message):
+            if message == "Running PaCMAP":
+                raise RuntimeError("cancelled")
+
+        with patch("app.src.dimension_reduction_functions.run_pmap", side_effect=blocked_pmap):
+            with self.assertRaises(RuntimeError):
+                self._run(progress=abort, overlap=True)
+            # The abort didn't wait for PaCMAP, which is still running.
+            self.assertFalse(finished.is_set())
+            release.set()
+            self.assertTrue(finished.wait(timeout=10))
+
+    @patch(
+        "app.src.dimension_reduction_functions.run_pmap",
+        side_effect=_fake_run_pmap,
+    )
+    def test_serial_and_threaded_results_match(self, mock_run_pmap):
+        serial = self._run(overlap=False)
+        threaded = self._run(overlap=True)
+        pd.testing.assert_frame_equal(serial[0][0], threaded[0][0])
+        pd.testing.assert_frame_equal(serial[1], threaded[1])
+
+
+class TestProcessPhases(TestProcessDimensionReductionConcurrency):
+    @patch(
+        "app.src.dimension_reduction_functions.run_pmap",
+        side_effect=_fake_run_pmap,
+    )
+    def test_phases_match_combined_run(self, mock_run_pmap):
+        (df_plot_pca, ldg_df, expl_var), df_plot_pmap = self._run(overlap=False)
+        args = (self.df, "Site_Name", ["Group"], ["Copper", "Zinc"], [])
+        selection = (self.kwargs["feature_selection"], self.kwargs["loc_id_selection"])
+        pca = process_pca(*args, *selection)
+        pd.testing.assert_frame_equal(pca[0], df_plot_pca)
+        pd.testing.assert_frame_equal(pca[1], ldg_df)
+        self.assertEqual(pca[2], expl_var)
+        pd.testing.assert_frame_equal(process_pmap(*args, *selection, 2), df_plot_pmap)
+
+    @patch("app.src.dimension_reduction_functions.run_pmap")
+    def test_process_pca_never_runs_pacmap(self, mock_run_pmap):
+        args = (self.df, "Site_Name", ["Group"], ["Copper", "Zinc"], [])
+        process_pca(*args, self.kwargs["feature_selection"], self.kwargs["loc_id_selection"])
+        mock_run_pmap.assert_not_called()
+
+
+class TestRunPcaChunked(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 1003
+        self.df = pd.DataFrame(
+            {
+                "Site_Name": rng.choice(["1", "2", "3"], size=n),
+                "Depth": rng.normal(size=n),
+                "Copper": rng.lognormal(size=n),
+                "Zinc": rng.lognormal(size=n),
+                "Lead": rng.lognormal(size=n),
+            },
+            index=np.arange(n) * 2,
+        )
+        self.analytes = ["Depth", "Copper", "Zinc", "Lead"]
+        self.clr = ["Copper", "Zinc", "Lead"]
+
+    def test_matches_run_pca_up_to_sign(self):
+        df_clr = clr_transform_scale(self.df.copy(), self.analytes, self.clr)
+        expected = run_pca(df_clr, ["Site_Name"], self.analytes)
+        # A short tail (1003 % 100) is folded into the previous block.
+        chunked = run_pca_chunked(self.df, ["Site_Name"], self.analytes, self.clr, chunk_rows=100)
+        np.testing.assert_allclose(chunked[2], expected[2], atol=1e-9)
+        # The CLR'd parts sum to zero, so the last component is degenerate.
+        n_components = len(chunked[2]) - 1
+        pcs = [f"PC{i + 1}" for i in range(n_components)]
+        np.testing.assert_allclose(
+            chunked[1][pcs].abs().to_numpy(), expected[1][pcs].abs().to_numpy(), atol=1e-6
+        )
+        signs = np.sign(chunked[1][pcs].to_numpy()[0] * expected[1][pcs].to_numpy()[0])
+        # make_df_for_biplot min-max scales each component, so a flipped
+        # component maps x to 1 - x.
+        for pc, sign in zip(pcs, signs):
+            got = chunked[0][pc] if sign > 0 else 1 - chunked[0][pc]
+            np.testing.assert_allclose(got.to_numpy(), expected[0][pc].to_numpy(), atol=1e-6)
+        pd.testing.assert_index_equal(chunked[0].index, self.df.index)
+        pd.testing.assert_series_equal(chunked[0]["Site_Name"], self.df["Site_Name"])
+        self.assertEqual(list(chunked[1]["metals"]), self.analytes)
+
+    def test_process_pca_chunks_large_selections(self):
+        args = (self.df, "Site_Name", ["Site_Name"], ["Depth"], self.clr)
+        selection = (self.analytes, ["1", "2", "3"])
+        with patch.object(dimension_reduction_functions, "PCA_CHUNKED_MIN_ROWS", 500), patch.object(
+            dimension_reduction_functions, "run_pca_chunked", wraps=run_pca_chunked
+        ) as chunked:
+            result = process_pca(*args, *selection)
+        chunked.assert_called_once()
+        self.assertEqual(len(result[0]), len(self.df))
+        with patch.object(dimension_reduction_functions, "run_pca_chunked") as chunked:
+            process_pca(*args, *selection)
+        chunked.assert_not_called()
+
+
+class TestWarmStart(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame(rng.normal(size=(10, 2)), columns=["Copper", "Zinc"])
+        self.previous = pd.DataFrame(
+            {"PMAP1": np.arange(10.0), "PMAP2": -np.arange(10.0)}, index=self.df.index
+        )
+
+    def test_retained_rows_start_at_previous_coordinates(self):
+        init = warm_start_init(self.df.iloc[2:], ["Copper", "Zinc"], self.previous)
+        np.testing.assert_array_equal(init[:, 0], np.arange(2.0, 10.0))
+        np.testing.assert_array_equal(init[:, 1], -np.arange(2.0, 10.0))
+
+    def test_new_rows_start_near_their_nearest_retained_rows(self):
+        previous = self.previous.iloc[:8]
+        init = warm_start_init(self.df, ["Copper", "Zinc"], previous)
+        self.assertEqual(init.shape, (10, 2))
+        for row in (8, 9):
+            self.assertTrue(0 <= init[row, 0] <= 7)
+            self.assertAlmostEqual(init[row, 0], -init[row, 1], places=5)
+
+    def test_low_overlap_or_no_previous_embedding_fits_cold(self):
+        self.assertIsNone(warm_start_init(self.df, ["Copper", "Zinc"], None))
+        self.assertIsNone(warm_start_init(self.df, ["Copper", "Zinc"], self.previous.iloc[:3]))
+
+    @patch("app.src.dimension_reduction_functions.pacmap.PaCMAP")
+    def test_warm_start_runs_shortened_schedule_from_init(self, mock_pacmap):
+        mock_pacmap.return_value.fit_transform.return_value = np.zeros((10, 2))
+        df = self.df.assign(Group="A")
+        run_pmap(df, ["Group"], ["Copper", "Zinc"], 2)
+        self.assertNotIn("num_iters", mock_pacmap.call_args.kwargs)
+        self.assertIsNone(mock_pacmap.return_value.fit_transform.call_args.kwargs["init"])
+
+        init = self.previous.to_numpy()
+        run_pmap(df, ["Group"], ["Copper", "Zinc"], 2, init=init)
+        self.assertEqual(mock_pacmap.call_args.kwargs["num_iters"], (0, 50, 100))
+        self.assertIs(mock_pacmap.return_value.fit_transform.call_args.kwargs["init"], init)
+
 
 class TestRunPcaComponentCount(unittest.TestCase):
     """Selectable PC-pair plotting (PC1 vs PC3, etc.) needs run_pca to
@@ -140,5 +375,26 @@ class TestRunPcaComponentCount(unittest.TestCase):
         self.assertEqual(len(expl_var), 2)
 
 
+class TestPcaSolver(unittest.TestCase):
+    def test_solver_follows_matrix_shape(self):
+        self.assertEqual(choose_pca_solver(100_000, 60, 5), "covariance_eigh")
+        self.assertEqual(choose_pca_solver(2_000, 1_500, 5), "randomized")
+        self.assertEqual(choose_pca_solver(50, 20, 5), "full")
+
+    def test_solvers_agree_on_components(self):
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame(rng.normal(size=(200, 6)) * [5, 4, 3, 2, 1, 0.5])
+        _, full_trns, full_ldg = pca_loading_matrix(df, 3, svd_solver="full")
+        for solver in ("covariance_eigh", "randomized"):
+            pca_obj, trns, ldg = pca_loading_matrix(df, 3, svd_solver=solver)
+            self.assertEqual(pca_obj.svd_solver, solver)
+            np.testing.assert_allclose(np.abs(trns), np.abs(full_trns), atol=1e-6)
+            np.testing.assert_allclose(
+                np.abs(ldg.drop(columns="metals").to_numpy(dtype=float)),
+                np.abs(full_ldg.drop(columns="metals").to_numpy(dtype=float)),
+                atol=1e-6,
+            )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,10 @@
 import unittest
+from unittest.mock import ANY, patch
+
 import dash
+from app.src import error_handling
 from app.src.error_handling import log_and_prevent_update, log_and_surface_error
+from app.src.store_utils import SessionExpiredError
 
 
 class TestLogAndPreventUpdate(unittest.TestCase):
@@ -79,5 +83,34 @@ class TestLogAndSurfaceError(unittest.TestCase):
             raises_prevent_update()
 
 
+class TestSessionExpired(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(error_handling.dash, "set_props")
+        self.set_props = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _cleared_stores(self):
+        return {
+            call.args[0] for call in self.set_props.call_args_list if call.args[1] == {"data": None}
+        }
+
+    def test_decorated_callback_clears_session_stores(self):
+        @log_and_prevent_update("test.logger")
+        def expired():
+            raise SessionExpiredError("gone")
+
+        self.assertIs(expired(), dash.no_update)
+        self.assertEqual(self._cleared_stores(), set(error_handling.SESSION_STORES))
+        self.set_props.assert_any_call("global-alert-container", ANY)
+
+    def test_on_callback_error_handles_expiry_and_reraises_the_rest(self):
+        self.assertIsNone(error_handling.on_callback_error(SessionExpiredError("gone")))
+        self.assertEqual(self._cleared_stores(), set(error_handling.SESSION_STORES))
+        self.set_props.reset_mock()
+        with self.assertRaises(ValueError):
+            error_handling.on_callback_error(ValueError("bug"))
+        self.set_props.assert_not_called()
+
+
 if __name__ == "__main__":
     unittest.main()
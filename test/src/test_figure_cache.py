@@ -0,0 +1,46 @@
+import unittest
+
+import plotly.graph_objects as go
+
+from app.src.cache_initialize import figure_cache
+from app.src.figure_cache import figure_cache_key, get_figure, put_figure
+
+
+class TestFigureCache(unittest.TestCase):
+    def setUp(self):
+        figure_cache.clear()
+        self.inputs = ('{"workspace": "w", "digest": "d"}', '{"a": 1}', None)
+
+    def _key(self, selected_data=None, overrides=None, view=("PC1", "PC2")):
+        working_data, meta_data, _ = self.inputs
+        return figure_cache_key(
+            "pca",
+            working_data,
+            meta_data,
+            overrides,
+            selected_data,
+            ["Group1", "Group1"],
+            [2020, 2023],
+            view=view,
+        )
+
+    def test_key_ignores_selection_order_but_not_content(self):
+        selection = {"points": [{"customdata": ["B"]}, {"customdata": ["A"]}]}
+        reordered = {"points": [{"customdata": ["A"]}, {"customdata": ["B"]}]}
+        self.assertEqual(self._key(selection), self._key(reordered))
+        self.assertNotEqual(self._key(selection), self._key())
+        self.assertNotEqual(self._key(overrides='{"Group1": {"A": "#123456"}}'), self._key())
+        self.assertNotEqual(self._key(view=("PC1", "PC3")), self._key())
+
+    def test_put_then_get_round_trips_figure(self):
+        key = self._key()
+        self.assertIsNone(get_figure(key))
+        fig = go.Figure(go.Scatter(x=[1, 2], y=[3, 4], name="Site1"))
+        stored = put_figure(key, fig)
+        self.assertEqual(get_figure(key), stored)
+        self.assertEqual(stored["data"][0]["name"], "Site1")
+        self.assertEqual(figure_cache.stats()["hit_rate"], 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,254 @@
+import unittest
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from app.src import job_runner
+from app.src.session_codec import decode_frame
+
+
+class _FakeJobStore:
+    """In-memory stand-in for session_manager's Redis job-state helpers."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.workspace_jobs = {}
+
+    def save(self, job_id, **fields):
+        self.jobs.setdefault(job_id, {}).update(fields)
+
+    def load(self, job_id):
+        return dict(self.jobs.get(job_id, {}))
+
+    def swap(self, workspace_id, job_id):
+        previous = self.workspace_jobs.get(workspace_id)
+        self.workspace_jobs[workspace_id] = job_id
+        return previous
+
+
+class TestJobRunner(unittest.TestCase):
+    def setUp(self):
+        self.store = _FakeJobStore()
+        patchers = [
+            patch.object(job_runner, "save_job_state", side_effect=self.store.save),
+            patch.object(job_runner, "load_job_state", side_effect=self.store.load),
+            patch.object(job_runner, "swap_workspace_job", side_effect=self.store.swap),
+            patch.object(job_runner, "load_session", return_value={"plotting_data": {}}),
+            patch.object(job_runner, "dump_session", side_effect=lambda data, ws: f"handle:{ws}"),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+        self.executor = MagicMock()
+        executor_patch = patch.object(job_runner, "_get_executor", return_value=self.executor)
+        executor_patch.start()
+        self.addCleanup(executor_patch.stop)
+
+    def test_submit_queues_job_on_executor(self):
+        job_id = job_runner.submit_pmap_job("raw", "ws1", {"n_neighbors": 15})
+        self.assertEqual(job_runner.get_job(job_id)["status"], job_runner.JOB_QUEUED)
+        self.executor.submit.assert_called_once()
+        self.assertEqual(
+            self.executor.submit.call_args[0][1:], (job_id, "ws1", "raw", {"n_neighbors": 15})
+        )
+
+    def test_new_submission_supersedes_previous_job(self):
+        first = job_runner.submit_pmap_job("raw", "ws1", {})
+        second = job_runner.submit_pmap_job("raw", "ws1", {})
+        self.assertEqual(self.store.jobs[first]["cancel"], "1")
+        self.assertEqual(self.store.jobs[second]["cancel"], "0")
+
+    def test_successful_job_publishes_handles(self):
+        job_id = job_runner.submit_pmap_job("raw", "ws1", {})
+
+        def fake_build(session, request, progress):
+            progress(0.5, "Halfway")
+            self.assertEqual(self.store.jobs[job_id]["progress"], "50")
+            return {"ldg_df": "x"}, session
+
+        with patch.object(job_runner, "build_pmap_working_data", side_effect=fake_build):
+            job_runner._run_pmap_job(job_id, "ws1", "raw", {})
+        job = job_runner.get_job(job_id)
+        self.assertEqual(job["status"], job_runner.JOB_DONE)
+        self.assertEqual(job["progress"], 100)
+        self.assertEqual(job["working_data"], "handle:ws1")
+        self.assertEqual(job["session"], "handle:ws1")
+
+    def test_cancelled_job_stops_at_next_checkpoint(self):
+        job_id = job_runner.submit_pmap_job("raw", "ws1", {})
+        reached = []
+
+        def fake_build(session, request, progress):
+            job_runner.cancel_job(job_id)
+            progress(0.3, "Running PaCMAP")
+            reached.append(True)
+
+        with patch.object(job_runner, "build_pmap_working_data", side_effect=fake_build):
+            job_runner._run_pmap_job(job_id, "ws1", "raw", {})
+        self.assertEqual(job_runner.get_job(job_id)["status"], job_runner.JOB_CANCELLED)
+        self.assertFalse(reached)
+        self.assertNotIn("session", self.store.jobs[job_id])
+
+    def test_failed_job_records_error(self):
+        job_id = job_runner.submit_pmap_job("raw", "ws1", {})
+        with patch.object(job_runner, "build_pmap_working_data", side_effect=ValueError("boom")):
+            job_runner._run_pmap_job(job_id, "ws1", "raw", {})
+        job = job_runner.get_job(job_id)
+        self.assertEqual(job["status"], job_runner.JOB_FAILED)
+        self.assertEqual(job["error"], "boom")
+
+    def test_crashed_worker_marks_job_failed(self):
+        future = Future()
+        self.executor.submit.return_value = future
+        with patch.object(job_runner, "_executor", self.executor):
+            job_id = job_runner.submit_pmap_job("raw", "ws1", {})
+            self.store.save(job_id, status=job_runner.JOB_RUNNING)
+            future.set_exception(BrokenProcessPool("worker died"))
+            # The broken pool is dropped so the next Apply gets a new one.
+            self.assertIsNone(job_runner._executor)
+        job = job_runner.get_job(job_id)
+        self.assertEqual(job["status"], job_runner.JOB_FAILED)
+        self.assertIn("BrokenProcessPool", job["error"])
+
+    def test_cancelled_future_marks_job_cancelled(self):
+        future = Future()
+        self.executor.submit.return_value = future
+        job_id = job_runner.submit_pmap_job("raw", "ws1", {})
+        future.cancel()
+        self.assertEqual(job_runner.get_job(job_id)["status"], job_runner.JOB_CANCELLED)
+
+    def test_exit_callback_keeps_a_recorded_finish(self):
+        future = Future()
+        self.executor.submit.return_value = future
+        job_id = job_runner.submit_pmap_job("raw", "ws1", {})
+        self.store.save(job_id, status=job_runner.JOB_DONE)
+        future.set_exception(RuntimeError("late"))
+        self.assertEqual(job_runner.get_job(job_id)["status"], job_runner.JOB_DONE)
+        self.assertNotIn("error", self.store.jobs[job_id])
+
+    def test_unknown_job_reports_failed(self):
+        self.assertEqual(job_runner.get_job("missing")["status"], job_runner.JOB_FAILED)
+
+
+class TestBuildPhases(unittest.TestCase):
+    def setUp(self):
+        self.session = {
+            "meta_data": {
+                "cols_key_meta": {"loc_id": "LOC", "date": None},
+                "cols_key_plot": {"meta": ["LOC"], "numeric_simple": ["Cu"], "numeric_clr": []},
+            },
+            "plotting_data": {},
+        }
+        self.request = {
+            "feature_selection": ["Cu"],
+            "loc_id_selection": ["A", "B"],
+            "n_neighbors": 15,
+            "date_filter_range": None,
+            "map_group": "LOC",
+            "plot_group_1": "LOC",
+            "plot_group_2": "LOC",
+        }
+        patchers = [
+            patch.object(job_runner, "load_frame", return_value=pd.DataFrame()),
+            patch.object(
+                job_runner.SessionManager,
+                "package_plotting_data",
+                side_effect=lambda pca, pmap, meta: {"pca": pca, "df_plot_pmap": pmap},
+            ),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_pca_phase_leaves_pmap_pending(self):
+        with patch.object(job_runner, "cached_pca", return_value="pca") as mock_pca, patch.object(
+            job_runner, "cached_pmap"
+        ) as mock_pmap:
+            working_data, session = job_runner.build_pca_working_data(self.session, self.request)
+        mock_pca.assert_called_once()
+        mock_pmap.assert_not_called()
+        self.assertEqual(working_data, {"pca": "pca", "df_plot_pmap": None})
+        self.assertIs(session["working_data"], working_data)
+        self.assertEqual(session["plotting_data"]["pmap_neighbors"], 15)
+
+    def test_pmap_phase_fills_in_embedding(self):
+        self.session["working_data"] = {"pca": "pca", "df_plot_pmap": None}
+        df_plot_pmap = pd.DataFrame({"PMAP1": [1.0], "PMAP2": [2.0]})
+        with patch.object(job_runner, "cached_pmap", return_value=df_plot_pmap) as mock_pmap:
+            working_data, session = job_runner.build_pmap_working_data(self.session, self.request)
+        self.assertEqual(mock_pmap.call_args.kwargs["n_neighbors"], 15)
+        self.assertEqual(working_data["pca"], "pca")
+        assert_frame_equal(decode_frame(working_data["df_plot_pmap"]), df_plot_pmap)
+
+    def test_warm_start_uses_the_sessions_last_embedding(self):
+        self.session["working_data"] = {"pca": "pca", "df_plot_pmap": None}
+        first = pd.DataFrame({"PMAP1": [1.0], "PMAP2": [2.0], "LOC": ["A"]})
+        with patch.object(job_runner, "cached_pmap", return_value=first) as mock_pmap:
+            job_runner.build_pmap_working_data(self.session, self.request)
+            self.assertIsNone(mock_pmap.call_args.kwargs["previous_embedding"])
+            job_runner.build_pmap_working_data(
+                self.session, dict(self.request, pmap_warm_start=True)
+            )
+        assert_frame_equal(
+            mock_pmap.call_args.kwargs["previous_embedding"], first[["PMAP1", "PMAP2"]]
+        )
+
+
+class TestMergePmapJobSession(unittest.TestCase):
+    def test_keeps_edits_made_while_the_job_ran(self):
+        job_session = {
+            "working_data": {"df_plot_pmap": "pmap"},
+            "pmap_embedding": "embedding",
+            "plotting_data": {
+                "pmap_neighbors": 15,
+                "plot_group_dropdown_1_options": ["LOC"],
+            },
+            "df_master": "submitted",
+        }
+        current = {
+            "workspace_id": "ws1",
+            "working_data": {"df_plot_pmap": None},
+            "plotting_data": {
+                "pmap_neighbors": 15,
+                "plot_group_dropdown_1_options": ["LOC", "Custom"],
+            },
+            "df_master": "with custom group",
+        }
+        merged = job_runner.merge_pmap_job_session(current, job_session)
+        self.assertEqual(merged["working_data"], {"df_plot_pmap": "pmap"})
+        self.assertEqual(merged["pmap_embedding"], "embedding")
+        self.assertEqual(merged["df_master"], "with custom group")
+        self.assertEqual(
+            merged["plotting_data"]["plot_group_dropdown_1_options"], ["LOC", "Custom"]
+        )
+
+    def test_apply_keys_match_what_apply_records(self):
+        session = {"meta_data": {}, "plotting_data": {}}
+        request = dict.fromkeys(
+            [
+                "feature_selection",
+                "loc_id_selection",
+                "date_filter_range",
+                "map_group",
+                "plot_group_1",
+                "plot_group_2",
+                "n_neighbors",
+            ]
+        )
+        with patch.object(job_runner.SessionManager, "package_plotting_data", return_value={}):
+            job_runner._store_working_data(session, request, (), None)
+        self.assertEqual(set(session["plotting_data"]), set(job_runner.APPLY_PLOTTING_KEYS))
+
+class TestJobsAvailable(unittest.TestCase):
+    def test_requires_redis(self):
+        with patch.object(job_runner, "ping", return_value=False):
+            self.assertFalse(job_runner.jobs_available())
+        with patch.object(job_runner, "ping", return_value=True):
+            self.assertEqual(job_runner.jobs_available(), job_runner.BACKGROUND_JOBS)
+
+
+if __name__ == "__main__":
+    unittest.main()
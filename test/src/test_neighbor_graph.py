@@ -0,0 +1,71 @@
+import hashlib
+import unittest
+
+import numpy as np
+
+from app.src.cache_initialize import knn_graph_cache
+from app.src.neighbor_graph import (
+    build_neighbor_graph,
+    cached_neighbor_pairs,
+    can_use_neighbor_graph,
+    neighbor_pairs,
+)
+
+
+def _digest(X):
+    return hashlib.blake2b(X.tobytes(), digest_size=16).hexdigest()
+
+
+class TestNeighborGraph(unittest.TestCase):
+    def setUp(self):
+        knn_graph_cache.clear()
+        self.X = np.random.default_rng(0).normal(size=(60, 4)).astype(np.float32)
+
+    def test_graph_excludes_self_and_ranks_by_scaled_distance(self):
+        graph = build_neighbor_graph(self.X, 20)
+        self.assertEqual(graph.shape, (60, 20))
+        self.assertFalse((graph == np.arange(60)[:, None]).any())
+        dist = np.linalg.norm(self.X[:, None] - self.X[None], axis=2)
+        np.fill_diagonal(dist, np.inf)
+        sig = np.maximum(np.sort(dist, axis=1)[:, 3:6].mean(axis=1), 1e-10)
+        scaled = dist**2 / sig[:, None] / sig[None, :]
+        ranked = np.take_along_axis(scaled, graph.astype(np.int64), axis=1)
+        self.assertTrue((np.diff(ranked, axis=1) >= -1e-5).all())
+
+    def test_pairs_are_prefix_slices_of_the_graph(self):
+        graph = build_neighbor_graph(self.X, 20)
+        pairs = neighbor_pairs(graph, 5)
+        self.assertEqual(pairs.shape, (300, 2))
+        np.testing.assert_array_equal(pairs[:5, 0], [0] * 5)
+        np.testing.assert_array_equal(pairs[:5, 1], graph[0, :5])
+
+    def test_graph_is_built_once_per_matrix(self):
+        X = np.random.default_rng(1).normal(size=(200, 4)).astype(np.float32)
+        large = cached_neighbor_pairs(X, 10)
+        self.assertEqual(knn_graph_cache.get((X.shape, _digest(X))).shape[1], 60)
+        hits = knn_graph_cache.stats()["hits"]
+        small = cached_neighbor_pairs(X, 5)
+        self.assertEqual(len(knn_graph_cache), 1)
+        self.assertEqual(knn_graph_cache.stats()["hits"], hits + 1)
+        np.testing.assert_array_equal(small[:5], large[:5])
+
+        cached_neighbor_pairs(X[:50], 5)
+        self.assertEqual(len(knn_graph_cache), 2)
+
+    def test_more_neighbors_than_cached_rebuilds_wider(self):
+        X = np.random.default_rng(1).normal(size=(200, 4)).astype(np.float32)
+        cached_neighbor_pairs(X, 5)
+        self.assertEqual(knn_graph_cache.get((X.shape, _digest(X))).shape[1], 55)
+        cached_neighbor_pairs(X, 20)
+        self.assertEqual(len(knn_graph_cache), 1)
+        self.assertEqual(knn_graph_cache.get((X.shape, _digest(X))).shape[1], 70)
+
+    def test_small_samples_fall_back_to_pacmap_sampling(self):
+        self.assertFalse(can_use_neighbor_graph(20, 4, 10))
+        self.assertFalse(can_use_neighbor_graph(1000, 101, 10))
+        self.assertTrue(can_use_neighbor_graph(1000, 4, 10))
+        self.assertIsNone(cached_neighbor_pairs(self.X[:20], 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import json
 import unittest
 import pandas as pd
 import numpy as np
@@ -8,7 +9,8 @@ from app.src.plotting import (
     make_map,
     PlotContext,
     _find_axis_limits,
-    _generate_text,
+    _hover_dates,
+    _hover_template,
     make_base_scatter_plot,
     _annotate_loadings,
     make_fig_pmap,
@@ -16,7 +18,24 @@ from app.src.plotting import (
     _DEFAULT_COLOR,
     _DEFAULT_MARKER_SYMBOL,
     _wrap_legend_label,
+    patch_pca_components,
+    figure_layout_signature,
+    patch_scatter_colors,
+    placeholder_fig,
 )
+from app.src import plotting
+
+
+def _apply_patch(fig, patch):
+    """Apply a dash.Patch's assignments to a copy of `fig`, as the browser would."""
+    fig_dict = fig.to_plotly_json()
+    for op in patch.to_plotly_json()["operations"]:
+        assert op["operation"] == "Assign", op
+        target = fig_dict
+        for key in op["location"][:-1]:
+            target = target.setdefault(key, {}) if isinstance(target, dict) else target[key]
+        target[op["location"][-1]] = op["params"]["value"]
+    return Figure(fig_dict)
 
 
 class TestPlottingFunctions(unittest.TestCase):
@@ -119,21 +138,30 @@ class TestPlottingFunctions(unittest.TestCase):
         label = "not-a-legend-label-shape"
         self.assertEqual(_wrap_legend_label(label, max_len=10), label)
 
-    def test_generate_text(self):
-        texts = _generate_text("Site1", self.df, "PrimaryDomain", "SecondaryDomain", "Date")
-        self.assertEqual(len(texts), len(self.df))
-        self.assertIn("<b>Site1</b><br><b>Primary Domain:</b>", texts[0])
-        self.assertIn("<b>Secondary Domain:</b>", texts[0])
+    def test_hover_template(self):
+        template = _hover_template("Domain1", "SubDomain1")
+        self.assertIn("<b>%{customdata[0]}</b><br><b>Primary Domain:</b> Domain1", template)
+        self.assertIn("<b>Secondary Domain:</b> SubDomain1", template)
+        self.assertIn("<b>Date:</b> %{customdata[2]}", template)
 
-    def test_generate_text_same_domain_omits_secondary(self):
-        # primary_domain and secondary_domain resolve to the same value for
-        # every row - the "Secondary Domain" line should be dropped, not
-        # repeated.
-        df = self.df.copy()
-        df["SecondaryDomain"] = df["PrimaryDomain"]
-        texts = _generate_text("Site1", df, "PrimaryDomain", "SecondaryDomain", "Date")
-        self.assertNotIn("Secondary Domain", texts[0])
-        self.assertIn("<b>Site1</b><br><b>Primary Domain:</b>", texts[0])
+    def test_hover_template_same_domain_omits_secondary(self):
+        # primary and secondary domain values are the same - the "Secondary
+        # Domain" line should be dropped, not repeated.
+        template = _hover_template("Domain1", "Domain1")
+        self.assertNotIn("Secondary Domain", template)
+        self.assertIn("<b>Primary Domain:</b> Domain1", template)
+
+    def test_hover_dates(self):
+        df = pd.DataFrame({"Date": pd.to_datetime(["2023-01-01", None])})
+        self.assertEqual(list(_hover_dates(df, "Date")), ["2023-01-01", "NaT"])
+        df = pd.DataFrame(
+            {"Date": [pd.Timestamp("2023-01-01 08:30"), pd.Timestamp("2023-01-02")]}
+        )
+        self.assertEqual(
+            list(_hover_dates(df, "Date")), ["2023-01-01 08:30:00", "2023-01-02 00:00:00"]
+        )
+        self.assertEqual(list(_hover_dates(self.df, "Date")), ["2023-01-01", "2023-01-02"])
+        self.assertEqual(list(_hover_dates(self.df, None)), ["N/A", "N/A"])
 
     def test_make_base_scatter_plot(self):
         fig = make_base_scatter_plot(
@@ -160,6 +188,9 @@ class TestPlottingFunctions(unittest.TestCase):
         for trace in fig.data:
             for row in trace.customdata:
                 self.assertEqual(row[0], row[1])
+            # Hover reads the site and date from customdata, not text.
+            self.assertIsNone(trace.text)
+            self.assertIn("%{customdata[2]}", trace.hovertemplate)
 
     def test_make_base_scatter_plot_collapses_repeat_visits_by_location(self):
         df = pd.concat([self.df, self.df], ignore_index=True)
@@ -258,10 +289,103 @@ class TestPlottingFunctions(unittest.TestCase):
             self.assertEqual(trace.marker.color, _DEFAULT_COLOR)
             self.assertEqual(trace.marker.symbol, _DEFAULT_MARKER_SYMBOL)
 
+    def _batched_df(self):
+        df = pd.concat([self.df] * 3, ignore_index=True)
+        df["LOC_ID"] = ["Site1", "Site2", "Site3", "Site1", "Site2", "Site3"]
+        df["ENTITY_ID"] = df["LOC_ID"] + "_" + df.index.astype(str)
+        site2 = df["LOC_ID"] == "Site2"
+        df["PrimaryDomain"] = np.where(site2, "Domain2", "Domain1")
+        df["SecondaryDomain"] = np.where(site2, "SubDomain2", "SubDomain1")
+        return df
+
+    def test_batched_mode_one_webgl_trace_per_style_key_plus_legend_proxies(self):
+        df = self._batched_df()
+        self.name_marker_map["Site3"] = 1
+        fig = make_base_scatter_plot(
+            df=df,
+            ctx=self._make_ctx(col_entity_id="ENTITY_ID"),
+            x_col="PMAP1",
+            y_col="PMAP2",
+            x_label="X Axis",
+            y_label="Y Axis",
+            render_mode="batched",
+        )
+        self.assertTrue(all(trace.type == "scattergl" for trace in fig.data))
+        data = [t for t in fig.data if not t.showlegend]
+        proxies = [t for t in fig.data if t.showlegend]
+        # Domain1/SubDomain1 holds Site1 + Site3 (same symbol); Domain2 holds Site2.
+        self.assertEqual(len(data), 2)
+        self.assertEqual(
+            [(t.name, t.marker.color) for t in proxies],
+            [("Domain1 / SubDomain1", "red"), ("Domain2 / SubDomain2", "blue")],
+        )
+        self.assertEqual([t.legendgroup for t in data], [t.legendgroup for t in proxies])
+        self.assertEqual(list(proxies[0].x), [None])
+        self.assertEqual(
+            sorted(tuple(row[:2]) for t in data for row in t.customdata),
+            sorted(df[["LOC_ID", "ENTITY_ID"]].itertuples(index=False, name=None)),
+        )
+        # Per-point site in the hover label comes from customdata.
+        self.assertEqual(data[0].customdata[1][0], "Site3")
+        self.assertIn("<b>%{customdata[0]}</b>", data[0].hovertemplate)
+
+    def test_batched_mode_splits_marker_symbols_into_style_keys(self):
+        df = self._batched_df()
+        df["PrimaryDomain"] = "Domain1"
+        df["SecondaryDomain"] = "Domain1"
+        fig = make_base_scatter_plot(
+            df=df,
+            ctx=self._make_ctx(col_secondary_domain="PrimaryDomain"),
+            x_col="PMAP1",
+            y_col="PMAP2",
+            x_label="X Axis",
+            y_label="Y Axis",
+            render_mode="batched",
+        )
+        data = [t for t in fig.data if not t.showlegend]
+        self.assertEqual(
+            {t.marker.symbol: len(t.x) for t in data},
+            {1: 2, 2: 2, _DEFAULT_MARKER_SYMBOL: 2},
+        )
+        self.assertEqual([t.name for t in fig.data if t.showlegend], ["Domain1"])
+
+    def test_auto_mode_batches_large_plots(self):
+        ctx = self._make_ctx()
+        self.assertEqual(plotting._resolve_render_mode(self.df, ctx, "auto"), "per_location")
+        original = plotting.SCATTER_BATCH_MIN_LOCATIONS
+        plotting.SCATTER_BATCH_MIN_LOCATIONS = 1
+        try:
+            self.assertEqual(plotting._resolve_render_mode(self.df, ctx, "auto"), "batched")
+        finally:
+            plotting.SCATTER_BATCH_MIN_LOCATIONS = original
+        with self.assertRaises(ValueError):
+            plotting._resolve_render_mode(self.df, ctx, "svg")
+
     def test_annotate_loadings(self):
         fig = empty_fig()
         fig = _annotate_loadings(self.ldg_df, fig, "PC1", "PC2")
         self.assertIsInstance(fig, Figure)
+        # One line trace for every arrow plus one text trace - no annotations.
+        self.assertEqual(len(fig.layout.annotations), 0)
+        arrows, labels = fig.data
+        self.assertEqual(list(arrows.x), [0.0, 0.1, None, 0.0, 0.2, None])
+        self.assertEqual(list(arrows.y), [0.0, 0.3, None, 0.0, 0.4, None])
+        self.assertEqual(list(arrows.marker.size), [0, 9, 0, 0, 9, 0])
+        self.assertEqual(list(labels.text), ["Metal1", "Metal2"])
+        # Labels sit just past the tips, along each arrow.
+        tip = np.array([0.1, 0.3])
+        np.testing.assert_allclose(
+            [labels.x[0], labels.y[0]], tip + 0.02 * tip / np.linalg.norm(tip)
+        )
+
+    def test_annotate_loadings_top_k_keeps_longest_vectors(self):
+        ldg_df = pd.DataFrame(
+            {"PC1": [0.1, 0.9, -0.5], "PC2": [0.1, 0.1, 0.5], "metals": ["Cu", "Zn", "Fe"]}
+        )
+        fig = _annotate_loadings(ldg_df, empty_fig(), "PC1", "PC2", top_k=2)
+        self.assertEqual(list(fig.data[1].text), ["Zn", "Fe"])
+        fig = _annotate_loadings(ldg_df, empty_fig(), "PC1", "PC2", top_k=0)
+        self.assertEqual(len(fig.data[1].text), 3)
 
     def test_make_fig_pmap(self):
         fig = make_fig_pmap(df=self.df, ctx=self._make_ctx())
@@ -295,8 +419,83 @@ class TestPlottingFunctions(unittest.TestCase):
         )
         self.assertIn("10.00%", fig.layout.yaxis.title.text)
         self.assertIn("PC3", fig.layout.yaxis.title.text)
-        self.assertTrue(all(trace.y[0] in df["PC3"].values for trace in fig.data))
+        self.assertTrue(
+            all(
+                trace.y[0] in df["PC3"].values
+                for trace in fig.data
+                if trace.customdata is not None
+            )
+        )
+
+    def test_patch_scatter_colors_matches_rebuilt_figure(self):
+        recolored = dict(
+            dict_color_map_primary={"Domain1": "orange", "Domain2": "purple"},
+            dict_color_map_secondary={"SubDomain1": "orange", "SubDomain2": "cyan"},
+        )
+        df = self._batched_df()
+        for render_mode in ("per_location", "batched"):
+            fig = make_base_scatter_plot(
+                df, self._make_ctx(), "PC1", "PC2", "x", "y", render_mode=render_mode
+            )
+            expected = make_base_scatter_plot(
+                df, self._make_ctx(**recolored), "PC1", "PC2", "x", "y", render_mode=render_mode
+            )
+            patched = _apply_patch(
+                fig, patch_scatter_colors(df, self._make_ctx(**recolored), render_mode)
+            )
+            self.assertEqual(len(patched.data), len(expected.data))
+            for got, want in zip(patched.data, expected.data):
+                self.assertEqual(got.marker.color, want.marker.color)
+                self.assertEqual(got.marker.line.color, want.marker.line.color)
+                self.assertEqual(got.marker.line.width, want.marker.line.width)
+                self.assertEqual(got.marker.symbol, want.marker.symbol)
+
+    def test_patch_pca_components_matches_rebuilt_figure(self):
+        df = self._batched_df()
+        df["PC3"] = np.linspace(-1.0, 1.0, len(df))
+        ldg_df = self.ldg_df.assign(PC3=[0.5, -0.6])
+        expl_var = [0.6, 0.3, 0.1]
+        for render_mode in ("per_location", "batched"):
+            args = (df, ldg_df, expl_var, self._make_ctx())
+            fig = make_fig_pca(*args, render_mode=render_mode)
+            expected = make_fig_pca(*args, x_col="PC3", y_col="PC1", render_mode=render_mode)
+            patched = _apply_patch(
+                fig, patch_pca_components(*args, "PC3", "PC1", render_mode=render_mode)
+            )
+            self.assertEqual(len(patched.data), len(expected.data))
+            for got, want in zip(patched.data, expected.data):
+                self.assertEqual(list(got.x), list(want.x))
+                self.assertEqual(list(got.y), list(want.y))
+            self.assertEqual(list(patched.data[-1].text), list(expected.data[-1].text))
+            for axis in ("xaxis", "yaxis"):
+                self.assertEqual(patched.layout[axis].title.text, expected.layout[axis].title.text)
+                np.testing.assert_allclose(patched.layout[axis].range, expected.layout[axis].range)
 
 
+    def test_patches_check_the_figure_layout_signature(self):
+        df = self._batched_df()
+        args = (df, self.ldg_df, [0.6, 0.4], self._make_ctx())
+        per_location = figure_layout_signature(make_fig_pca(*args, render_mode="per_location"))
+        batched = make_fig_pca(*args, render_mode="batched")
+        self.assertEqual(
+            figure_layout_signature(batched),
+            figure_layout_signature(json.loads(batched.to_json())),
+        )
+        self.assertNotEqual(per_location, figure_layout_signature(batched))
+        self.assertIsNone(figure_layout_signature(placeholder_fig("Computing...")))
+
+        # The frame now lays out batched: patching the batched figure is fine,
+        # patching one drawn per location would miss its traces.
+        signature = figure_layout_signature(batched)
+        for layout_signature, patched in ((signature, True), (per_location, False)):
+            patch = patch_scatter_colors(
+                df, self._make_ctx(), "batched", layout_signature=layout_signature
+            )
+            self.assertEqual(patch is not None, patched)
+            patch = patch_pca_components(
+                *args, "PC2", "PC1", render_mode="batched", layout_signature=layout_signature
+            )
+            self.assertEqual(patch is not None, patched)
+
 if __name__ == "__main__":
     unittest.main()
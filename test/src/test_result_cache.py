@@ -0,0 +1,186 @@
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+import redis
+from pandas.testing import assert_frame_equal
+
+from app.src import result_cache
+
+
+def _fake_result():
+    df_plot_pca = pd.DataFrame({"PC1": [0.1, 0.2], "LOC": ["A", "B"]})
+    ldg_df = pd.DataFrame({"PC1": [0.5], "metals": ["Cu"]}, index=["Cu"])
+    df_plot_pmap = pd.DataFrame({"PMAP1": [1.0, 2.0], "LOC": ["A", "B"]})
+    return (df_plot_pca, ldg_df, [0.9]), df_plot_pmap
+
+
+class TestCachedDimensionReduction(unittest.TestCase):
+    def setUp(self):
+        self.store = {}
+        patchers = [
+            patch.object(result_cache, "load_result", side_effect=self.store.get),
+            patch.object(
+                result_cache,
+                "save_result",
+                side_effect=lambda key, value: self.store.__setitem__(key, value),
+            ),
+            patch.object(
+                result_cache,
+                "process_dimension_reduction",
+                side_effect=lambda *args, **kwargs: _fake_result(),
+            ),
+        ]
+        self.mocks = [p.start() for p in patchers]
+        for p in patchers:
+            self.addCleanup(p.stop)
+        self.compute = self.mocks[2]
+
+    def _run(self, **overrides):
+        kwargs = dict(
+            df=pd.DataFrame(),
+            col_loc_id="LOC",
+            cols_meta=["LOC"],
+            cols_numeric_simple=["Cu"],
+            cols_numeric_clr=[],
+            feature_selection=["Cu"],
+            loc_id_selection=["A", "B"],
+            n_neighbors=15,
+            date_range=None,
+            data_hash="ws:abc:0",
+        )
+        kwargs.update(overrides)
+        return result_cache.cached_dimension_reduction(**kwargs)
+
+    def test_second_call_with_same_inputs_is_a_hit(self):
+        first = self._run()
+        second = self._run()
+        self.assertEqual(self.compute.call_count, 1)
+        assert_frame_equal(first[0][0], second[0][0])
+        assert_frame_equal(first[0][1], second[0][1])
+        self.assertEqual(first[0][2], second[0][2])
+        assert_frame_equal(first[1], second[1])
+
+    def test_any_key_component_change_is_a_miss(self):
+        self._run()
+        self._run(n_neighbors=10)
+        self._run(feature_selection=["Zn"])
+        self._run(date_range=["2020-01-01", "2020-12-31"])
+        self._run(data_hash="ws:abc:1")
+        self.assertEqual(self.compute.call_count, 5)
+
+    def test_no_data_hash_skips_cache(self):
+        self._run(data_hash=None)
+        self._run(data_hash=None)
+        self.assertEqual(self.compute.call_count, 2)
+        self.assertFalse(self.store)
+
+    def test_redis_errors_fall_back_to_computing(self):
+        self.mocks[0].side_effect = redis.ConnectionError
+        self.mocks[1].side_effect = redis.ConnectionError
+        result = self._run()
+        self.assertEqual(result[0][2], [0.9])
+
+    def test_oversized_results_are_not_stored(self):
+        with patch.object(result_cache, "RESULT_CACHE_MAX_BYTES", 10):
+            self._run()
+        self.assertFalse(self.store)
+
+
+class TestCachedPhases(unittest.TestCase):
+    def setUp(self):
+        self.store = {}
+        (pca_result, df_plot_pmap) = _fake_result()
+        patchers = [
+            patch.object(result_cache, "load_result", side_effect=self.store.get),
+            patch.object(
+                result_cache,
+                "save_result",
+                side_effect=lambda key, value: self.store.__setitem__(key, value),
+            ),
+            patch.object(result_cache, "process_pca", return_value=pca_result),
+            patch.object(result_cache, "process_pmap", return_value=df_plot_pmap),
+            patch.object(
+                result_cache,
+                "process_dimension_reduction",
+                side_effect=lambda *args, **kwargs: _fake_result(),
+            ),
+        ]
+        self.mocks = [p.start() for p in patchers]
+        for p in patchers:
+            self.addCleanup(p.stop)
+        self.kwargs = dict(
+            df=pd.DataFrame(),
+            col_loc_id="LOC",
+            cols_meta=["LOC"],
+            cols_numeric_simple=["Cu"],
+            cols_numeric_clr=[],
+            feature_selection=["Cu"],
+            loc_id_selection=["A", "B"],
+            data_hash="ws:abc:0",
+        )
+
+    def test_pca_entry_is_shared_across_n_neighbors(self):
+        result_cache.cached_pca(**self.kwargs)
+        result_cache.cached_pmap(n_neighbors=15, **self.kwargs)
+        result_cache.cached_pmap(n_neighbors=10, **self.kwargs)
+        result_cache.cached_pmap(n_neighbors=15, **self.kwargs)
+        self.assertEqual(self.mocks[2].call_count, 1)
+        self.assertEqual(self.mocks[3].call_count, 2)
+        self.assertEqual(len(self.store), 3)
+
+    def test_phases_populate_combined_entries(self):
+        pca_result = result_cache.cached_pca(**self.kwargs)
+        df_plot_pmap = result_cache.cached_pmap(n_neighbors=15, **self.kwargs)
+        (hit_pca, _, _), hit_pmap = result_cache.cached_dimension_reduction(
+            n_neighbors=15, **self.kwargs
+        )
+        self.mocks[4].assert_not_called()
+        assert_frame_equal(hit_pca, pca_result[0])
+        assert_frame_equal(hit_pmap, df_plot_pmap)
+
+    def test_warm_started_pmap_bypasses_cache(self):
+        previous = pd.DataFrame({"PMAP1": [1.0], "PMAP2": [2.0]})
+        result_cache.cached_pmap(n_neighbors=15, **self.kwargs)
+        result_cache.cached_pmap(n_neighbors=15, previous_embedding=previous, **self.kwargs)
+        self.assertEqual(self.mocks[3].call_count, 2)
+        self.assertIs(self.mocks[3].call_args.kwargs["previous_embedding"], previous)
+        self.assertEqual(len(self.store), 1)
+
+
+class TestDimensionReductionDataToken(unittest.TestCase):
+    def setUp(self):
+        self.session = {
+            "workspace_id": "ws",
+            "data_hash": {"data_hash": "abc", "mutation": 0},
+            "meta_data": {"cols_key_meta": {"loc_id": "LOC"}, "cols_key_plot": {"meta": []}},
+        }
+
+    def test_token_is_shared_across_workspaces(self):
+        token = result_cache.dimension_reduction_data_token(self.session)
+        self.assertTrue(token.startswith("abc:"))
+        other = dict(self.session, workspace_id="other")
+        self.assertEqual(result_cache.dimension_reduction_data_token(other), token)
+        self.assertEqual(
+            result_cache.dimension_reduction_data_token(dict(self.session, workspace_id=None)),
+            token,
+        )
+
+    def test_token_follows_mapping_and_custom_groups(self):
+        token = result_cache.dimension_reduction_data_token(self.session)
+        remapped = dict(
+            self.session,
+            meta_data={"cols_key_meta": {"loc_id": "SITE"}, "cols_key_plot": {"meta": []}},
+        )
+        self.assertNotEqual(result_cache.dimension_reduction_data_token(remapped), token)
+        mutated = dict(self.session, data_hash={"data_hash": "abc", "mutation": 1, "content": "d"})
+        self.assertTrue(result_cache.dimension_reduction_data_token(mutated).startswith("d:"))
+
+    def test_no_token_without_known_content(self):
+        self.assertIsNone(result_cache.dimension_reduction_data_token({"data_hash": {}}))
+        legacy = dict(self.session, data_hash={"data_hash": "abc", "mutation": 2})
+        self.assertIsNone(result_cache.dimension_reduction_data_token(legacy))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from app.src.data_process import (
+    subset_df_dateRange,
+    subset_df_locIds,
+    subset_df_numericFeatures,
+)
+from app.src.selection_engine import DateIndex, SelectionIndex, select_frame
+
+
+class TestSelectionIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 300
+        dates = pd.Series(pd.date_range("2020-01-01", periods=n, freq="D")).sample(
+            frac=1, random_state=0
+        )
+        dates.iloc[::17] = pd.NaT
+        self.df = pd.DataFrame(
+            {
+                "Site": rng.choice(["A", "B", "C", "D"], size=n),
+                "Sample_Date": dates.to_numpy(),
+                "pH": rng.normal(7, 1, size=n),
+                "Cu": rng.lognormal(size=n),
+                "Note": ["x"] * n,
+                "Zn": rng.lognormal(size=n),
+            },
+            index=rng.permutation(n) + 1000,
+        )
+        self.simple, self.clr = ["pH"], ["Cu", "Zn"]
+
+    def _reference(self, col_date, loc_ids, features, date_range):
+        df = subset_df_dateRange(self.df, col_date, date_range)
+        df = subset_df_locIds(df, "Site", loc_ids)
+        return subset_df_numericFeatures(df, self.simple, self.clr, features)
+
+    def _check(self, col_date, loc_ids, features, date_range):
+        index = SelectionIndex(self.df, "Site", col_date, self.simple, self.clr)
+        df, cols_all, cols_clr = select_frame(self.df, index, loc_ids, features, date_range)
+        df_ref, cols_all_ref, cols_clr_ref = self._reference(
+            col_date, loc_ids, features, date_range
+        )
+        # subset_df_numericFeatures reindexes unselected analytes back in as
+        # all-NaN columns; select_frame leaves them out.
+        unselected = set(self.simple + self.clr) - set(cols_all_ref)
+        self.assertEqual(
+            df.columns.to_list(), [col for col in self.df.columns if col not in unselected]
+        )
+        assert_frame_equal(df, df_ref[df.columns])
+        self.assertEqual(cols_all, cols_all_ref)
+        self.assertEqual(cols_clr, cols_clr_ref)
+
+    def test_matches_chained_subset_functions(self):
+        for loc_ids, features, date_range in (
+            (["A", "C"], ["Zn", "pH", "Cu"], ["2020-03-01", "2020-06-30"]),
+            (["B", "Z"], ["Cu"], None),
+            (["A", "B", "C", "D"], ["pH", "Zn"], ["2020-05-05", "2020-05-05"]),
+            (["D"], ["Cu", "Zn"], ["2030-01-01", "2030-12-31"]),
+        ):
+            with self.subTest(loc_ids=loc_ids, date_range=date_range):
+                self._check("Sample_Date", loc_ids, features, date_range)
+
+    def test_date_range_ignored_without_date_column(self):
+        self._check(None, ["A"], ["pH", "Cu"], ["2020-03-01", "2020-06-30"])
+
+    def test_date_rows_excludes_nat(self):
+        index = SelectionIndex(self.df, "Site", "Sample_Date", self.simple, self.clr)
+        rows = index.rows(None, ["2019-01-01", "2021-12-31"])
+        self.assertEqual(len(rows), self.df["Sample_Date"].notna().sum())
+        self.assertTrue(np.all(np.diff(rows) > 0))
+
+
+class TestDateIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        dates = pd.Series(
+            pd.Timestamp("2015-06-15") + pd.to_timedelta(rng.integers(0, 3000, 1000), "D")
+        )
+        dates.iloc[::13] = pd.NaT
+        self.dates = dates
+        self.index = DateIndex.from_series(dates)
+
+    def test_rows_match_boolean_comparison(self):
+        for start, end in (
+            ("2016-01-01", "2017-03-31"),
+            ("2015-06-15", "2015-06-15"),
+            ("2030-01-01", "2031-01-01"),
+            ("2019-01-01", "2018-01-01"),
+        ):
+            start, end = pd.Timestamp(start), pd.Timestamp(end)
+            expected = np.flatnonzero(((self.dates >= start) & (self.dates <= end)).to_numpy())
+            np.testing.assert_array_equal(self.index.rows(start, end), expected)
+
+    def test_year_rows_match_year_comparison(self):
+        years = self.dates.dt.year
+        for first, last in ((2016, 2016), (2015, 2018), (2024, 2030)):
+            expected = np.flatnonzero(((years >= first) & (years <= last)).to_numpy())
+            np.testing.assert_array_equal(self.index.year_rows(first, last), expected)
+
+    def test_stored_order_is_reused(self):
+        rebuilt = DateIndex(self.dates.to_numpy(), self.index.order)
+        np.testing.assert_array_equal(rebuilt.sorted_dates, self.index.sorted_dates)
+
+    def test_non_naive_dates_are_not_indexed(self):
+        self.assertIsNone(DateIndex.from_series(self.dates.dt.tz_localize("UTC")))
+        self.assertIsNone(DateIndex.from_series(self.dates.astype(str)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+import unittest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from app.src.cache_initialize import frame_cache, log_composition_cache
+from app.src.data_process import pandas_to_json
+from app.src.session_codec import (
+    CODEC_COLUMNAR,
+    CODEC_JSON,
+    COLUMNAR_PREFIX,
+    SESSION_VERSION,
+    decode_frame,
+    encode_frame,
+    load_frame,
+    encode_date_index,
+    load_date_index,
+    load_log_composition,
+    load_selection_index,
+    migrate_session,
+)
+
+
+class TestSessionCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "Site": ["A", None, "B", "A"],
+                "Sample_Date": pd.to_datetime(["2023-01-01", None, "2023-03-01", "2023-04-01"]),
+                "Copper": [1.5, np.nan, 3.25, 4.0],
+                "Count": [1, 2, 3, 4],
+                "Flag": [True, False, True, True],
+                "Group": pd.Categorical(["x", "y", "x", None]),
+            },
+            index=[10, 11, 12, 13],
+        )
+
+    def test_columnar_round_trip_preserves_dtypes(self):
+        payload = encode_frame(self.df, codec=CODEC_COLUMNAR)
+        self.assertTrue(payload.startswith(COLUMNAR_PREFIX))
+        assert_frame_equal(decode_frame(payload), self.df)
+
+    def test_columnar_round_trip_range_index(self):
+        df = self.df.reset_index(drop=True)
+        assert_frame_equal(decode_frame(encode_frame(df, codec=CODEC_COLUMNAR)), df)
+
+    def test_decoded_columns_are_writable(self):
+        df = decode_frame(encode_frame(self.df, codec=CODEC_COLUMNAR))
+        df.loc[10, "Copper"] = 9.0
+        self.assertEqual(df.loc[10, "Copper"], 9.0)
+
+    def test_json_codec_matches_pandas_to_json(self):
+        payload = encode_frame(self.df[["Site", "Copper"]], codec=CODEC_JSON)
+        self.assertEqual(payload, pandas_to_json(self.df[["Site", "Copper"]]))
+
+    def test_decodes_legacy_json_payloads(self):
+        df = self.df[["Site", "Sample_Date", "Copper"]]
+        legacy = pandas_to_json(df, "Sample_Date")
+        decoded = load_frame({"df_master": legacy}, "df_master", "Sample_Date")
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(decoded["Sample_Date"]))
+        self.assertEqual(decoded["Copper"].tolist()[0], 1.5)
+
+        ldg = pd.DataFrame({"PC1": [0.1, 0.2], "PC2": [0.3, 0.4]}, index=["Cu", "Zn"])
+        assert_frame_equal(decode_frame(ldg.to_json()), ldg)
+
+    def test_unknown_codec_raises(self):
+        with self.assertRaises(ValueError):
+            encode_frame(self.df, codec="parquet")
+
+    def test_migrate_session_reencodes_version_1_frames(self):
+        df = self.df[["Site", "Sample_Date", "Copper"]].reset_index(drop=True)
+        ldg = pd.DataFrame({"PC1": [0.1, 0.2]}, index=["Cu", "Zn"])
+        session = {
+            "version": 1,
+            "meta_data": {"cols_key_meta": {"date": "Sample_Date"}},
+            "df_master": pandas_to_json(df, "Sample_Date"),
+            "working_data": {
+                "df_plot_pca": pandas_to_json(df, "Sample_Date"),
+                "df_plot_pmap": None,
+                "ldg_df": ldg.to_json(),
+            },
+        }
+        migrated = migrate_session(session)
+        self.assertEqual(migrated["version"], SESSION_VERSION)
+        self.assertTrue(migrated["df_master"].startswith(COLUMNAR_PREFIX))
+        self.assertTrue(migrated["working_data"]["ldg_df"].startswith(COLUMNAR_PREFIX))
+        self.assertIsNone(migrated["working_data"]["df_plot_pmap"])
+        assert_frame_equal(load_frame(migrated, "df_master", "Sample_Date"), df)
+        assert_frame_equal(decode_frame(migrated["working_data"]["ldg_df"]), ldg)
+
+    def test_migrate_session_current_version_is_noop(self):
+        session = {"version": SESSION_VERSION, "df_master": "untouched"}
+        self.assertIs(migrate_session(session), session)
+        self.assertEqual(session["df_master"], "untouched")
+
+
+class TestLoadFrameCache(unittest.TestCase):
+
+    def setUp(self):
+        frame_cache.clear()
+        self.df = pd.DataFrame({"Site": ["A", "B"], "Copper": [1.0, 2.0]})
+        self.session = {
+            "workspace_id": "ws1",
+            "data_hash": {"data_hash": "abc", "mutation": 0},
+            "df_master": encode_frame(self.df),
+        }
+
+    def test_repeat_loads_skip_decoding(self):
+        hits = frame_cache.stats()["hits"]
+        first = load_frame(self.session, "df_master")
+        self.session["df_master"] = "not a decodable payload"
+        second = load_frame(self.session, "df_master")
+        assert_frame_equal(first, second)
+        self.assertEqual(frame_cache.stats()["hits"], hits + 1)
+
+    def test_returned_frames_are_independent_copies(self):
+        first = load_frame(self.session, "df_master")
+        first.loc[0, "Copper"] = 99.0
+        self.assertEqual(load_frame(self.session, "df_master").loc[0, "Copper"], 1.0)
+
+    def test_mutation_counter_changes_key(self):
+        load_frame(self.session, "df_master")
+        changed = self.df.assign(Copper=[5.0, 6.0])
+        self.session["df_master"] = encode_frame(changed)
+        self.session["data_hash"]["mutation"] = 1
+        assert_frame_equal(load_frame(self.session, "df_master"), changed)
+
+    def test_sessions_without_workspace_bypass_cache(self):
+        del self.session["workspace_id"]
+        load_frame(self.session, "df_master")
+        self.assertEqual(len(frame_cache), 0)
+
+
+class TestLoadLogComposition(unittest.TestCase):
+    def setUp(self):
+        log_composition_cache.clear()
+        self.df = pd.DataFrame({"Cu": [1.0, 2.0], "Zn": [3.0, 4.0]})
+        self.session = {"workspace_id": "ws1", "data_hash": {"data_hash": "abc", "mutation": 0}}
+
+    def test_logs_are_computed_once_per_upload(self):
+        first = load_log_composition(self.session, self.df, ["Cu", "Zn"])
+        # Deferred until the CLR kernel reads them.
+        self.assertFalse(first._logged)
+        self.assertEqual(log_composition_cache.stats()["bytes"], first.nbytes)
+        np.testing.assert_allclose(first.values, np.log(self.df.to_numpy()))
+        self.assertIs(load_log_composition(self.session, self.df, ["Cu", "Zn"]), first)
+        self.session["data_hash"]["mutation"] = 1
+        self.assertIsNot(load_log_composition(self.session, self.df, ["Cu", "Zn"]), first)
+
+    def test_sessions_without_workspace_get_none(self):
+        del self.session["workspace_id"]
+        self.assertIsNone(load_log_composition(self.session, self.df, ["Cu", "Zn"]))
+
+
+class TestDateIndexPayload(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {"date": pd.to_datetime(["2021-03-01", None, "2020-01-01", "2021-01-01"])}
+        )
+
+    def test_round_trip(self):
+        store = {"date_index": encode_date_index(self.df, "date")}
+        date_index = load_date_index(store, self.df, "date")
+        np.testing.assert_array_equal(date_index.order, [2, 3, 0])
+
+    def test_missing_or_stale_payload_is_rebuilt(self):
+        for store in ({}, {"date_index": encode_date_index(self.df.iloc[:2], "date")}):
+            np.testing.assert_array_equal(load_date_index(store, self.df, "date").order, [2, 3, 0])
+        stale = {"date_index": encode_date_index(pd.concat([self.df, self.df]), "date")}
+        np.testing.assert_array_equal(load_date_index(stale, self.df, "date").order, [2, 3, 0])
+
+    def test_no_date_column(self):
+        self.assertIsNone(encode_date_index(self.df, None))
+        self.assertIsNone(load_date_index({}, self.df.astype(str), "date"))
+
+
+class TestLoadSelectionIndex(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {"Site": ["A", "B", "A"], "Cu": [1.0, 2.0, 3.0], "Zn": [4.0, 5.0, 6.0]}
+        )
+        self.session = {"workspace_id": "ws1", "data_hash": {"data_hash": "idx", "mutation": 0}}
+
+    def test_index_is_built_once_per_upload(self):
+        first = load_selection_index(self.session, self.df, "Site", None, [], ["Cu", "Zn"])
+        np.testing.assert_array_equal(first.rows(["A"]), [0, 2])
+        self.assertIs(
+            load_selection_index(self.session, self.df, "Site", None, [], ["Cu", "Zn"]), first
+        )
+        self.session["data_hash"]["mutation"] = 1
+        self.assertIsNot(
+            load_selection_index(self.session, self.df, "Site", None, [], ["Cu", "Zn"]), first
+        )
+
+    def test_sessions_without_workspace_get_none(self):
+        del self.session["workspace_id"]
+        self.assertIsNone(load_selection_index(self.session, self.df, "Site", None, [], ["Cu"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
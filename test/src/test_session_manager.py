@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import patch
+from unittest.mock import call, patch
 
 from app.src import session_manager
 
@@ -47,6 +47,157 @@ class TestSessionManager(unittest.TestCase):
             mock_r.hexists.assert_called_once_with("session:user1", "key1")
             self.assertTrue(result)
 
+    def test_save_workspace_sets_with_ttl(self):
+        with patch.object(session_manager, "r") as mock_r:
+            mock_r.set.return_value = True
+            mock_r.zcard.return_value = 1
+            session_manager.save_workspace("ws1", "abc", "payload")
+            mock_r.set.assert_called_with(
+                "workspace:ws1:abc", "payload", ex=session_manager.WORKSPACE_TTL, nx=True
+            )
+            self.assertNotIn(
+                call("workspace:ws1:abc", session_manager.WORKSPACE_TTL),
+                mock_r.expire.call_args_list,
+            )
+
+    def test_save_workspace_existing_digest_refreshes_ttl(self):
+        with patch.object(session_manager, "r") as mock_r:
+            mock_r.set.return_value = None
+            mock_r.zcard.return_value = 1
+            session_manager.save_workspace("ws1", "abc", "payload")
+            mock_r.expire.assert_any_call("workspace:ws1:abc", session_manager.WORKSPACE_TTL)
+
+    def test_load_workspace(self):
+        with patch.object(session_manager, "r") as mock_r:
+            mock_r.get.return_value = "payload"
+            self.assertEqual(session_manager.load_workspace("ws1", "abc"), "payload")
+            mock_r.get.assert_called_once_with("workspace:ws1:abc")
+            mock_r.expire.assert_any_call("workspace:ws1:abc", session_manager.WORKSPACE_TTL)
+
+    def test_load_workspace_expired(self):
+        with patch.object(session_manager, "r") as mock_r:
+            mock_r.get.return_value = None
+            self.assertIsNone(session_manager.load_workspace("ws1", "abc"))
+            mock_r.expire.assert_not_called()
+
+
+class _FakeRedis:
+    """Just enough of redis.Redis for the result-cache accounting."""
+
+    def __init__(self):
+        self.values, self.zsets, self.hashes = {}, {}, {}
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def expire(self, key, ttl):
+        pass
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+    def zadd(self, name, mapping):
+        self.zsets.setdefault(name, {}).update(mapping)
+
+    def zrem(self, name, *members):
+        for member in members:
+            self.zsets.get(name, {}).pop(member, None)
+
+    def zrangebyscore(self, name, low, high):
+        return [m for m, score in self.zsets.get(name, {}).items() if score <= high]
+
+    def zcard(self, name):
+        return len(self.zsets.get(name, {}))
+
+    def zpopmin(self, name, count=1):
+        zset = self.zsets.get(name, {})
+        popped = []
+        for member in sorted(zset, key=zset.get)[:count]:
+            popped.append((member, zset.pop(member)))
+        return popped
+
+    def hset(self, name, key, value):
+        self.hashes.setdefault(name, {})[key] = str(value)
+
+    def hget(self, name, key):
+        return self.hashes.get(name, {}).get(key)
+
+    def hdel(self, name, *keys):
+        for key in keys:
+            self.hashes.get(name, {}).pop(key, None)
+
+    def hvals(self, name):
+        return list(self.hashes.get(name, {}).values())
+
+
+class TestResultCacheBudget(unittest.TestCase):
+    def setUp(self):
+        self.fake = _FakeRedis()
+        for p in (
+            patch.object(session_manager, "r", self.fake),
+            patch.object(session_manager, "RESULT_CACHE_BUDGET_BYTES", 10),
+        ):
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_evicts_least_recently_used_past_the_budget(self):
+        session_manager.save_result("a", "xxxx", ttl=100)
+        session_manager.save_result("b", "xxxx", ttl=200)
+        self.assertEqual(session_manager.load_result("a", ttl=300), "xxxx")
+        session_manager.save_result("c", "xxxx", ttl=400)
+        self.assertIsNone(session_manager.load_result("b"))
+        self.assertEqual(session_manager.load_result("a"), "xxxx")
+        self.assertEqual(session_manager.load_result("c"), "xxxx")
+        self.assertEqual(set(self.fake.hashes["result_sizes"]), {"a", "c"})
+
+    def test_expired_entries_leave_the_accounting(self):
+        session_manager.save_result("old", "xxxx", ttl=-1)
+        session_manager.save_result("new", "xxxx", ttl=100)
+        self.assertEqual(set(self.fake.zsets["result_index"]), {"new"})
+        self.assertEqual(set(self.fake.hashes["result_sizes"]), {"new"})
+
+
+class TestWorkspaceSnapshotCap(unittest.TestCase):
+    def setUp(self):
+        self.fake = _FakeRedis()
+        self.clock = iter(range(1000))
+        for p in (
+            patch.object(session_manager, "r", self.fake),
+            patch.object(session_manager, "WORKSPACE_MAX_SNAPSHOTS", 2),
+            patch.object(session_manager.time, "time", lambda: next(self.clock)),
+        ):
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_superseded_snapshots_are_deleted(self):
+        session_manager.save_workspace("ws1", "a", "A")
+        session_manager.save_workspace("ws1", "b", "B")
+        session_manager.save_workspace("ws1", "c", "C")
+        self.assertIsNone(session_manager.load_workspace("ws1", "a"))
+        self.assertEqual(session_manager.load_workspace("ws1", "c"), "C")
+        self.assertEqual(set(self.fake.zsets["workspace_index:ws1"]), {"b", "c"})
+
+    def test_reads_keep_a_snapshot_current(self):
+        session_manager.save_workspace("ws1", "a", "A")
+        session_manager.save_workspace("ws1", "b", "B")
+        self.assertEqual(session_manager.load_workspace("ws1", "a"), "A")
+        session_manager.save_workspace("ws1", "c", "C")
+        self.assertEqual(session_manager.load_workspace("ws1", "a"), "A")
+        self.assertIsNone(session_manager.load_workspace("ws1", "b"))
+
+    def test_workspaces_are_capped_independently(self):
+        for digest in ("a", "b", "c"):
+            session_manager.save_workspace("ws1", digest, digest)
+        session_manager.save_workspace("ws2", "a", "other")
+        self.assertEqual(session_manager.load_workspace("ws2", "a"), "other")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,67 @@
+import json
+import unittest
+from unittest.mock import patch
+
+import redis
+
+from app.src import store_utils
+
+
+class TestSessionStores(unittest.TestCase):
+    def setUp(self):
+        self.saved = {}
+
+        def fake_save(workspace_id, digest, value):
+            self.saved[(workspace_id, digest)] = value
+
+        def fake_load(workspace_id, digest):
+            return self.saved.get((workspace_id, digest))
+
+        patchers = [
+            patch.object(store_utils, "save_workspace", side_effect=fake_save),
+            patch.object(store_utils, "load_workspace", side_effect=fake_load),
+            patch.object(store_utils, "SERVER_SIDE_SESSIONS", True),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.session = {"df_master": "x" * 1000, "meta_data": {"a": 1}}
+
+    def test_dump_session_returns_small_handle(self):
+        raw = store_utils.dump_session(self.session, "ws1")
+        handle = json.loads(raw)
+        self.assertTrue(store_utils.is_session_handle(handle))
+        self.assertEqual(handle["workspace"], "ws1")
+        self.assertLess(len(raw), 100)
+        self.assertEqual(store_utils.load_session(raw), self.session)
+
+    def test_identical_payloads_share_a_digest(self):
+        first = store_utils.dump_session(self.session, "ws1")
+        second = store_utils.dump_session(dict(self.session), "ws1")
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.saved), 1)
+
+    def test_redis_failure_inlines_payload(self):
+        with patch.object(store_utils, "save_workspace", side_effect=redis.ConnectionError):
+            raw = store_utils.dump_session(self.session, "ws1")
+        self.assertEqual(json.loads(raw), self.session)
+        self.assertEqual(store_utils.load_session(raw), self.session)
+
+    def test_no_workspace_id_inlines_payload(self):
+        raw = store_utils.dump_session(self.session, None)
+        self.assertEqual(json.loads(raw), self.session)
+        self.assertFalse(self.saved)
+
+    def test_none_passes_through(self):
+        self.assertIsNone(store_utils.dump_session(None, "ws1"))
+        self.assertIsNone(store_utils.load_session(None))
+
+    def test_expired_snapshot_raises(self):
+        raw = store_utils.dump_session(self.session, "ws1")
+        self.saved.clear()
+        with self.assertRaises(store_utils.SessionExpiredError):
+            store_utils.load_session(raw)
+
+
+if __name__ == "__main__":
+    unittest.main()
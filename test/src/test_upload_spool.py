@@ -0,0 +1,110 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from flask import Flask
+
+from app.src import upload_spool
+from app.src.upload_spool import (
+    UploadError,
+    append_chunk,
+    complete_upload,
+    discard_upload,
+    new_upload,
+    purge_stale_uploads,
+    received_bytes,
+    register_upload_routes,
+    spool_path,
+)
+
+
+class SpoolDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(upload_spool, "UPLOAD_SPOOL_DIR", Path(self._tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._tmp.cleanup)
+
+
+class TestUploadSpool(SpoolDirTestCase):
+    def test_chunks_are_appended_and_retries_overwrite(self):
+        upload_id = new_upload()
+        self.assertEqual(append_chunk(upload_id, 0, b"a,b\n"), 4)
+        self.assertEqual(append_chunk(upload_id, 4, b"1,X\n"), 8)
+        # The previous chunk's response was lost - the client resends it.
+        self.assertEqual(append_chunk(upload_id, 4, b"1,2\n"), 8)
+        self.assertEqual(received_bytes(upload_id), (8, False))
+        self.assertEqual(complete_upload(upload_id), 8)
+        self.assertEqual(complete_upload(upload_id), 8)
+        self.assertEqual(spool_path(upload_id).read_bytes(), b"a,b\n1,2\n")
+        self.assertEqual(received_bytes(upload_id), (8, True))
+
+    def test_rejected_chunks(self):
+        upload_id = new_upload()
+        append_chunk(upload_id, 0, b"abc")
+        with self.assertRaises(UploadError) as gap:
+            append_chunk(upload_id, 10, b"x")
+        self.assertEqual(gap.exception.status, 409)
+        with mock.patch.object(upload_spool, "UPLOAD_MAX_BYTES", 4):
+            with self.assertRaises(UploadError) as too_big:
+                append_chunk(upload_id, 3, b"xy")
+        self.assertEqual(too_big.exception.status, 413)
+        complete_upload(upload_id)
+        with self.assertRaises(UploadError):
+            append_chunk(upload_id, 3, b"x")
+
+    def test_ids_are_never_paths(self):
+        for bad in ("../etc/passwd", "ABC", ""):
+            with self.assertRaises(UploadError):
+                spool_path(bad)
+
+    def test_discard_and_purge(self):
+        kept, stale, done = new_upload(), new_upload(), new_upload()
+        complete_upload(done)
+        discard_upload(done)
+        self.assertFalse(spool_path(done).exists())
+        old = time.time() - 3600
+        os.utime(upload_spool._part_path(stale), (old, old))
+        self.assertEqual(purge_stale_uploads(max_age_s=60), 1)
+        self.assertEqual(received_bytes(kept), (0, False))
+        with self.assertRaises(UploadError):
+            received_bytes(stale)
+
+
+class TestUploadRoutes(SpoolDirTestCase):
+    def setUp(self):
+        super().setUp()
+        server = Flask(__name__)
+        register_upload_routes(server)
+        self.client = server.test_client()
+
+    def test_resumable_upload_round_trip(self):
+        started = self.client.post("/upload").get_json()
+        upload_id = started["upload_id"]
+        self.assertGreater(started["chunk_bytes"], 0)
+        put = self.client.put(f"/upload/{upload_id}?offset=0", data=b"Site,Cu\n")
+        self.assertEqual(put.get_json(), {"received": 8})
+        gap = self.client.put(f"/upload/{upload_id}?offset=99", data=b"x")
+        self.assertEqual(gap.status_code, 409)
+        resume = self.client.get(f"/upload/{upload_id}").get_json()
+        self.assertEqual(resume, {"received": 8, "complete": False})
+        self.client.put(f"/upload/{upload_id}?offset=8", data=b"A,1.5\n")
+        done = self.client.post(f"/upload/{upload_id}/complete").get_json()
+        self.assertEqual(done, {"upload_id": upload_id, "size": 14})
+        self.assertEqual(spool_path(upload_id).read_bytes(), b"Site,Cu\nA,1.5\n")
+
+    def test_errors_are_json(self):
+        missing = self.client.get(f"/upload/{'0' * 32}")
+        self.assertEqual(missing.status_code, 404)
+        self.assertIn("error", missing.get_json())
+        upload_id = self.client.post("/upload").get_json()["upload_id"]
+        no_offset = self.client.put(f"/upload/{upload_id}", data=b"x")
+        self.assertEqual(no_offset.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()